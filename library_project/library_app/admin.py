@@ -1,9 +1,25 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from .models import (
     Author, Publisher, Book, Branch, BookInventory, 
-    Faculty, BookFacultyUsage, Student, Loan
+    Faculty, BookFacultyUsage, Student, Loan, Reservation, BranchLink,
+    Transfer, TransferItem, LoanEvent, LoanArchive
 )
+from .exceptions import LibraryBusinessError
+from .pagination import EstimatedCountPaginator
+from .services import BulkInventoryService, LoanService, ReservationService
+
+class InventoryActionForm(ActionForm):
+    """Параметры массовых действий над инвентарем"""
+    delta = forms.IntegerField(label=_('Экземпляров (+/-)'), required=False)
+    to_branch = forms.ModelChoiceField(
+        label=_('В филиал'),
+        queryset=Branch.objects.order_by('name'),
+        required=False
+    )
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
@@ -23,8 +39,12 @@ class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'publication_year', 'publisher', 'page_count', 'price')
     list_filter = ('publication_year', 'publisher')
     search_fields = ('title',)
+    list_select_related = ('publisher',)
+    autocomplete_fields = ('publisher',)
     filter_horizontal = ('authors',)
     ordering = ('title',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Branch)
@@ -34,13 +54,63 @@ class BranchAdmin(admin.ModelAdmin):
     ordering = ('name',)
     readonly_fields = ('created_at',)
 
+@admin.register(BranchLink)
+class BranchLinkAdmin(admin.ModelAdmin):
+    list_display = ('from_branch', 'to_branch', 'distance')
+    list_filter = ('from_branch',)
+    list_select_related = ('from_branch', 'to_branch')
+    autocomplete_fields = ('from_branch', 'to_branch')
+    ordering = ('from_branch', 'distance')
+
 @admin.register(BookInventory)
 class BookInventoryAdmin(admin.ModelAdmin):
     list_display = ('book', 'branch', 'total_copies', 'available_copies', 'last_updated')
     list_filter = ('branch',)
     search_fields = ('book__title', 'branch__name')
+    list_select_related = ('book', 'branch')
+    autocomplete_fields = ('book', 'branch')
     ordering = ('branch', 'book')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('last_updated',)
+    action_form = InventoryActionForm
+    actions = ['adjust_copies', 'transfer_to_branch']
+    
+    def _action_params(self, request):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        return form.cleaned_data if form.is_valid() else {}
+    
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            # Free copies go to waiting holds, as in InventoryUpdateView
+            ReservationService.allocate_freed({(obj.book_id, obj.branch_id): obj.available_copies})
+    
+    @admin.action(description=_('Изменить число экземпляров'))
+    def adjust_copies(self, request, queryset):
+        delta = self._action_params(request).get('delta')
+        if not delta:
+            self.message_user(request, _('Укажите число экземпляров'), messages.ERROR)
+            return
+        selected = queryset.count()
+        changed = BulkInventoryService.adjust_copies(queryset, delta)
+        self.message_user(request, _('Изменено записей: %(changed)d из %(selected)d') % {
+            'changed': changed, 'selected': selected
+        })
+    
+    @admin.action(description=_('Переместить доступные экземпляры в филиал'))
+    def transfer_to_branch(self, request, queryset):
+        to_branch = self._action_params(request).get('to_branch')
+        if not to_branch:
+            self.message_user(request, _('Выберите филиал назначения'), messages.ERROR)
+            return
+        try:
+            transfers = BulkInventoryService.transfer_inventory(queryset, to_branch.pk, user=request.user)
+        except LibraryBusinessError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, _('Создано перемещений: %(count)d') % {'count': len(transfers)})
 
 @admin.register(Faculty)
 class FacultyAdmin(admin.ModelAdmin):
@@ -54,6 +124,8 @@ class BookFacultyUsageAdmin(admin.ModelAdmin):
     list_display = ('book', 'branch', 'faculty', 'created_at')
     list_filter = ('branch', 'faculty')
     search_fields = ('book__title', 'faculty__name')
+    list_select_related = ('book', 'branch', 'faculty')
+    autocomplete_fields = ('book', 'branch', 'faculty')
     ordering = ('faculty', 'book')
     readonly_fields = ('created_at',)
 
@@ -62,7 +134,11 @@ class StudentAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'student_id', 'faculty', 'created_at')
     list_filter = ('faculty',)
     search_fields = ('last_name', 'first_name', 'student_id')
+    list_select_related = ('faculty',)
+    autocomplete_fields = ('faculty',)
     ordering = ('last_name', 'first_name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('created_at',)
 
 @admin.register(Loan)
@@ -70,11 +146,91 @@ class LoanAdmin(admin.ModelAdmin):
     list_display = ('student', 'book', 'branch', 'issue_date', 'return_date', 'is_returned')
     list_filter = ('branch', 'is_returned', 'issue_date')
     search_fields = ('student__last_name', 'student__first_name', 'book__title')
+    list_select_related = ('student', 'book', 'branch')
+    autocomplete_fields = ('student', 'book', 'branch')
     ordering = ('-issue_date',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('issue_date', 'created_by')
+    actions = ['mark_returned']
     
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
+    
+    def delete_model(self, request, obj):
+        # Freed copy goes to the hold queue, as in LoanDeleteView
+        LoanService.delete_loan(obj)
+    
+    def delete_queryset(self, request, queryset):
+        # QuerySet.delete() bypasses Loan.delete, so copies are returned here
+        BulkInventoryService.delete_loans(queryset)
+    
+    @admin.action(description=_('Отметить выбранные выдачи как возвращенные'))
+    def mark_returned(self, request, queryset):
+        returned = BulkInventoryService.return_loans(queryset)
+        self.message_user(request, _('Возвращено выдач: %(count)d') % {'count': returned})
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('student', 'book', 'branch', 'status', 'created_at', 'expires_at')
+    list_filter = ('branch', 'status')
+    search_fields = ('student__last_name', 'student__student_id', 'book__title')
+    list_select_related = ('student', 'book', 'branch')
+    autocomplete_fields = ('student', 'book', 'branch')
+    ordering = ('created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('created_at', 'ready_at', 'loan')
 
+class TransferItemInline(admin.TabularInline):
+    model = TransferItem
+    extra = 0
+    readonly_fields = ('book', 'quantity')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('book')
+
+@admin.register(Transfer)
+class TransferAdmin(admin.ModelAdmin):
+    list_display = ('from_branch', 'to_branch', 'status', 'created_at', 'received_at')
+    list_filter = ('status', 'from_branch', 'to_branch')
+    list_select_related = ('from_branch', 'to_branch')
+    autocomplete_fields = ('from_branch', 'to_branch')
+    ordering = ('-created_at',)
+    readonly_fields = ('status', 'created_at', 'received_at', 'created_by')
+    inlines = [TransferItemInline]
+
+@admin.register(LoanEvent)
+class LoanEventAdmin(admin.ModelAdmin):
+    list_display = ('event_type', 'loan_id', 'book_id', 'branch_id', 'on_loan_delta', 'stock_delta', 'created_at')
+    list_filter = ('event_type',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(LoanArchive)
+class LoanArchiveAdmin(admin.ModelAdmin):
+    list_display = ('loan_id', 'student', 'book', 'branch', 'issue_date', 'return_date')
+    list_filter = ('year',)
+    raw_id_fields = ('student', 'book', 'branch')
+    list_select_related = ('student', 'book', 'branch')
+    ordering = ('-issue_date',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
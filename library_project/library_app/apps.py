@@ -4,3 +4,15 @@ class LibraryAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library_app'
     verbose_name = 'Library Management System'
+    
+    def ready(self):
+        from django.core import checks
+        
+        from .catalog import CatalogSnapshot
+        from .model_versions import ModelVersions, check_shared_cache
+        from .sharding import validate_shard_settings
+        
+        validate_shard_settings()
+        checks.register(check_shared_cache)
+        ModelVersions.connect()
+        CatalogSnapshot.connect()
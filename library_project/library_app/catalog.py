@@ -0,0 +1,221 @@
+import asyncio
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .model_versions import ModelVersions
+
+
+class CatalogRecord:
+    """One row of a snapshot table"""
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def __repr__(self):
+        return f'CatalogRecord(id={self.id!r}, name={self.name!r})'
+
+
+class CatalogTable:
+    """
+    Immutable id -> name table over two parallel arrays.
+
+    Ids are kept sorted in a typed array('q') and looked up by bisection,
+    names sit in a tuple at the same positions: a few hundred bytes per
+    table instead of a model instance (and its __dict__) per row.
+    """
+    __slots__ = ('version', 'ids', 'names')
+
+    def __init__(self, version, rows):
+        rows = sorted(rows)
+        self.version = version
+        self.ids = array('q', [pk for pk, _ in rows])
+        self.names = tuple(name for _, name in rows)
+
+    def _index(self, pk):
+        if pk is None:
+            return None
+        i = bisect_left(self.ids, pk)
+        if i < len(self.ids) and self.ids[i] == pk:
+            return i
+        return None
+
+    def name(self, pk, default=None):
+        i = self._index(pk)
+        return default if i is None else self.names[i]
+
+    def get(self, pk):
+        i = self._index(pk)
+        return None if i is None else CatalogRecord(self.ids[i], self.names[i])
+
+    def __contains__(self, pk):
+        return self._index(pk) is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for pk, name in zip(self.ids, self.names):
+            yield CatalogRecord(pk, name)
+
+    def nbytes(self) -> int:
+        """Memory held by the table: the arrays plus the name strings"""
+        return (
+            sys.getsizeof(self.ids) + sys.getsizeof(self.names)
+            + sum(sys.getsizeof(name) for name in self.names)
+        )
+
+
+class CatalogSnapshot:
+    """
+    Per-process snapshot of the small dimension tables (branches, faculties,
+    publishers), so serializers resolve names without a join.
+
+    Each table carries the ModelVersions token it was loaded under; the
+    tokens live in the shared cache, so writes in other workers show up
+    here. The token is compared at most every CHECK_INTERVAL seconds; a
+    write in this process forces the check. A lookup of an id the table
+    doesn't know reloads it even under an unchanged token (rows written
+    without signals, an evicted token), at most once per CHECK_INTERVAL.
+    Readers always see a whole table: a reload builds a new one and swaps
+    the reference.
+    """
+    CHECK_INTERVAL = 1.0
+
+    _tables = {}
+    _checked_at = {}
+    _reloaded_at = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def models():
+        from .models import Branch, Faculty, Publisher
+
+        return (Branch, Faculty, Publisher)
+
+    @staticmethod
+    def _load(model, version) -> CatalogTable:
+        return CatalogTable(version, model._default_manager.values_list('id', 'name'))
+
+    @staticmethod
+    def _can_query() -> bool:
+        # The ORM refuses to run inside an event loop; async views serialize
+        # in a sync_to_async thread, anything else lives with the table it has
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        return False
+
+    @classmethod
+    def _reload(cls, model) -> CatalogTable:
+        label = model._meta.label_lower
+        with cls._lock:
+            table = cls._load(model, ModelVersions.version(model))
+            cls._tables[label] = table
+            cls._checked_at[label] = cls._reloaded_at[label] = time.monotonic()
+        return table
+
+    @classmethod
+    def table(cls, model, force_check=False) -> CatalogTable:
+        label = model._meta.label_lower
+        table = cls._tables.get(label)
+        now = time.monotonic()
+        if table is not None and not force_check and now - cls._checked_at.get(label, 0) < cls.CHECK_INTERVAL:
+            return table
+        if table is not None and not cls._can_query():
+            return table
+
+        version = ModelVersions.version(model)
+        cls._checked_at[label] = now
+        if table is not None and table.version == version:
+            return table
+        with cls._lock:
+            table = cls._tables.get(label)
+            if table is None or table.version != version:
+                table = cls._load(model, version)
+                cls._tables[label] = table
+        return table
+
+    @classmethod
+    def name(cls, model, pk, default=None):
+        if pk is None:
+            return default
+        table = cls.table(model)
+        if pk not in table:
+            # A row created since the last check
+            table = cls.table(model, force_check=True)
+            label = model._meta.label_lower
+            if (
+                pk not in table and cls._can_query()
+                and time.monotonic() - cls._reloaded_at.get(label, 0) >= cls.CHECK_INTERVAL
+            ):
+                table = cls._reload(model)
+        return table.name(pk, default)
+
+    @classmethod
+    def branch_name(cls, pk, default=None):
+        from .models import Branch
+
+        return cls.name(Branch, pk, default)
+
+    @classmethod
+    def faculty_name(cls, pk, default=None):
+        from .models import Faculty
+
+        return cls.name(Faculty, pk, default)
+
+    @classmethod
+    def publisher_name(cls, pk, default=None):
+        from .models import Publisher
+
+        return cls.name(Publisher, pk, default)
+
+    @classmethod
+    def refresh(cls) -> None:
+        for model in cls.models():
+            cls.table(model, force_check=True)
+
+    @classmethod
+    def warm(cls) -> bool:
+        """Load every table at worker start; a missing schema just defers it"""
+        try:
+            cls.refresh()
+        except DatabaseError:
+            return False
+        return True
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._tables = {}
+            cls._checked_at = {}
+            cls._reloaded_at = {}
+
+    @classmethod
+    def memory_usage(cls) -> dict:
+        return {label: table.nbytes() for label, table in cls._tables.items()}
+
+    @classmethod
+    def expire(cls, model) -> None:
+        cls._checked_at.pop(model._meta.label_lower, None)
+
+    @classmethod
+    def connect(cls) -> None:
+        """Expire a table on local writes; called from AppConfig.ready"""
+        for model in cls.models():
+            post_save.connect(_expire_on_write, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+            post_delete.connect(_expire_on_write, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+
+
+def _expire_on_write(sender, **kwargs):
+    CatalogSnapshot.expire(sender)
+    # ModelVersions bumps the token again on commit; look at it then too
+    transaction.on_commit(lambda: CatalogSnapshot.expire(sender))
@@ -1,11 +1,14 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from django.utils import timezone
 from .models import (
     Author, Publisher, Book, Branch, BookInventory, 
-    Faculty, BookFacultyUsage, Student, Loan
+    Faculty, BookFacultyUsage, Student, Loan, Reservation
 )
+from .services import ReferenceDataService
+from .sharding import for_branch
 
 class AuthorForm(forms.ModelForm):
     class Meta:
@@ -198,7 +201,7 @@ class LoanForm(forms.ModelForm):
         if student and book and branch:
             # Check if book is available in the branch
             try:
-                inventory = BookInventory.objects.get(book=book, branch=branch)
+                inventory = for_branch(BookInventory.objects, branch.id).get(book=book)
                 if inventory.available_copies <= 0:
                     raise ValidationError('Нет доступных экземпляров этой книги в указанном филиале')
             except BookInventory.DoesNotExist:
@@ -206,6 +209,83 @@ class LoanForm(forms.ModelForm):
 
         return cleaned_data
 
+class ReservationForm(forms.ModelForm):
+    class Meta:
+        model = Reservation
+        fields = ['student', 'book', 'branch']
+        widgets = {
+            'student': forms.Select(attrs={'class': 'form-select'}),
+            'book': forms.Select(attrs={'class': 'form-select'}),
+            'branch': forms.Select(attrs={'class': 'form-select'}),
+        }
+        labels = {
+            'student': 'Студент',
+            'book': 'Книга',
+            'branch': 'Филиал',
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        student = cleaned_data.get('student')
+        book = cleaned_data.get('book')
+        branch = cleaned_data.get('branch')
+
+        if student and book and branch:
+            if not for_branch(BookInventory.objects, branch.id).filter(book=book).exists():
+                raise ValidationError('Книга не найдена в инвентаре указанного филиала')
+            if Reservation.objects.filter(
+                student=student, book=book, branch=branch,
+                status__in=Reservation.OPEN_STATUSES
+            ).exists():
+                raise ValidationError('У студента уже есть активное бронирование этой книги')
+
+        return cleaned_data
+
+class TransferForm(forms.Form):
+    from_branch = forms.ModelChoiceField(
+        queryset=Branch.objects.all(),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Из филиала'
+    )
+    to_branch = forms.ModelChoiceField(
+        queryset=Branch.objects.all(),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='В филиал'
+    )
+    book = forms.ModelChoiceField(
+        queryset=Book.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Книга'
+    )
+    quantity = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+        label='Количество экземпляров'
+    )
+    move_all = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='Переместить все доступные экземпляры филиала'
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        from_branch = cleaned_data.get('from_branch')
+        to_branch = cleaned_data.get('to_branch')
+
+        if from_branch and to_branch and from_branch == to_branch:
+            raise ValidationError('Филиалы отправления и назначения должны различаться')
+        if not cleaned_data.get('move_all'):
+            if not cleaned_data.get('book'):
+                raise ValidationError('Выберите книгу или отметьте перемещение всех экземпляров')
+            if not cleaned_data.get('quantity'):
+                raise ValidationError('Укажите количество экземпляров')
+
+        return cleaned_data
+
 class InventoryForm(forms.ModelForm):
     class Meta:
         model = BookInventory
@@ -264,6 +344,31 @@ class BookFacultyUsageForm(forms.ModelForm):
         return cleaned_data
 
 # Search and Filter Forms
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    """
+    Варианты из кэша справочников. Как и ModelChoiceIterator, читается
+    только при выводе формы: поле создается при импорте модуля, когда
+    таблиц может еще не быть (migrate на пустой базе).
+    """
+    def _rows(self):
+        return ReferenceDataService.rows(self.queryset.model)
+    
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for row in self._rows():
+            yield (row['id'], row['name'])
+    
+    def __len__(self):
+        return len(self._rows()) + (self.field.empty_label is not None)
+    
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._rows())
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """Выбор из справочника: варианты берутся из кэша, а не запросом при каждом выводе"""
+    iterator = ReferenceChoiceIterator
+
 class BookSearchForm(forms.Form):
     search = forms.CharField(
         required=False,
@@ -283,7 +388,7 @@ class BookSearchForm(forms.Form):
         }),
         label='Год издания'
     )
-    publisher = forms.ModelChoiceField(
+    publisher = ReferenceChoiceField(
         queryset=Publisher.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
@@ -299,7 +404,7 @@ class StudentSearchForm(forms.Form):
         }),
         label='Поиск'
     )
-    faculty = forms.ModelChoiceField(
+    faculty = ReferenceChoiceField(
         queryset=Faculty.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
@@ -319,7 +424,7 @@ class LoanSearchForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'}),
         label='Статус'
     )
-    branch = forms.ModelChoiceField(
+    branch = ReferenceChoiceField(
         queryset=Branch.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
@@ -327,7 +432,7 @@ class LoanSearchForm(forms.Form):
     )
 
 class InventorySearchForm(forms.Form):
-    branch = forms.ModelChoiceField(
+    branch = ReferenceChoiceField(
         queryset=Branch.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
@@ -355,13 +460,13 @@ class ReportSearchForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'}),
         label='Период'
     )
-    branch = forms.ModelChoiceField(
+    branch = ReferenceChoiceField(
         queryset=Branch.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
         label='Филиал'
     )
-    faculty = forms.ModelChoiceField(
+    faculty = ReferenceChoiceField(
         queryset=Faculty.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'}),
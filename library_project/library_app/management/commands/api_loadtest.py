@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+# (sync path, async path) pairs with identical payloads
+ENDPOINTS = [
+    ('/api/books/', '/api/async/books/'),
+    ('/api/books/1/', '/api/async/books/1/'),
+    ('/api/inventory/', '/api/async/inventory/'),
+    ('/api/loans/?status=active', '/api/async/loans/?status=active'),
+    ('/api/books/1/inventory/', '/api/async/books/1/inventory/'),
+    ('/api/branches/1/books/', '/api/async/branches/1/books/'),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and latency of the sync API under WSGI with the async API under ASGI. '
+        'Start both servers first, e.g. "gunicorn library_project.wsgi -w 4 -b :8000" and '
+        '"uvicorn library_project.asgi:application --workers 4 --port 8001".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--session', default='', help='sessionid cookie for login-protected endpoints')
+
+    def _fetch(self, url, cookie):
+        request = Request(url, headers={'Cookie': f'sessionid={cookie}'} if cookie else {})
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+                ok = response.status == 200
+        except (URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def _run(self, url, options):
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(
+                lambda _: self._fetch(url, options['session']), range(options['requests'])
+            ))
+            elapsed = time.perf_counter() - started
+        latencies = [latency for latency, ok in results if ok]
+        errors = len(results) - len(latencies)
+        if not latencies:
+            return f'{"all failed":>10}'
+        return (
+            f'{len(latencies) / elapsed:8.1f}/s  '
+            f'p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  '
+            f'p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  '
+            f'errors {errors}'
+        )
+
+    def handle(self, *args, **options):
+        for sync_path, async_path in ENDPOINTS:
+            self.stdout.write(sync_path)
+            self.stdout.write(f'  WSGI  {self._run(options["wsgi_url"] + sync_path, options)}')
+            self.stdout.write(f'  ASGI  {self._run(options["asgi_url"] + async_path, options)}')
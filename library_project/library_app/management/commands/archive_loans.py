@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from library_app.services import LoanArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Move returned loans older than N months into the loan archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=LoanArchiveService.DEFAULT_MONTHS,
+            help='Archive loans returned more than this many months ago'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=LoanArchiveService.BATCH_SIZE,
+            help='Loans moved per transaction'
+        )
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Stop after this many batches; rerun to resume'
+        )
+
+    def handle(self, *args, **options):
+        moved = LoanArchiveService.archive_returned(
+            months=options['months'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} loans'))
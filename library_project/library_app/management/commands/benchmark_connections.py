@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from library_app.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request connection overhead with non-persistent connections '
+        '(CONN_MAX_AGE=0) and persistent ones, replaying the request_started/'
+        'request_finished cycle Django runs around every request. '
+        'Point DB_ENGINE/DB_HOST/... at the database to measure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--conn-max-age', type=int, default=60,
+                            help='CONN_MAX_AGE for the persistent run')
+
+    def _run(self, conn_max_age, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        connects = 0
+
+        def count_connect(**kwargs):
+            nonlocal connects
+            connects += 1
+
+        connection_created.connect(count_connect)
+        latencies = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                Book.objects.filter(pk=1).exists()
+                request_finished.send(sender=self.__class__)
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connection_created.disconnect(count_connect)
+        latencies.sort()
+        return (
+            f'mean {sum(latencies) / len(latencies) * 1000:7.3f}ms  '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.3f}ms  '
+            f'connects {connects}'
+        )
+
+    def handle(self, *args, **options):
+        original = connection.settings_dict['CONN_MAX_AGE']
+        try:
+            self.stdout.write(f'{connection.vendor}, {options["requests"]} requests')
+            self.stdout.write(f'  CONN_MAX_AGE=0   {self._run(0, options["requests"])}')
+            self.stdout.write(
+                f'  CONN_MAX_AGE={options["conn_max_age"]:<3} {self._run(options["conn_max_age"], options["requests"])}'
+            )
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = original
+            connection.close()
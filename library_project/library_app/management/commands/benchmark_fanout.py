@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library_app.services import QueryFanOut
+from library_app.views import dashboard_stat_queries, home_stat_queries
+
+
+class Command(BaseCommand):
+    help = 'Time the home and dashboard statistics queries run sequentially and fanned out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _time(self, run, repeat):
+        run()  # warm up connections and caches
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for name, queries in [('home', home_stat_queries), ('dashboard', dashboard_stat_queries)]:
+            sequential = self._time(lambda: {key: query() for key, query in queries().items()}, repeat)
+            fanned_out = self._time(lambda: QueryFanOut.run(**queries()), repeat)
+            self.stdout.write(
+                f'{name:<10} {len(queries())} queries  '
+                f'sequential {sequential:8.1f}ms  fan-out {fanned_out:8.1f}ms  '
+                f'x{sequential / fanned_out:.2f}'
+            )
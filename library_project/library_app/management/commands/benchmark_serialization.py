@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from library_app.models import Loan
+from library_app.serializers import LOAN, orjson
+
+
+def _model_rows(loans):
+    # The per-instance serializer the loan API used before RowSerializer
+    return [
+        {
+            'id': loan.id,
+            'student': {
+                'id': loan.student.id,
+                'name': loan.student.get_full_name(),
+                'student_id': loan.student.student_id,
+            },
+            'book': {'id': loan.book.id, 'title': loan.book.title},
+            'branch': {'id': loan.branch.id, 'name': loan.branch.name},
+            'issue_date': loan.issue_date.isoformat(),
+            'return_date': loan.return_date.isoformat() if loan.return_date else None,
+            'is_returned': loan.is_returned,
+        }
+        for loan in loans
+    ]
+
+
+def _timed(run):
+    started = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Rows/s of the loan API payload: model instances vs values() rows, stdlib json vs orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        limit = options['rows']
+        queryset = Loan.objects.all()[:limit]
+        count = queryset.count()
+        if not count:
+            raise CommandError('No loans to serialize')
+        LOAN.serialize(queryset[:1])  # compile and load the catalog snapshot
+
+        encoders = [('json', lambda data: json.dumps(data, cls=DjangoJSONEncoder).encode())]
+        if orjson is not None:
+            encoders.append(('orjson', lambda data: orjson.dumps(data)))
+
+        paths = [
+            ('model instances', lambda: _model_rows(queryset.select_related('student', 'book', 'branch'))),
+            ('values() rows', lambda: LOAN.serialize(queryset)),
+        ]
+        self.stdout.write(f'{count} loans')
+        for name, build in paths:
+            rows, build_seconds = _timed(build)
+            for encoder, encode in encoders:
+                body, encode_seconds = _timed(lambda: encode({'results': rows}))
+                total = build_seconds + encode_seconds
+                self.stdout.write(
+                    f'{name:<16} + {encoder:<6}  fetch+build {build_seconds:6.2f} s  '
+                    f'encode {encode_seconds:5.2f} s  {count / total:>9,.0f} rows/s  '
+                    f'{len(body) / 1e6:.1f} MB'
+                )
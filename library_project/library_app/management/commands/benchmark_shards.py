@@ -0,0 +1,139 @@
+import heapq
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+# Same columns and indexes the Loan/BookInventory migrations create
+SCHEMA = [
+    'CREATE TABLE loan (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, '
+    'student_id INTEGER NOT NULL, branch_id INTEGER NOT NULL, issue_date TEXT NOT NULL, '
+    'return_date TEXT, is_returned INTEGER NOT NULL)',
+    'CREATE INDEX loan_branch ON loan (branch_id)',
+    'CREATE INDEX loan_issue_date ON loan (issue_date)',
+    'CREATE INDEX loan_is_returned ON loan (is_returned)',
+    'CREATE INDEX loan_book_branch_returned ON loan (book_id, branch_id, is_returned)',
+    'CREATE TABLE inventory (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, '
+    'branch_id INTEGER NOT NULL, total_copies INTEGER NOT NULL, '
+    'available_copies INTEGER NOT NULL, UNIQUE (book_id, branch_id))',
+    'CREATE INDEX inventory_branch ON inventory (branch_id)',
+]
+
+QUERIES = {
+    'loan page': (
+        'SELECT id, book_id, student_id, issue_date FROM loan '
+        'WHERE branch_id = ? ORDER BY issue_date DESC LIMIT 20'
+    ),
+    'active count': 'SELECT COUNT(*) FROM loan WHERE branch_id = ? AND is_returned = 0',
+    'inventory': (
+        'SELECT book_id, available_copies FROM inventory '
+        'WHERE branch_id = ? AND available_copies > 0'
+    ),
+}
+NEWEST = 'SELECT id, branch_id, issue_date FROM loan ORDER BY issue_date DESC LIMIT 20'
+
+
+def _create(path):
+    db = sqlite3.connect(path)
+    for statement in SCHEMA:
+        db.execute(statement)
+    return db
+
+
+def _rows(branches, loans, books, seed):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    loan_rows = []
+    for pk in range(1, loans + 1):
+        returned = rng.random() < 0.9
+        loan_rows.append((
+            pk, rng.randint(1, books), rng.randint(1, 5000), rng.randint(1, branches),
+            (start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))).isoformat(),
+            None, int(returned)
+        ))
+    inventory_rows = [
+        (pk, book, branch, 3, rng.randint(0, 3))
+        for pk, (book, branch) in enumerate(
+            ((book, branch) for branch in range(1, branches + 1) for book in range(1, books + 1)), 1
+        )
+    ]
+    return loan_rows, inventory_rows
+
+
+def _fill(db, loan_rows, inventory_rows):
+    db.executemany('INSERT INTO loan VALUES (?, ?, ?, ?, ?, ?, ?)', loan_rows)
+    db.executemany('INSERT INTO inventory VALUES (?, ?, ?, ?, ?)', inventory_rows)
+    db.commit()
+    db.execute('ANALYZE')
+
+
+def _median_ms(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = 'Branch-local query latency: one SQLite database vs one file per branch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=20)
+        parser.add_argument('--loans', type=int, default=400000)
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        branches, repeat = options['branches'], options['repeat']
+        loan_rows, inventory_rows = _rows(branches, options['loans'], options['books'], seed=42)
+
+        with tempfile.TemporaryDirectory() as directory:
+            monolith = _create(os.path.join(directory, 'monolith.sqlite3'))
+            _fill(monolith, loan_rows, inventory_rows)
+            shards = {}
+            for branch in range(1, branches + 1):
+                shards[branch] = _create(os.path.join(directory, f'branch_{branch}.sqlite3'))
+                _fill(
+                    shards[branch],
+                    [row for row in loan_rows if row[3] == branch],
+                    [row for row in inventory_rows if row[2] == branch],
+                )
+
+            self.stdout.write(
+                f'{branches} branches, {len(loan_rows)} loans, {len(inventory_rows)} inventory rows; '
+                f'median of {repeat} runs over all branches'
+            )
+            branch_ids = list(range(1, branches + 1))
+            for name, sql in QUERIES.items():
+                single = _median_ms(
+                    lambda: [monolith.execute(sql, [b]).fetchall() for b in branch_ids], repeat
+                ) / branches
+                sharded = _median_ms(
+                    lambda: [shards[b].execute(sql, [b]).fetchall() for b in branch_ids], repeat
+                ) / branches
+                self.stdout.write(
+                    f'{name:<13} one db {single:7.3f} ms  sharded {sharded:7.3f} ms  '
+                    f'x{single / sharded:.1f}'
+                )
+
+            # Cross-branch: one query vs fan-out to every shard and merge
+            single = _median_ms(lambda: monolith.execute(NEWEST).fetchall(), repeat)
+            sharded = _median_ms(lambda: list(heapq.merge(
+                *(shard.execute(NEWEST).fetchall() for shard in shards.values()),
+                key=lambda row: row[2], reverse=True
+            ))[:20], repeat)
+            self.stdout.write(
+                f'{"newest 20":<13} one db {single:7.3f} ms  sharded {sharded:7.3f} ms  '
+                f'(cross-branch, {branches} shards queried sequentially)'
+            )
+
+            monolith.close()
+            for shard in shards.values():
+                shard.close()
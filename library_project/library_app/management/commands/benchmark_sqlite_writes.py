@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+BACKENDS = {
+    'plain': 'django.db.backends.sqlite3',
+    'tuned': 'library_app.backends.sqlite3',
+}
+ALIAS = 'write_contention'
+
+
+def _register(engine, path):
+    connections.settings[ALIAS] = connections.configure_settings(
+        {'default': {'ENGINE': engine, 'NAME': path}}
+    )['default']
+
+
+def _writer(engine, path, writes, results):
+    """One process issuing loan-shaped transactions: read a counter, then write"""
+    _register(engine, path)
+    done = errors = 0
+    for _ in range(writes):
+        try:
+            with transaction.atomic(using=ALIAS):
+                with connections[ALIAS].cursor() as cursor:
+                    cursor.execute('SELECT n FROM bench_counter WHERE id = 1')
+                    n = cursor.fetchone()[0]
+                    cursor.execute('UPDATE bench_counter SET n = %s WHERE id = 1', [n + 1])
+                    cursor.execute('INSERT INTO bench_log (value) VALUES (%s)', [n])
+            done += 1
+        except OperationalError:
+            # "database is locked"
+            errors += 1
+    connections[ALIAS].close()
+    results.put((done, errors))
+
+
+def run_contention(engine, processes=4, writes=200):
+    """
+    Run concurrent writer processes against a fresh SQLite file.
+    Returns committed writes, lock errors, writes/s and whether the counter
+    matches the number of committed writes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'contention.sqlite3')
+        with sqlite3.connect(path) as db:
+            db.execute('CREATE TABLE bench_counter (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)')
+            db.execute('CREATE TABLE bench_log (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            db.execute('INSERT INTO bench_counter (id, n) VALUES (1, 0)')
+        db.close()
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_writer, args=(engine, path, writes, results))
+            for _ in range(processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        db = sqlite3.connect(path)
+        counter = db.execute('SELECT n FROM bench_counter').fetchone()[0]
+        db.close()
+
+    done = sum(outcome[0] for outcome in outcomes)
+    return {
+        'committed': done,
+        'errors': sum(outcome[1] for outcome in outcomes),
+        'writes_per_second': done / elapsed,
+        'consistent': counter == done,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Multi-process SQLite write contention: stock backend vs library_app.backends.sqlite3'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=200, help='Transactions per process')
+
+    def handle(self, *args, **options):
+        for name, engine in BACKENDS.items():
+            result = run_contention(engine, options['processes'], options['writes'])
+            self.stdout.write(
+                f'{name:<6} {result["writes_per_second"]:8.1f} writes/s  '
+                f'committed {result["committed"]}  locked {result["errors"]}  '
+                f'counter {"ok" if result["consistent"] else "LOST UPDATES"}'
+            )
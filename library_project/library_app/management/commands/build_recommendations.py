@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from library_app.services import RecommendationService
+
+
+class Command(BaseCommand):
+    help = 'Build "readers also borrowed" recommendations from the co-loan matrix'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=RecommendationService.DEFAULT_TOP_K,
+            help='Number of neighbours stored per book'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every book instead of only the ones touched by new loans'
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            count = RecommendationService.rebuild(top_k=options['top_k'])
+        else:
+            count = RecommendationService.refresh_stale(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} recommendations'))
@@ -0,0 +1,39 @@
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from library_app.catalog import CatalogSnapshot, CatalogTable
+from library_app.model_versions import ModelVersions
+
+
+def _traced_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+class Command(BaseCommand):
+    help = 'Per-worker memory of the catalog snapshot against the model instances it replaces'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"table":<24}{"rows":>8}{"snapshot":>12}{"instances":>12}{"dict rows":>12}')
+        total = 0
+        for model in CatalogSnapshot.models():
+            manager = model._default_manager
+            version = ModelVersions.version(model)
+            rows = list(manager.values_list('id', 'name'))
+            snapshot = _traced_bytes(lambda: CatalogTable(version, rows))
+            instances = _traced_bytes(lambda: list(manager.all()))
+            dict_rows = _traced_bytes(lambda: [{'id': pk, 'name': name} for pk, name in rows])
+            total += snapshot
+            self.stdout.write(
+                f'{model._meta.label_lower:<24}{len(rows):>8}{snapshot:>12,}{instances:>12,}{dict_rows:>12,}'
+            )
+        self.stdout.write(f'snapshot total per worker: {total:,} bytes (tracemalloc)')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library_app.services import ReservationService
+
+
+class Command(BaseCommand):
+    help = 'Expire uncollected holds and pass their copies to the next reservation in line'
+
+    def handle(self, *args, **options):
+        count = ReservationService.expire_holds()
+        self.stdout.write(self.style.SUCCESS(f'Expired {count} reservations'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from library_app.services import ReconciliationService
+
+
+class Command(BaseCommand):
+    help = 'Check available_copies against active loans and held reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Correct the drifted counters')
+        parser.add_argument('--branch', type=int, help='Only check one branch')
+
+    def handle(self, *args, **options):
+        discrepancies = ReconciliationService.reconcile(fix=options['fix'], branch_id=options['branch'])
+        for row in discrepancies:
+            self.stdout.write(
+                f"book={row['book_id']} branch={row['branch_id']} "
+                f"available={row['available_copies']} expected={row['expected']}"
+            )
+        action = 'Fixed' if options['fix'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(discrepancies)} discrepancies'))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library_app.services import LoanEventProjector
+
+
+class Command(BaseCommand):
+    help = 'Replay the loan event log to rebuild counters and statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='First create events for loans recorded before the event log existed'
+        )
+        parser.add_argument(
+            '--rebuild-inventory', action='store_true',
+            help='Write BookInventory.available_copies from the replayed events'
+        )
+        parser.add_argument('--batch-size', type=int, default=LoanEventProjector.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            created = LoanEventProjector.backfill_from_loans()
+            self.stdout.write(f'Backfilled {created} events')
+
+        started = time.perf_counter()
+        projector = LoanEventProjector().replay(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        events = sum(projector.event_counts.values())
+        self.stdout.write(f'Replayed {events} events in {elapsed:.2f}s')
+
+        for key, value in projector.dashboard_stats().items():
+            self.stdout.write(f'{key}: {value}')
+
+        if options['rebuild_inventory']:
+            changed = projector.rebuild_available_copies()
+            self.stdout.write(self.style.SUCCESS(f'Updated {changed} inventory rows'))
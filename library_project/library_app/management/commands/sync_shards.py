@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library_app.sharding import init_loan_ids, sync_reference_data
+
+
+class Command(BaseCommand):
+    help = 'Copy reference tables to the branch shards and set their loan id ranges'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='aliases',
+            help='Shard alias to sync (repeatable); all of SHARD_DATABASES by default'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.SHARD_DATABASES
+        unknown = set(aliases) - set(settings.SHARD_DATABASES)
+        if unknown:
+            raise CommandError(f'Not in SHARD_DATABASES: {", ".join(sorted(unknown))}')
+        if not aliases:
+            self.stdout.write('Sharding is not configured (SHARD_DATABASES is empty)')
+            return
+
+        for alias in aliases:
+            copied = sync_reference_data(alias)
+            init_loan_ids(alias)
+            summary = ', '.join(f'{label} {count}' for label, count in copied.items())
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {summary}'))
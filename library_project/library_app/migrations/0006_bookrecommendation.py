@@ -0,0 +1,32 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0005_remove_book_description_author_nickname_book_isbn_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(default=0, verbose_name='количество общих читателей')),
+                ('rank', models.PositiveSmallIntegerField(default=0, verbose_name='позиция')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='дата расчета')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='library_app.book', verbose_name='книга')),
+                ('recommended_book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library_app.book', verbose_name='рекомендуемая книга')),
+            ],
+            options={
+                'verbose_name': 'рекомендация',
+                'verbose_name_plural': 'рекомендации',
+                'ordering': ['book', 'rank'],
+                'indexes': [models.Index(fields=['book', 'rank'], name='library_app_book_id_3b8336_idx'), models.Index(fields=['computed_at'], name='library_app_compute_5da243_idx')],
+                'unique_together': {('book', 'recommended_book')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0006_bookrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('waiting', 'в очереди'), ('ready', 'ожидает выдачи'), ('fulfilled', 'выдана'), ('expired', 'просрочена'), ('cancelled', 'отменена')], default='waiting', max_length=10, verbose_name='статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата бронирования')),
+                ('ready_at', models.DateTimeField(blank=True, null=True, verbose_name='дата выделения экземпляра')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='срок получения')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='library_app.book', verbose_name='книга')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='library_app.branch', verbose_name='филиал')),
+                ('loan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='library_app.loan', verbose_name='выдача')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='library_app.student', verbose_name='студент')),
+            ],
+            options={
+                'verbose_name': 'бронирование',
+                'verbose_name_plural': 'бронирования',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['book', 'branch', 'status', 'created_at'], name='reservation_queue_idx'), models.Index(fields=['status', 'expires_at'], name='reservation_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['waiting', 'ready'])), fields=('student', 'book', 'branch'), name='unique_open_reservation'),
+        ),
+    ]
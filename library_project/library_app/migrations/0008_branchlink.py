@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0007_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.PositiveIntegerField(default=1, help_text='Условное расстояние или приоритет: чем меньше, тем ближе', verbose_name='расстояние')),
+                ('from_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to='library_app.branch', verbose_name='филиал')),
+                ('to_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library_app.branch', verbose_name='соседний филиал')),
+            ],
+            options={
+                'verbose_name': 'связь филиалов',
+                'verbose_name_plural': 'связи филиалов',
+                'ordering': ['from_branch', 'distance'],
+                'unique_together': {('from_branch', 'to_branch')},
+            },
+        ),
+    ]
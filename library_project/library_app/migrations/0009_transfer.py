@@ -0,0 +1,51 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('library_app', '0008_branchlink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_transit', 'в пути'), ('received', 'получено'), ('cancelled', 'отменено')], default='in_transit', max_length=10, verbose_name='статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата отправки')),
+                ('received_at', models.DateTimeField(blank=True, null=True, verbose_name='дата получения')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_transfers', to=settings.AUTH_USER_MODEL, verbose_name='создано пользователем')),
+                ('from_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_transfers', to='library_app.branch', verbose_name='из филиала')),
+                ('to_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_transfers', to='library_app.branch', verbose_name='в филиал')),
+            ],
+            options={
+                'verbose_name': 'перемещение',
+                'verbose_name_plural': 'перемещения',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransferItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='количество экземпляров')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library_app.book', verbose_name='книга')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='library_app.transfer', verbose_name='перемещение')),
+            ],
+            options={
+                'verbose_name': 'позиция перемещения',
+                'verbose_name_plural': 'позиции перемещения',
+                'unique_together': {('transfer', 'book')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['status', 'created_at'], name='library_app_status_842859_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0009_transfer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['book', 'branch', 'is_returned'], name='library_app_book_id_aae6a6_idx'),
+        ),
+    ]
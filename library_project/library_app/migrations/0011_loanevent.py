@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0010_loan_book_branch_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('issued', 'выдача'), ('returned', 'возврат'), ('deleted', 'удаление выдачи'), ('transferred', 'перемещение')], max_length=12, verbose_name='тип события')),
+                ('loan_id', models.BigIntegerField(blank=True, null=True, verbose_name='выдача')),
+                ('student_id', models.BigIntegerField(blank=True, null=True, verbose_name='студент')),
+                ('book_id', models.BigIntegerField(verbose_name='книга')),
+                ('branch_id', models.BigIntegerField(verbose_name='филиал')),
+                ('on_loan_delta', models.SmallIntegerField(default=0, verbose_name='изменение числа выданных экземпляров')),
+                ('stock_delta', models.IntegerField(default=0, verbose_name='изменение общего количества экземпляров')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='дата события')),
+            ],
+            options={
+                'verbose_name': 'событие выдачи',
+                'verbose_name_plural': 'журнал событий выдачи',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['created_at'], name='library_app_created_fc18f4_idx'), models.Index(fields=['book_id', 'branch_id'], name='library_app_book_id_65daac_idx')],
+            },
+        ),
+    ]
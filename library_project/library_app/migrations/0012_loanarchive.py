@@ -0,0 +1,33 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_app', '0011_loanevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_id', models.BigIntegerField(unique=True, verbose_name='номер выдачи')),
+                ('issue_date', models.DateTimeField(verbose_name='дата выдачи')),
+                ('return_date', models.DateTimeField(verbose_name='дата возврата')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='год выдачи')),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library_app.book', verbose_name='книга')),
+                ('branch', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library_app.branch', verbose_name='филиал')),
+                ('student', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library_app.student', verbose_name='студент')),
+            ],
+            options={
+                'verbose_name': 'архивная выдача',
+                'verbose_name_plural': 'архив выдач',
+                'ordering': ['-issue_date'],
+                'indexes': [models.Index(fields=['year'], name='library_app_year_571c87_idx'), models.Index(fields=['student', 'issue_date'], name='library_app_student_c40aef_idx'), models.Index(fields=['book', 'issue_date'], name='library_app_book_id_8c2aa9_idx')],
+            },
+        ),
+    ]
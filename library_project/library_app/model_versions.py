@@ -0,0 +1,98 @@
+import time
+
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+class ModelVersions:
+    """
+    Per-model write tokens for cache keys.
+    
+    Every save/delete of a tracked model (and every change of Book.authors)
+    stores a fresh token; cache keys that embed version(model) change with
+    it, so stale entries are never read again and simply expire. The token
+    is bumped again on commit, so a reader that cached the pre-commit rows
+    under the first token cannot keep them.
+    
+    QuerySet.update() and bulk_create() send no signals: set-based writes
+    to a tracked model call bump() themselves.
+    
+    Tokens only reach other worker processes through a shared cache
+    (settings.CACHES: Redis or the database table); check_shared_cache
+    warns when the default cache is per-process.
+    """
+    KEY = 'model_version:{label}'
+    
+    @staticmethod
+    def _key(model) -> str:
+        return ModelVersions.KEY.format(label=model._meta.label_lower)
+    
+    @staticmethod
+    def version(model) -> str:
+        key = ModelVersions._key(model)
+        token = cache.get(key)
+        if token is None:
+            # Unknown after a restart or eviction: start a new generation
+            cache.add(key, f'{time.time_ns():x}', None)
+            token = cache.get(key)
+        return token
+    
+    @staticmethod
+    def versions(*models) -> dict:
+        """version() of several models with one cache.get_many()"""
+        keys = {ModelVersions._key(model): model for model in models}
+        tokens = cache.get_many(list(keys))
+        return {
+            model: tokens[key] if key in tokens else ModelVersions.version(model)
+            for key, model in keys.items()
+        }
+    
+    @staticmethod
+    def bump(model) -> None:
+        key = ModelVersions._key(model)
+        cache.set(key, f'{time.time_ns():x}', None)
+        transaction.on_commit(lambda: cache.set(key, f'{time.time_ns():x}', None))
+    
+    @staticmethod
+    def tracked_models():
+        from .models import Author, Book, Branch, Faculty, Publisher
+        
+        return (Author, Book, Branch, Faculty, Publisher)
+    
+    @staticmethod
+    def connect() -> None:
+        """Hook the tracked models' write signals; called from AppConfig.ready"""
+        from .models import Book
+        
+        for model in ModelVersions.tracked_models():
+            post_save.connect(_bump_on_write, sender=model, dispatch_uid=f'model_version_save_{model.__name__}')
+            post_delete.connect(_bump_on_write, sender=model, dispatch_uid=f'model_version_delete_{model.__name__}')
+        m2m_changed.connect(_bump_book_on_authors, sender=Book.authors.through, dispatch_uid='model_version_book_authors')
+
+
+def check_shared_cache(app_configs, **kwargs):
+    from django.conf import settings
+    
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith(('.LocMemCache', '.DummyCache')):
+        return [checks.Warning(
+            'The default cache is per-process, so a write in one worker never '
+            'changes the ModelVersions tokens of the others and their cached '
+            'fragments, reference rows and catalog snapshot stay stale.',
+            hint='Use the Redis or database cache from settings.CACHES, or run a single process.',
+            id='library_app.W001',
+        )]
+    return []
+
+
+def _bump_on_write(sender, **kwargs):
+    ModelVersions.bump(sender)
+
+
+def _bump_book_on_authors(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        from .models import Book
+        
+        ModelVersions.bump(Book)
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 
+from .pubsub import notify_availability
+from .sharding import pin_to_shard, shard_for_branch
+
 class LibraryBusinessError(Exception):
     """Пользовательское исключение для ошибок бизнес-логики библиотеки"""
     pass
@@ -182,7 +186,42 @@ class BookInventory(models.Model):
     def save(self, *args, **kwargs):
         """Переопределение save для автоматической валидации"""
         self.full_clean()
-        super().save(*args, **kwargs)
+        super().save(*args, **pin_to_shard(self, kwargs))
+        notify_availability(self.branch_id, [self.book_id])
+
+class BranchLink(models.Model):
+    """Связь между филиалами (ребро графа расстояний между филиалами)"""
+    from_branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('филиал'),
+        on_delete=models.CASCADE,
+        related_name='links'
+    )
+    to_branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('соседний филиал'),
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    distance = models.PositiveIntegerField(
+        _('расстояние'),
+        default=1,
+        help_text=_('Условное расстояние или приоритет: чем меньше, тем ближе')
+    )
+    
+    class Meta:
+        verbose_name = _('связь филиалов')
+        verbose_name_plural = _('связи филиалов')
+        unique_together = ['from_branch', 'to_branch']
+        ordering = ['from_branch', 'distance']
+    
+    def __str__(self):
+        return f"{self.from_branch_id} <-> {self.to_branch_id} ({self.distance})"
+    
+    def clean(self):
+        """Валидация связи филиалов"""
+        if self.from_branch_id and self.from_branch_id == self.to_branch_id:
+            raise ValidationError(_('Филиал не может быть связан сам с собой'))
 
 class Faculty(models.Model):
     """Модель факультета"""
@@ -317,6 +356,7 @@ class Loan(models.Model):
         indexes = [
             models.Index(fields=['issue_date']),
             models.Index(fields=['is_returned']),
+            models.Index(fields=['book', 'branch', 'is_returned']),
         ]
     
     def __str__(self):
@@ -328,7 +368,7 @@ class Loan(models.Model):
         # Проверка доступности книги в филиале
         if not self.pk:  # Только для новых выдач
             try:
-                inventory = BookInventory.objects.get(book=self.book, branch=self.branch)
+                inventory = self._inventory()
                 if inventory.available_copies <= 0:
                     raise ValidationError(_('Нет доступных экземпляров этой книги в указанном филиале'))
             except BookInventory.DoesNotExist:
@@ -338,41 +378,377 @@ class Loan(models.Model):
         if self.return_date and self.return_date < self.issue_date:
             raise ValidationError({'return_date': _('Дата возврата не может быть раньше даты выдачи')})
     
+    def _inventory(self):
+        """Инвентарь книги в филиале выдачи (в шарде филиала)"""
+        return BookInventory.objects.using(shard_for_branch(self.branch_id)).get(
+            book=self.book, branch=self.branch
+        )
+    
+    @transaction.atomic
     def save(self, *args, **kwargs):
         """Переопределение save для обработки бизнес-логики"""
         is_new = self.pk is None
+        event_type = None
         
-        if is_new:
-            # Уменьшаем количество доступных экземпляров
-            inventory = BookInventory.objects.get(book=self.book, branch=self.branch)
-            if inventory.available_copies <= 0:
-                raise LibraryBusinessError(_('Нет доступных экземпляров для выдачи'))
-            
-            inventory.available_copies -= 1
-            inventory.save()
+        # Валидация до изменения инвентаря, иначе последний экземпляр не выдать
+        self.full_clean()
         
-        elif self.is_returned and not self.return_date:
-            # Автоматически устанавливаем дату возврата при отметке о возврате
-            from django.utils import timezone
-            self.return_date = timezone.now()
+        # Инвентарь и выдача лежат в одной базе (шарде филиала)
+        with transaction.atomic(using=shard_for_branch(self.branch_id), savepoint=False):
+            if is_new:
+                # Уменьшаем количество доступных экземпляров
+                inventory = self._inventory()
+                if inventory.available_copies <= 0:
+                    raise LibraryBusinessError(_('Нет доступных экземпляров для выдачи'))
+                
+                inventory.available_copies -= 1
+                inventory.save()
+                event_type = LoanEvent.ISSUED
             
-            # Увеличиваем количество доступных экземпляров
-            inventory = BookInventory.objects.get(book=self.book, branch=self.branch)
-            inventory.available_copies += 1
-            inventory.save()
+            elif self.is_returned and not self.return_date:
+                # Автоматически устанавливаем дату возврата при отметке о возврате
+                self.return_date = timezone.now()
+                
+                # Увеличиваем количество доступных экземпляров
+                inventory = self._inventory()
+                inventory.available_copies += 1
+                inventory.save()
+                event_type = LoanEvent.RETURNED
+            
+            super().save(*args, **pin_to_shard(self, kwargs))
         
-        self.full_clean()
-        super().save(*args, **kwargs)
+        if event_type:
+            LoanEvent.record_for_loan(self, event_type)
     
+    @transaction.atomic
     def delete(self, *args, **kwargs):
         """Переопределение delete для корректного управления инвентарем"""
-        if not self.is_returned:
-            # Увеличиваем количество доступных экземпляров при удалении не возвращенной книги
-            inventory = BookInventory.objects.get(book=self.book, branch=self.branch)
-            inventory.available_copies += 1
-            inventory.save()
-        
-        super().delete(*args, **kwargs)
+        with transaction.atomic(using=shard_for_branch(self.branch_id), savepoint=False):
+            if not self.is_returned:
+                # Увеличиваем количество доступных экземпляров при удалении не возвращенной книги
+                inventory = self._inventory()
+                inventory.available_copies += 1
+                inventory.save()
+            
+            LoanEvent.record_for_loan(self, LoanEvent.DELETED)
+            return super().delete(*args, **kwargs)
+
+class LoanEvent(models.Model):
+    """Журнал событий выдачи: записи только добавляются, не изменяются"""
+    ISSUED = 'issued'
+    RETURNED = 'returned'
+    DELETED = 'deleted'
+    TRANSFERRED = 'transferred'
+    EVENT_CHOICES = [
+        (ISSUED, _('выдача')),
+        (RETURNED, _('возврат')),
+        (DELETED, _('удаление выдачи')),
+        (TRANSFERRED, _('перемещение')),
+    ]
+    
+    event_type = models.CharField(_('тип события'), max_length=12, choices=EVENT_CHOICES)
+    # Идентификаторы без внешних ключей: журнал переживает удаление записей
+    loan_id = models.BigIntegerField(_('выдача'), blank=True, null=True)
+    student_id = models.BigIntegerField(_('студент'), blank=True, null=True)
+    book_id = models.BigIntegerField(_('книга'))
+    branch_id = models.BigIntegerField(_('филиал'))
+    on_loan_delta = models.SmallIntegerField(
+        _('изменение числа выданных экземпляров'),
+        default=0
+    )
+    stock_delta = models.IntegerField(
+        _('изменение общего количества экземпляров'),
+        default=0
+    )
+    created_at = models.DateTimeField(_('дата события'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('событие выдачи')
+        verbose_name_plural = _('журнал событий выдачи')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['book_id', 'branch_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()}: {self.book_id}@{self.branch_id}"
+    
+    def save(self, *args, **kwargs):
+        """Журнал только для добавления"""
+        if self.pk is not None:
+            raise LibraryBusinessError(_('События журнала нельзя изменять'))
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise LibraryBusinessError(_('События журнала нельзя удалять'))
+    
+    @classmethod
+    def record_for_loan(cls, loan, event_type):
+        """Записывает событие по выдаче"""
+        if event_type == cls.ISSUED:
+            on_loan_delta = 1
+        elif event_type == cls.RETURNED or (event_type == cls.DELETED and not loan.is_returned):
+            on_loan_delta = -1
+        else:
+            on_loan_delta = 0
+        return cls.objects.create(
+            event_type=event_type,
+            loan_id=loan.pk,
+            student_id=loan.student_id,
+            book_id=loan.book_id,
+            branch_id=loan.branch_id,
+            on_loan_delta=on_loan_delta
+        )
+
+class LoanArchive(models.Model):
+    """Архив возвращенных выдач: компактная копия без ограничений внешних ключей"""
+    loan_id = models.BigIntegerField(_('номер выдачи'), unique=True)
+    student = models.ForeignKey(
+        Student,
+        verbose_name=_('студент'),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    book = models.ForeignKey(
+        Book,
+        verbose_name=_('книга'),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('филиал'),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    issue_date = models.DateTimeField(_('дата выдачи'))
+    return_date = models.DateTimeField(_('дата возврата'))
+    # Ключ секционирования по году выдачи
+    year = models.PositiveSmallIntegerField(_('год выдачи'))
+    
+    # Совместимость с шаблонами истории выдач
+    is_returned = True
+    is_archived = True
+    
+    class Meta:
+        verbose_name = _('архивная выдача')
+        verbose_name_plural = _('архив выдач')
+        ordering = ['-issue_date']
+        indexes = [
+            models.Index(fields=['year']),
+            models.Index(fields=['student', 'issue_date']),
+            models.Index(fields=['book', 'issue_date']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.loan_id}: {self.book_id} ({self.year})"
+    
+    @classmethod
+    def from_loan(cls, loan):
+        """Создает архивную запись по возвращенной выдаче"""
+        return cls(
+            loan_id=loan.pk,
+            student_id=loan.student_id,
+            book_id=loan.book_id,
+            branch_id=loan.branch_id,
+            issue_date=loan.issue_date,
+            return_date=loan.return_date,
+            year=loan.issue_date.year
+        )
+
+class Reservation(models.Model):
+    """Модель бронирования книги в филиале (очередь ожидания)"""
+    STATUS_WAITING = 'waiting'
+    STATUS_READY = 'ready'
+    STATUS_FULFILLED = 'fulfilled'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_WAITING, _('в очереди')),
+        (STATUS_READY, _('ожидает выдачи')),
+        (STATUS_FULFILLED, _('выдана')),
+        (STATUS_EXPIRED, _('просрочена')),
+        (STATUS_CANCELLED, _('отменена')),
+    ]
+    OPEN_STATUSES = (STATUS_WAITING, STATUS_READY)
+    
+    student = models.ForeignKey(
+        Student,
+        verbose_name=_('студент'),
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    book = models.ForeignKey(
+        Book,
+        verbose_name=_('книга'),
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('филиал'),
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    status = models.CharField(
+        _('статус'),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_WAITING
+    )
+    created_at = models.DateTimeField(_('дата бронирования'), auto_now_add=True)
+    ready_at = models.DateTimeField(_('дата выделения экземпляра'), blank=True, null=True)
+    expires_at = models.DateTimeField(_('срок получения'), blank=True, null=True)
+    loan = models.ForeignKey(
+        Loan,
+        verbose_name=_('выдача'),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
+    class Meta:
+        verbose_name = _('бронирование')
+        verbose_name_plural = _('бронирования')
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Голова очереди: WHERE book, branch, status ORDER BY created_at
+            models.Index(fields=['book', 'branch', 'status', 'created_at'], name='reservation_queue_idx'),
+            models.Index(fields=['status', 'expires_at'], name='reservation_expiry_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'book', 'branch'],
+                condition=models.Q(status__in=['waiting', 'ready']),
+                name='unique_open_reservation'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.student} - {self.book} ({self.get_status_display()})"
+    
+    def is_open(self):
+        """Проверяет, активно ли бронирование"""
+        return self.status in self.OPEN_STATUSES
+
+class Transfer(models.Model):
+    """Модель перемещения экземпляров между филиалами"""
+    STATUS_IN_TRANSIT = 'in_transit'
+    STATUS_RECEIVED = 'received'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_IN_TRANSIT, _('в пути')),
+        (STATUS_RECEIVED, _('получено')),
+        (STATUS_CANCELLED, _('отменено')),
+    ]
+    
+    from_branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('из филиала'),
+        on_delete=models.CASCADE,
+        related_name='outgoing_transfers'
+    )
+    to_branch = models.ForeignKey(
+        Branch,
+        verbose_name=_('в филиал'),
+        on_delete=models.CASCADE,
+        related_name='incoming_transfers'
+    )
+    status = models.CharField(
+        _('статус'),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_IN_TRANSIT
+    )
+    created_at = models.DateTimeField(_('дата отправки'), auto_now_add=True)
+    received_at = models.DateTimeField(_('дата получения'), blank=True, null=True)
+    created_by = models.ForeignKey(
+        User,
+        verbose_name=_('создано пользователем'),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='created_transfers'
+    )
+    
+    class Meta:
+        verbose_name = _('перемещение')
+        verbose_name_plural = _('перемещения')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.from_branch} -> {self.to_branch} ({self.get_status_display()})"
+    
+    def clean(self):
+        """Валидация перемещения"""
+        if self.from_branch_id and self.from_branch_id == self.to_branch_id:
+            raise ValidationError(_('Филиалы отправления и назначения должны различаться'))
+
+class TransferItem(models.Model):
+    """Позиция перемещения: книга и количество экземпляров"""
+    transfer = models.ForeignKey(
+        Transfer,
+        verbose_name=_('перемещение'),
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    book = models.ForeignKey(
+        Book,
+        verbose_name=_('книга'),
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    quantity = models.PositiveIntegerField(_('количество экземпляров'), default=1)
+    
+    class Meta:
+        verbose_name = _('позиция перемещения')
+        verbose_name_plural = _('позиции перемещения')
+        unique_together = ['transfer', 'book']
+    
+    def __str__(self):
+        return f"{self.book_id} x{self.quantity}"
+
+class BookRecommendation(models.Model):
+    """Предрассчитанные рекомендации «Читатели также брали»"""
+    book = models.ForeignKey(
+        Book,
+        verbose_name=_('книга'),
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    recommended_book = models.ForeignKey(
+        Book,
+        verbose_name=_('рекомендуемая книга'),
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.PositiveIntegerField(
+        _('количество общих читателей'),
+        default=0
+    )
+    rank = models.PositiveSmallIntegerField(_('позиция'), default=0)
+    computed_at = models.DateTimeField(_('дата расчета'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('рекомендация')
+        verbose_name_plural = _('рекомендации')
+        unique_together = ['book', 'recommended_book']
+        ordering = ['book', 'rank']
+        indexes = [
+            models.Index(fields=['book', 'rank']),
+            models.Index(fields=['computed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_book_id} ({self.score})"
 
 # Add this to your models.py file in the library_app
 class ReadingRoom(models.Model):
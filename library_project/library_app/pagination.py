@@ -0,0 +1,174 @@
+import binascii
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts exactly only small result sets.
+    
+    A bounded COUNT over at most EXACT_COUNT_LIMIT + 1 rows decides; above
+    the limit the total comes from the PostgreSQL planner estimate or, on
+    backends without one (SQLite), from an exact COUNT(*) cached for
+    COUNT_CACHE_TTL seconds. Such counts are shown as "about N" and the last
+    pages may come out short or empty.
+    """
+    
+    EXACT_COUNT_LIMIT = 10000
+    COUNT_CACHE_TTL = 300
+    
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list)
+        queryset = self.object_list.order_by().select_related(None)
+        connection = connections[queryset.db]
+        
+        cache_key = None
+        if connection.vendor != 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            digest = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+            cache_key = f'paginator:count:{digest}'
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        bounded = queryset[:self.EXACT_COUNT_LIMIT + 1].count()
+        if bounded <= self.EXACT_COUNT_LIMIT:
+            return bounded
+        if cache_key is None:
+            # Never report fewer rows than the bounded count has just seen
+            return max(self._planner_estimate(queryset), bounded)
+        count = queryset.count()
+        cache.set(cache_key, count, self.COUNT_CACHE_TTL)
+        return count
+    
+    @property
+    def is_estimated(self) -> bool:
+        return self.count > self.EXACT_COUNT_LIMIT
+    
+    @staticmethod
+    def _planner_estimate(queryset) -> int:
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApiPagination:
+    """
+    Bounded pagination and the envelope shared by the list APIs:
+    
+        {"count", "count_estimated", "page", "per_page", "next_cursor", "results"}
+    
+    ?page=&per_page= pages by offset. count comes from
+    EstimatedCountPaginator: count_estimated is true when it is a planner
+    estimate or a cached count that may lag behind the table. per_page is clamped to MAX_PAGE_SIZE
+    and offsets stop at MAX_OFFSET, so no parameter pulls more than one
+    page into memory or makes the database skip millions of rows.
+    ?cursor= pages by keyset on `ordering` (an empty cursor starts the
+    list): no COUNT and no OFFSET, so count, count_estimated and page
+    are null. Every page
+    with a successor carries next_cursor, so offset clients can switch to
+    cursors mid-list. Bad parameters raise ValueError.
+    """
+    
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    MAX_OFFSET = 100000
+    
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+        self.keys = tuple(field.lstrip('-') for field in self.ordering)
+    
+    @staticmethod
+    def _positive_int(request, name, default) -> int:
+        value = request.GET.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError(f'Parameter "{name}" must be an integer')
+        if number < 1:
+            raise ValueError(f'Parameter "{name}" must be positive')
+        return number
+    
+    @staticmethod
+    def _cursor_value(value):
+        # Full precision: DjangoJSONEncoder cuts datetimes to milliseconds,
+        # and a truncated key would skip the rows of that millisecond
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    
+    def encode_cursor(self, values) -> str:
+        payload = json.dumps(list(values), default=self._cursor_value, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, model, token) -> list:
+        try:
+            values = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError
+            return [model._meta.get_field(key).to_python(value) for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, ValidationError, binascii.Error):
+            raise ValueError('Invalid cursor')
+    
+    def _after(self, values) -> Q:
+        # (a, b) > (x, y) as a OR of prefixes, each column in its own direction
+        condition, equal = Q(), {}
+        for field, key, value in zip(self.ordering, self.keys, values):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{key}__{lookup}': value})
+            equal[key] = value
+        return condition
+    
+    def paginate(self, request, queryset, serializer, fields=None) -> dict:
+        per_page = min(
+            self._positive_int(request, 'per_page', self.DEFAULT_PAGE_SIZE), self.MAX_PAGE_SIZE
+        )
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.GET.get('cursor')
+        if cursor is None:
+            page = self._positive_int(request, 'page', 1)
+            start = (page - 1) * per_page
+            if start > self.MAX_OFFSET:
+                raise ValueError(f'Offsets past {self.MAX_OFFSET} rows need ?cursor=')
+            paginator = EstimatedCountPaginator(queryset, per_page)
+            count = paginator.count
+            estimated = paginator.is_estimated
+        else:
+            page = count = estimated = None
+            start = 0
+            if cursor:
+                queryset = queryset.filter(self._after(self.decode_cursor(queryset.model, cursor)))
+        
+        # One extra row tells whether a next page exists
+        rows, keys = serializer.compile(fields, self.keys).keyed_rows(queryset[start:start + per_page + 1])
+        return {
+            'count': count,
+            'count_estimated': estimated,
+            'page': page,
+            'per_page': per_page,
+            'next_cursor': self.encode_cursor(keys[per_page - 1]) if len(rows) > per_page else None,
+            'results': rows[:per_page],
+        }
+    
+    async def apaginate(self, request, queryset, serializer, fields=None) -> dict:
+        """
+        paginate() in one thread-pool hop, like RowSerializer.aserialize():
+        the count, the page and its Related loaders would each take a hop
+        through Django 4.2's async ORM.
+        """
+        return await sync_to_async(self.paginate)(request, queryset, serializer, fields)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+
+class Subscription:
+    """One live screen: a bounded queue owned by the subscriber's event loop"""
+    QUEUE_SIZE = 100
+
+    def __init__(self, branch_id: int, loop):
+        self.branch_id = branch_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+
+    def push(self, event: dict) -> None:
+        """Runs on the subscriber's loop; a slow screen loses its oldest events"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class AvailabilityBroker:
+    """
+    In-process pub/sub for BookInventory availability, keyed by branch.
+    
+    Publishers are the sync inventory write paths, subscribers are async SSE
+    streams, so events cross threads via call_soon_threadsafe. Only screens
+    connected to this process see the writes made in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def has_subscribers(self, branch_id: int) -> bool:
+        return bool(self._subscribers.get(branch_id))
+
+    def subscribe(self, branch_id: int) -> Subscription:
+        subscription = Subscription(branch_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[branch_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.branch_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.branch_id]
+
+    def publish(self, branch_id: int, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(branch_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The subscriber's loop is gone
+                self.unsubscribe(subscription)
+
+
+broker = AvailabilityBroker()
+
+
+def availability_snapshot(branch_id: int, book_ids=None) -> dict:
+    """Current availability of (some) books in a branch as an SSE payload"""
+    from .models import BookInventory
+    from .sharding import for_branch
+
+    inventory = for_branch(BookInventory.objects, branch_id)
+    if book_ids is not None:
+        inventory = inventory.filter(book_id__in=list(book_ids))
+    return {
+        'branch_id': branch_id,
+        'books': list(inventory.order_by().values('book_id', 'available_copies', 'total_copies')),
+    }
+
+
+def notify_availability(branch_id: int, book_ids) -> None:
+    """
+    Called by inventory write paths. Free when nobody in this process listens
+    to the branch; otherwise the changed rows are read once after commit and
+    fanned out to every screen, however many there are. The commit awaited
+    is the one on the branch's shard, where the inventory rows live.
+    """
+    if not broker.has_subscribers(branch_id):
+        return
+    from .sharding import shard_for_branch
+
+    book_ids = list(book_ids)
+    transaction.on_commit(
+        lambda: broker.publish(branch_id, availability_snapshot(branch_id, book_ids)),
+        using=shard_for_branch(branch_id)
+    )
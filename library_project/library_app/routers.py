@@ -0,0 +1,138 @@
+"""
+Read-replica routing.
+
+Only code that opts in reads from the replica: read-only views wrapped with
+replica_reads() and queries pinned with read_db(). Once a request has
+written to the primary, the rest of it - and the same session for
+REPLICA_STICKY_SECONDS afterwards - reads from the primary again, so users
+always see their own writes despite replication lag.
+"""
+import contextvars
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_SESSION_KEY = '_db_primary_until'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+_wrote_to_primary = contextvars.ContextVar('wrote_to_primary', default=False)
+
+
+def replica_configured() -> bool:
+    return bool(getattr(settings, 'REPLICA_DATABASE', None))
+
+
+def read_db() -> str:
+    """Alias that a read may use right now: the replica unless it could miss our writes"""
+    if not replica_configured() or _pinned_to_primary.get() or _wrote_to_primary.get():
+        return DEFAULT_DB_ALIAS
+    return settings.REPLICA_DATABASE
+
+
+def replica_reads(view_func):
+    """Route the view's library_app reads to the replica (sync and async views)"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view_func(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return view_func(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return _wrapped_view
+
+
+class ReplicaRouter:
+    """Primary for writes and by default; replica for opted-in library_app reads"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label == 'library_app':
+            return read_db()
+        # None lets Django keep related lookups on the instance's database
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes for the rest of this request / context. Only the
+        # replica-read app counts: sessions, last_login and the database
+        # cache (app_label 'django_cache') are never read from the replica
+        if model._meta.app_label == 'library_app':
+            _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, getattr(settings, 'REPLICA_DATABASE', None)}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Keeps a session on the primary for a while after it wrote something.
+    
+    Sync and async capable, so under ASGI the async views don't pay a
+    thread hop for it. Without a replica there is nothing to stick to and
+    the session is left alone; with one, an async request loads the
+    session in a thread (Django 4.2 sessions are sync only).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _sticky(request) -> bool:
+        session = getattr(request, 'session', None)
+        return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+    @staticmethod
+    def _mark_sticky(request) -> None:
+        session = getattr(request, 'session', None)
+        if session is not None and replica_configured():
+            session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sticky = replica_configured() and self._sticky(request)
+        pinned_token = _pinned_to_primary.set(sticky)
+        wrote_token = _wrote_to_primary.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote_to_primary.get()
+        finally:
+            _pinned_to_primary.reset(pinned_token)
+            _wrote_to_primary.reset(wrote_token)
+        if wrote:
+            self._mark_sticky(request)
+        return response
+
+    async def __acall__(self, request):
+        sticky = replica_configured() and await sync_to_async(self._sticky)(request)
+        pinned_token = _pinned_to_primary.set(sticky)
+        wrote_token = _wrote_to_primary.set(False)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote_to_primary.get()
+        finally:
+            _pinned_to_primary.reset(pinned_token)
+            _wrote_to_primary.reset(wrote_token)
+        if wrote:
+            self._mark_sticky(request)
+        return response
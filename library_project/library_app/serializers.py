@@ -0,0 +1,363 @@
+import json
+from collections import defaultdict
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.http import HttpResponse
+
+from .catalog import CatalogSnapshot
+from .models import Author, BookInventory
+from .sharding import shard_aliases, sharding_enabled
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _author_name(last_name, first_name, middle_name):
+    # Same text as Author.__str__
+    if middle_name:
+        return f'{last_name} {first_name} {middle_name}'
+    return f'{last_name} {first_name}'
+
+
+class Field:
+    """
+    One output key: the values() columns it reads and the Python
+    expression that builds it from them (columns are in scope by name,
+    with __ kept, e.g. book__title). default=False keeps it out of the
+    payload unless ?fields= asks for it.
+    """
+    __slots__ = ('columns', 'expression', 'default')
+
+    def __init__(self, columns, expression=None, default=True):
+        self.columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        self.expression = expression or self.columns[0]
+        self.default = default
+
+
+class Related:
+    """
+    A value loaded with one grouped query for the whole page.
+    loader(keys) returns {key: value}; rows without an entry get empty.
+    """
+    __slots__ = ('key', 'loader', 'empty', 'default')
+
+    def __init__(self, key, loader, empty=(), default=True):
+        self.key = key
+        self.loader = loader
+        self.empty = list(empty) if isinstance(empty, tuple) else empty
+        self.default = default
+
+
+class FieldSet:
+    """The names a ?fields= parameter may pick from, and the default pick"""
+
+    def __init__(self, names, defaults=None):
+        self.names = tuple(names)
+        self.defaults = tuple(defaults or self.names)
+
+    def select(self, value):
+        """
+        'id,title' -> ('id', 'title') in declaration order; empty -> the
+        defaults. Unknown names raise ValueError.
+        """
+        requested = {name.strip() for name in (value or '').split(',') if name.strip()}
+        if not requested:
+            return self.defaults
+        unknown = requested.difference(self.names)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return tuple(name for name in self.names if name in requested)
+
+    def pick(self, item: dict, names) -> dict:
+        return {name: item[name] for name in names}
+
+
+class RowSerializer(FieldSet):
+    """
+    values_list() rows to API dicts without model instances.
+
+    The field spec is compiled once per field selection into a single
+    list comprehension that unpacks each row tuple and builds the dict
+    literal, so a page costs one SQL query (plus one per Related field)
+    and no per-row attribute walking or function calls beyond the
+    conversions the payload needs.
+    """
+    HELPERS = {
+        'iso': _iso,
+        'to_float': _float,
+        'branch_name': CatalogSnapshot.branch_name,
+        'publisher_name': CatalogSnapshot.publisher_name,
+    }
+
+    def __init__(self, fields: dict):
+        super().__init__(fields, [name for name, field in fields.items() if field.default])
+        self.fields = fields
+        self._compiled = {}
+
+    def compile(self, names=None, keys=()):
+        """Row function for the field names; keys are extra columns read for keyed_rows()"""
+        names = tuple(names or self.defaults)
+        compiled = self._compiled.get((names, keys))
+        if compiled is None:
+            compiled = self._compiled[names, keys] = _CompiledRows(self.fields, names, self.HELPERS, keys)
+        return compiled
+
+    def serialize(self, queryset, names=None) -> list:
+        return self.compile(names).rows(queryset)
+
+    async def aserialize(self, queryset, names=None) -> list:
+        """
+        serialize() in one thread-pool hop. Django 4.2's async ORM (async
+        for, acount) runs each query through sync_to_async itself, so
+        awaiting the rows and every Related loader would take more hops,
+        not fewer; in the thread the catalog snapshot also checks its
+        tokens as in a sync view.
+        """
+        return await sync_to_async(self.serialize)(queryset, names)
+
+
+class _CompiledRows:
+    def __init__(self, fields, names, helpers, keys=()):
+        columns = []
+        related = {}
+        for name in names:
+            field = fields[name]
+            if isinstance(field, Related):
+                related[name] = field
+                field_columns = (field.key,)
+            else:
+                field_columns = field.columns
+            for column in field_columns:
+                if column not in columns:
+                    columns.append(column)
+        columns.extend(column for column in keys if column not in columns)
+
+        items = []
+        for name in names:
+            field = fields[name]
+            if isinstance(field, Related):
+                items.append(f'{name!r}: {name}.get({field.key}, {field.empty!r})')
+            else:
+                items.append(f'{name!r}: {field.expression}')
+        target = ', '.join(columns) + (',' if len(columns) == 1 else '')
+        source = (
+            f'def serialize(rows, {", ".join(related) or "_=None"}):\n'
+            f'    return [{{{", ".join(items)}}} for ({target}) in rows]\n'
+        )
+        namespace = dict(helpers)
+        exec(compile(source, f'<serializer {", ".join(names)}>', 'exec'), namespace)
+
+        self.columns = tuple(columns)
+        self.key_indexes = tuple(columns.index(column) for column in keys)
+        self.related = related
+        self.source = source
+        self.function = namespace['serialize']
+
+    def rows(self, queryset) -> list:
+        return self._serialize(list(queryset.values_list(*self.columns)))
+
+    def keyed_rows(self, queryset):
+        """Serialized rows plus each row's key column values, as a (rows, keys) pair"""
+        rows = list(queryset.values_list(*self.columns))
+        keys = [tuple(row[index] for index in self.key_indexes) for row in rows]
+        return self._serialize(rows), keys
+
+    def _serialize(self, rows) -> list:
+        if not self.related:
+            return self.function(rows)
+        loaded = {}
+        for name, field in self.related.items():
+            index = self.columns.index(field.key)
+            keys = {row[index] for row in rows}
+            loaded[name] = field.loader(keys) if keys else {}
+        return self.function(rows, **loaded)
+
+
+def _book_author_rows(book_ids):
+    # Author's default ordering, as book.authors.all() returns them
+    return Author.objects.filter(books__id__in=book_ids).values_list(
+        'books__id', 'id', 'last_name', 'first_name', 'middle_name'
+    )
+
+
+def book_authors(book_ids) -> dict:
+    """{book id: [author name, ...]}"""
+    authors = defaultdict(list)
+    for book_id, _, last_name, first_name, middle_name in _book_author_rows(book_ids):
+        authors[book_id].append(_author_name(last_name, first_name, middle_name))
+    return authors
+
+
+def book_authors_display(book_ids) -> dict:
+    """{book id: 'Author One, Author Two'} as Book.get_authors_display()"""
+    return {book_id: ', '.join(names) for book_id, names in book_authors(book_ids).items()}
+
+
+def book_author_records(book_ids) -> dict:
+    """{book id: [{'id', 'last_name', 'first_name', 'middle_name'}, ...]}"""
+    authors = defaultdict(list)
+    for book_id, pk, last_name, first_name, middle_name in _book_author_rows(book_ids):
+        authors[book_id].append({
+            'id': pk, 'last_name': last_name, 'first_name': first_name, 'middle_name': middle_name,
+        })
+    return authors
+
+
+def _inventory_querysets():
+    # Inventory of every branch: one queryset per shard
+    if sharding_enabled():
+        return [BookInventory.objects.using(alias) for alias in shard_aliases()]
+    return [BookInventory.objects.all()]
+
+
+def book_available_copies(book_ids) -> dict:
+    """{book id: available copies over all branches}, one query per shard"""
+    totals = defaultdict(int)
+    for queryset in _inventory_querysets():
+        for book_id, available in queryset.filter(book_id__in=book_ids).order_by().values(
+            'book_id'
+        ).annotate(available=Sum('available_copies')).values_list('book_id', 'available'):
+            totals[book_id] += available
+    return totals
+
+
+def book_inventory(book_ids) -> dict:
+    """
+    {book id: [{'branch_id', 'branch', 'total_copies', 'available_copies'}]}
+    by branch name, one query per shard
+    """
+    inventory = defaultdict(list)
+    for queryset in _inventory_querysets():
+        for book_id, branch_id, total, available in queryset.filter(book_id__in=book_ids).order_by().values_list(
+            'book_id', 'branch_id', 'total_copies', 'available_copies'
+        ):
+            inventory[book_id].append({
+                'branch_id': branch_id,
+                'branch': CatalogSnapshot.branch_name(branch_id),
+                'total_copies': total,
+                'available_copies': available,
+            })
+    for items in inventory.values():
+        items.sort(key=lambda item: item['branch'] or '')
+    return inventory
+
+
+BOOK_SUMMARY = RowSerializer({
+    'id': Field('id'),
+    'title': Field('title'),
+    'publication_year': Field('publication_year'),
+    'page_count': Field('page_count'),
+    'price': Field('price', 'to_float(price)'),
+    'publisher': Field('publisher_id', 'publisher_name(publisher_id)'),
+    'authors': Related('id', book_authors),
+    'created_at': Field('created_at', 'iso(created_at)'),
+    'available_copies': Related('id', book_available_copies, empty=0, default=False),
+})
+
+BOOK_DETAIL_FIELDS = {
+    'id': Field('id'),
+    'title': Field('title'),
+    'publication_year': Field('publication_year'),
+    'page_count': Field('page_count'),
+    'illustration_count': Field('illustration_count'),
+    'price': Field('price', 'to_float(price)'),
+    'publisher': Field('publisher_id', "{'id': publisher_id, 'name': publisher_name(publisher_id)}"),
+    'authors': Related('id', book_author_records),
+    'created_at': Field('created_at', 'iso(created_at)'),
+    'updated_at': Field('updated_at', 'iso(updated_at)'),
+    'available_copies': Related('id', book_available_copies, empty=0, default=False),
+    'inventory': Related('id', book_inventory, default=False),
+}
+
+BOOK_DETAIL = RowSerializer(BOOK_DETAIL_FIELDS)
+
+# api_book_batch: book details with their per-branch inventory by default
+BOOK_BATCH = RowSerializer({
+    **BOOK_DETAIL_FIELDS,
+    'inventory': Related('id', book_inventory),
+})
+
+# Per-branch rows of api_book_inventory
+BOOK_INVENTORY = RowSerializer({
+    'branch': Field('branch_id', 'branch_name(branch_id)'),
+    'total_copies': Field('total_copies'),
+    'available_copies': Field('available_copies'),
+})
+
+
+def book_inventory_rows(book_id, names=None) -> list:
+    """BOOK_INVENTORY rows of one book by branch id, one query per shard"""
+    compiled = BOOK_INVENTORY.compile(names, ('branch_id',))
+    rows = []
+    for queryset in _inventory_querysets():
+        part, keys = compiled.keyed_rows(queryset.filter(book_id=book_id).order_by())
+        rows.extend(zip(keys, part))
+    rows.sort(key=itemgetter(0))
+    return [row for _, row in rows]
+
+# Per-book rows of api_branch_books
+BRANCH_BOOKS = RowSerializer({
+    'id': Field('book_id'),
+    'title': Field('book__title'),
+    'authors': Related('book_id', book_authors_display, empty=''),
+    'available_copies': Field('available_copies'),
+})
+
+AVAILABILITY = FieldSet(('branch_id', 'branch_name', 'available_copies', 'distance'))
+
+INVENTORY = RowSerializer({
+    'id': Field('id'),
+    'book': Field(('book_id', 'book__title'), "{'id': book_id, 'title': book__title}"),
+    'branch': Field('branch_id', "{'id': branch_id, 'name': branch_name(branch_id)}"),
+    'total_copies': Field('total_copies'),
+    'available_copies': Field('available_copies'),
+    'last_updated': Field('last_updated', 'iso(last_updated)'),
+})
+
+LOAN = RowSerializer({
+    'id': Field('id'),
+    'student': Field(
+        ('student_id', 'student__last_name', 'student__first_name', 'student__student_id'),
+        "{'id': student_id, 'name': f'{student__last_name} {student__first_name}', "
+        "'student_id': student__student_id}"
+    ),
+    'book': Field(('book_id', 'book__title'), "{'id': book_id, 'title': book__title}"),
+    'branch': Field('branch_id', "{'id': branch_id, 'name': branch_name(branch_id)}"),
+    'issue_date': Field('issue_date', 'iso(issue_date)'),
+    'return_date': Field('return_date', 'iso(return_date)'),
+    'is_returned': Field('is_returned'),
+})
+
+
+def dumps(data) -> bytes:
+    """
+    Encode an API payload. API_JSON_ENCODER = 'orjson' uses orjson when it
+    is installed; otherwise (and for 'json') the stdlib encoder JsonResponse
+    uses. Row serializers emit only JSON-native values, so both backends
+    produce the same data (orjson writes UTF-8 instead of \\u escapes).
+    """
+    if orjson is not None and settings.API_JSON_ENCODER == 'orjson':
+        return orjson.dumps(data, default=DjangoJSONEncoder().default)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse counterpart that encodes through dumps()"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -1,9 +1,29 @@
-from django.db import models, transaction
-from django.db.models import Sum, Count, Q, F
+import contextvars
+import heapq
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter, itemgetter
+
+from django.db import close_old_connections, connections, models, transaction
+from django.db.models import (
+    Sum, Count, Q, F, Func, Max, Min, Exists, OuterRef, Subquery, Value, IntegerField
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from .models import Book, Branch, BookInventory, Faculty, BookFacultyUsage, Student, Loan
+from .models import (
+    Author, Publisher, Book, Branch, BookInventory, Faculty, BookFacultyUsage, Student, Loan,
+    BookRecommendation, Reservation, BranchLink, Transfer, TransferItem, LoanEvent,
+    LoanArchive
+)
 from .exceptions import LibraryBusinessError
+from .model_versions import ModelVersions
+from .pubsub import notify_availability
+from .routers import read_db
+from .sharding import across_branches, branch_atomic, for_branch, require_unsharded, shard_aliases, shard_for_branch
 
 class InventoryService:
     """Service for inventory-related operations"""
@@ -15,9 +35,8 @@ class InventoryService:
         Requirement 1: For a specified branch — count number of copies of a specified book
         """
         try:
-            result = BookInventory.objects.filter(
-                book_id=book_id, 
-                branch_id=branch_id
+            result = for_branch(BookInventory.objects, branch_id).filter(
+                book_id=book_id
             ).aggregate(total=Sum('total_copies'))
             
             return result['total'] or 0
@@ -28,9 +47,8 @@ class InventoryService:
     def get_available_copies_in_branch(book_id: int, branch_id: int) -> int:
         """Get available copies of a book in a specific branch"""
         try:
-            result = BookInventory.objects.filter(
-                book_id=book_id, 
-                branch_id=branch_id
+            result = for_branch(BookInventory.objects, branch_id).filter(
+                book_id=book_id
             ).aggregate(available=Sum('available_copies'))
             
             return result['available'] or 0
@@ -40,24 +58,721 @@ class InventoryService:
     @staticmethod
     @transaction.atomic
     def update_inventory(book_id: int, branch_id: int, delta: int) -> None:
-        """Update inventory counts atomically"""
-        inventory, created = BookInventory.objects.get_or_create(
-            book_id=book_id,
-            branch_id=branch_id,
-            defaults={'total_copies': 0, 'available_copies': 0}
+        """Update inventory counts atomically (on the branch's shard too)"""
+        shard = shard_for_branch(branch_id)
+        with branch_atomic(branch_id):
+            inventory, created = BookInventory.objects.using(shard).get_or_create(
+                book_id=book_id,
+                branch_id=branch_id,
+                defaults={'total_copies': 0, 'available_copies': 0}
+            )
+            
+            if delta > 0:
+                inventory.total_copies += delta
+                inventory.available_copies += delta
+            elif delta < 0:
+                if inventory.total_copies + delta < 0:
+                    raise LibraryBusinessError("Cannot have negative total copies")
+                inventory.total_copies += delta
+                inventory.available_copies = max(0, inventory.available_copies + delta)
+            
+            inventory.full_clean()
+            inventory.save()
+            if delta > 0:
+                ReservationService.allocate_freed(Counter({(book_id, branch_id): delta}))
+
+class AvailabilityService:
+    """Cross-branch availability lookup ranked by branch distance"""
+    
+    MAX_BASKET = 50
+    
+    @staticmethod
+    def branch_distances(origin_branch_id: int) -> dict:
+        """
+        Shortest distances from the origin over the BranchLink graph (Dijkstra).
+        Links are undirected; unreachable branches are absent from the result.
+        """
+        graph = defaultdict(list)
+        for from_id, to_id, distance in BranchLink.objects.values_list(
+            'from_branch_id', 'to_branch_id', 'distance'
+        ):
+            graph[from_id].append((to_id, distance))
+            graph[to_id].append((from_id, distance))
+        
+        distances = {origin_branch_id: 0}
+        queue = [(0, origin_branch_id)]
+        while queue:
+            distance, branch_id = heapq.heappop(queue)
+            if distance > distances.get(branch_id, distance):
+                continue
+            for neighbour_id, weight in graph[branch_id]:
+                candidate = distance + weight
+                if candidate < distances.get(neighbour_id, candidate + 1):
+                    distances[neighbour_id] = candidate
+                    heapq.heappush(queue, (candidate, neighbour_id))
+        return distances
+    
+    @staticmethod
+    def nearest_available(book_ids, origin_branch_id=None) -> dict:
+        """
+        Branches holding available copies for each book of the basket,
+        nearest first. One inventory query for the whole basket.
+        """
+        book_ids = list(dict.fromkeys(book_ids))
+        if len(book_ids) > AvailabilityService.MAX_BASKET:
+            raise LibraryBusinessError(
+                f"At most {AvailabilityService.MAX_BASKET} books can be looked up at once"
+            )
+        
+        distances = {}
+        if origin_branch_id is not None:
+            distances = AvailabilityService.branch_distances(origin_branch_id)
+        
+        result = {book_id: [] for book_id in book_ids}
+        rows = across_branches(BookInventory.objects.filter(
+            book_id__in=book_ids,
+            available_copies__gt=0
+        ).values_list('book_id', 'branch_id', 'branch__name', 'available_copies'))
+        for book_id, branch_id, branch_name, available in rows:
+            result[book_id].append({
+                'branch_id': branch_id,
+                'branch_name': branch_name,
+                'available_copies': available,
+                'distance': distances.get(branch_id),
+            })
+        
+        for branches in result.values():
+            branches.sort(key=lambda item: (
+                item['distance'] is None,
+                item['distance'] or 0,
+                item['branch_name'],
+            ))
+        return result
+
+class TransferService:
+    """
+    Inter-branch stock transfers.
+    Copies leave the source on dispatch, are in transit until received.
+    Inventory is moved with one conditional UPDATE per (quantity, chunk) group
+    instead of one save per book. The inventory writes run in branch_atomic()
+    so a failure rolls them back on the branch's shard too.
+    """
+    
+    CHUNK_SIZE = 500
+    
+    @staticmethod
+    def _group_by_quantity(items: dict) -> dict:
+        groups = defaultdict(list)
+        for book_id, quantity in items.items():
+            groups[quantity].append(book_id)
+        return groups
+    
+    @staticmethod
+    def _chunks(book_ids):
+        size = TransferService.CHUNK_SIZE
+        for start in range(0, len(book_ids), size):
+            yield book_ids[start:start + size]
+    
+    @staticmethod
+    def _take_copies(branch_id: int, items: dict) -> None:
+        now = timezone.now()
+        for quantity, book_ids in TransferService._group_by_quantity(items).items():
+            for chunk in TransferService._chunks(book_ids):
+                updated = for_branch(BookInventory.objects, branch_id).filter(
+                    book_id__in=chunk,
+                    available_copies__gte=quantity
+                ).update(
+                    total_copies=F('total_copies') - quantity,
+                    available_copies=F('available_copies') - quantity,
+                    last_updated=now
+                )
+                if updated != len(chunk):
+                    raise LibraryBusinessError(
+                        "Not enough available copies in the source branch for some books"
+                    )
+        notify_availability(branch_id, items)
+    
+    @staticmethod
+    def _put_copies(branch_id: int, items: dict) -> None:
+        now = timezone.now()
+        BookInventory.objects.using(shard_for_branch(branch_id)).bulk_create(
+            [
+                BookInventory(book_id=book_id, branch_id=branch_id, total_copies=0, available_copies=0)
+                for book_id in items
+            ],
+            batch_size=TransferService.CHUNK_SIZE,
+            ignore_conflicts=True
+        )
+        for quantity, book_ids in TransferService._group_by_quantity(items).items():
+            for chunk in TransferService._chunks(book_ids):
+                for_branch(BookInventory.objects, branch_id).filter(
+                    book_id__in=chunk
+                ).update(
+                    total_copies=F('total_copies') + quantity,
+                    available_copies=F('available_copies') + quantity,
+                    last_updated=now
+                )
+        notify_availability(branch_id, items)
+        ReservationService.allocate_freed(
+            Counter({(book_id, branch_id): quantity for book_id, quantity in items.items()})
+        )
+    
+    @staticmethod
+    def _record_events(branch_id: int, items: dict, sign: int) -> None:
+        LoanEvent.objects.bulk_create(
+            [
+                LoanEvent(
+                    event_type=LoanEvent.TRANSFERRED,
+                    book_id=book_id,
+                    branch_id=branch_id,
+                    stock_delta=sign * quantity
+                )
+                for book_id, quantity in items.items()
+            ],
+            batch_size=TransferService.CHUNK_SIZE
+        )
+    
+    @staticmethod
+    def _items_of(transfer_id: int) -> dict:
+        return dict(
+            TransferItem.objects.filter(transfer_id=transfer_id).values_list('book_id', 'quantity')
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def create_transfer(from_branch_id: int, to_branch_id: int, items: dict, user=None) -> Transfer:
+        """Dispatch {book_id: quantity} from one branch to another"""
+        if from_branch_id == to_branch_id:
+            raise LibraryBusinessError("Source and destination branches must differ")
+        items = {book_id: quantity for book_id, quantity in items.items() if quantity}
+        if not items:
+            raise LibraryBusinessError("Transfer has no items")
+        if any(quantity < 0 for quantity in items.values()):
+            raise LibraryBusinessError("Quantities must be positive")
+        
+        with branch_atomic(from_branch_id):
+            TransferService._take_copies(from_branch_id, items)
+            TransferService._record_events(from_branch_id, items, -1)
+            transfer = Transfer.objects.create(
+                from_branch_id=from_branch_id,
+                to_branch_id=to_branch_id,
+                created_by=user
+            )
+            TransferItem.objects.bulk_create(
+                [
+                    TransferItem(transfer=transfer, book_id=book_id, quantity=quantity)
+                    for book_id, quantity in items.items()
+                ],
+                batch_size=TransferService.CHUNK_SIZE
+            )
+        return transfer
+    
+    @staticmethod
+    def transfer_all_stock(from_branch_id: int, to_branch_id: int, user=None) -> Transfer:
+        """Move every available copy of a branch, e.g. when closing it"""
+        items = dict(
+            for_branch(BookInventory.objects, from_branch_id).filter(
+                available_copies__gt=0
+            ).order_by().values_list('book_id', 'available_copies')
+        )
+        return TransferService.create_transfer(from_branch_id, to_branch_id, items, user=user)
+    
+    @staticmethod
+    @transaction.atomic
+    def receive(transfer_id: int) -> Transfer:
+        """Book the in-transit copies into the destination branch"""
+        transfer = Transfer.objects.get(pk=transfer_id)
+        claimed = Transfer.objects.filter(
+            pk=transfer_id,
+            status=Transfer.STATUS_IN_TRANSIT
+        ).update(status=Transfer.STATUS_RECEIVED, received_at=timezone.now())
+        if not claimed:
+            raise LibraryBusinessError("Transfer is not in transit")
+        
+        items = TransferService._items_of(transfer_id)
+        with branch_atomic(transfer.to_branch_id):
+            TransferService._put_copies(transfer.to_branch_id, items)
+            TransferService._record_events(transfer.to_branch_id, items, 1)
+        transfer.refresh_from_db()
+        return transfer
+    
+    @staticmethod
+    @transaction.atomic
+    def cancel(transfer_id: int) -> Transfer:
+        """Return in-transit copies to the source branch"""
+        transfer = Transfer.objects.get(pk=transfer_id)
+        claimed = Transfer.objects.filter(
+            pk=transfer_id,
+            status=Transfer.STATUS_IN_TRANSIT
+        ).update(status=Transfer.STATUS_CANCELLED)
+        if not claimed:
+            raise LibraryBusinessError("Transfer is not in transit")
+        
+        items = TransferService._items_of(transfer_id)
+        with branch_atomic(transfer.from_branch_id):
+            TransferService._put_copies(transfer.from_branch_id, items)
+            TransferService._record_events(transfer.from_branch_id, items, 1)
+        transfer.refresh_from_db()
+        return transfer
+
+class ReconciliationService:
+    """
+    Recompute available_copies = total_copies - active loans - held reservations
+    for every (book, branch) in one set-based statement.
+    The statement joins loans with reservations, so it needs one database:
+    with BRANCH_SHARDS set it raises ImproperlyConfigured.
+    """
+    
+    @staticmethod
+    def _count_per_inventory(queryset):
+        return Coalesce(
+            Subquery(
+                queryset.filter(
+                    book_id=OuterRef('book_id'),
+                    branch_id=OuterRef('branch_id')
+                ).order_by().values('book_id').annotate(n=Count('id')).values('n')[:1]
+            ),
+            Value(0)
+        )
+    
+    @staticmethod
+    def expected_available(total=None):
+        """
+        Expression for the correct available_copies of a BookInventory row.
+        `total` overrides the total_copies expression, e.g. when the same
+        UPDATE also changes total_copies.
+        """
+        active_loans = ReconciliationService._count_per_inventory(
+            Loan.objects.filter(is_returned=False)
+        )
+        held = ReconciliationService._count_per_inventory(
+            Reservation.objects.filter(status=Reservation.STATUS_READY)
         )
+        if total is None:
+            total = F('total_copies')
+        return Greatest(total - active_loans - held, Value(0))
+    
+    @staticmethod
+    def find_discrepancies(branch_id=None):
+        """Inventory rows whose available_copies disagree with loans and holds"""
+        require_unsharded('Inventory reconciliation')
+        queryset = BookInventory.objects.all()
+        if branch_id is not None:
+            queryset = queryset.filter(branch_id=branch_id)
+        return list(
+            queryset.annotate(
+                expected=ReconciliationService.expected_available()
+            ).exclude(
+                available_copies=F('expected')
+            ).order_by('branch_id', 'book_id').values(
+                'id', 'book_id', 'branch_id', 'total_copies', 'available_copies', 'expected'
+            )
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def reconcile(fix: bool = False, branch_id=None):
+        """Report discrepancies and optionally correct them in one UPDATE"""
+        discrepancies = ReconciliationService.find_discrepancies(branch_id)
+        if fix and discrepancies:
+            BookInventory.objects.filter(
+                pk__in=[row['id'] for row in discrepancies]
+            ).update(
+                available_copies=ReconciliationService.expected_available(),
+                last_updated=timezone.now()
+            )
+            for branch_id, rows in groupby(discrepancies, itemgetter('branch_id')):
+                notify_availability(branch_id, [row['book_id'] for row in rows])
+        return discrepancies
+    
+    @staticmethod
+    def reconcile_pairs(pairs) -> None:
+        """Recompute available_copies for the given (book_id, branch_id) pairs in one UPDATE"""
+        pairs = set(pairs)
+        if not pairs:
+            return
+        require_unsharded('Inventory reconciliation')
+        # Exactly the given rows: one branch_id AND book_id IN (...) term per branch
+        books_by_branch = {
+            branch_id: [book_id for book_id, _ in branch_pairs]
+            for branch_id, branch_pairs in groupby(sorted(pairs, key=itemgetter(1, 0)), itemgetter(1))
+        }
+        condition = Q()
+        for branch_id, book_ids in books_by_branch.items():
+            condition |= Q(branch_id=branch_id, book_id__in=book_ids)
+        BookInventory.objects.filter(condition).update(
+            available_copies=ReconciliationService.expected_available(),
+            last_updated=timezone.now()
+        )
+        for branch_id, book_ids in books_by_branch.items():
+            notify_availability(branch_id, book_ids)
+
+class BulkInventoryService:
+    """
+    Set-based bulk operations behind the admin actions.
+    Rows change with one UPDATE/DELETE per action and inventory is
+    reconciled once afterwards, instead of a save() per row. Like the
+    reconciliation they rely on, they refuse to run with BRANCH_SHARDS set.
+    """
+    
+    @staticmethod
+    def _record_loan_events(rows, event_type: str) -> None:
+        LoanEvent.objects.bulk_create(
+            [
+                LoanEvent(
+                    event_type=event_type,
+                    loan_id=row['id'],
+                    student_id=row['student_id'],
+                    book_id=row['book_id'],
+                    branch_id=row['branch_id'],
+                    on_loan_delta=0 if row['is_returned'] else -1
+                )
+                for row in rows
+            ],
+            batch_size=TransferService.CHUNK_SIZE
+        )
+    
+    @staticmethod
+    def _loan_rows(queryset, open_only: bool = False):
+        require_unsharded('Bulk loan actions')
+        if open_only:
+            queryset = queryset.filter(is_returned=False)
+        return list(
+            queryset.select_for_update().order_by().values(
+                'id', 'student_id', 'book_id', 'branch_id', 'is_returned'
+            )
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def return_loans(queryset) -> int:
+        """Mark the open loans of a queryset returned. Returns the number returned"""
+        rows = BulkInventoryService._loan_rows(queryset, open_only=True)
+        if not rows:
+            return 0
+        Loan.objects.filter(
+            pk__in=[row['id'] for row in rows],
+            is_returned=False
+        ).update(is_returned=True, return_date=timezone.now())
+        BulkInventoryService._record_loan_events(rows, LoanEvent.RETURNED)
+        
+        returned = Counter((row['book_id'], row['branch_id']) for row in rows)
+        ReconciliationService.reconcile_pairs(returned)
+        ReservationService.allocate_freed(returned)
+        return len(rows)
+    
+    @staticmethod
+    @transaction.atomic
+    def delete_loans(queryset) -> int:
+        """Delete loans; copies of unreturned ones go back to the inventory"""
+        rows = BulkInventoryService._loan_rows(queryset)
+        if not rows:
+            return 0
+        BulkInventoryService._record_loan_events(rows, LoanEvent.DELETED)
+        Loan.objects.filter(pk__in=[row['id'] for row in rows]).delete()
         
+        freed = Counter(
+            (row['book_id'], row['branch_id']) for row in rows if not row['is_returned']
+        )
+        ReconciliationService.reconcile_pairs(freed)
+        ReservationService.allocate_freed(freed)
+        return len(rows)
+    
+    @staticmethod
+    @transaction.atomic
+    def adjust_copies(queryset, delta: int) -> int:
+        """
+        Add `delta` copies (negative to write off) to every inventory row.
+        Only free copies can be written off; rows without enough are skipped.
+        Returns the number of rows changed.
+        """
+        if not delta:
+            return 0
+        require_unsharded('Bulk inventory actions')
+        queryset = queryset.filter(available_copies__gte=max(-delta, 0))
+        pairs = list(queryset.order_by().values_list('book_id', 'branch_id'))
+        changed = queryset.update(
+            total_copies=F('total_copies') + delta,
+            available_copies=ReconciliationService.expected_available(F('total_copies') + delta),
+            last_updated=timezone.now()
+        )
+        for branch_id, branch_pairs in groupby(sorted(pairs, key=itemgetter(1)), itemgetter(1)):
+            notify_availability(branch_id, [book_id for book_id, _ in branch_pairs])
         if delta > 0:
-            inventory.total_copies += delta
-            inventory.available_copies += delta
-        elif delta < 0:
-            if inventory.total_copies + delta < 0:
-                raise LibraryBusinessError("Cannot have negative total copies")
-            inventory.total_copies += delta
-            inventory.available_copies = max(0, inventory.available_copies + delta)
+            ReservationService.allocate_freed(Counter({pair: delta for pair in pairs}))
+        return changed
+    
+    @staticmethod
+    @transaction.atomic
+    def transfer_inventory(queryset, to_branch_id: int, user=None) -> list:
+        """
+        Dispatch every available copy of the selected rows to another branch,
+        one transfer per source branch. Returns the created transfers.
+        """
+        require_unsharded('Bulk inventory actions')
+        items = defaultdict(dict)
+        for book_id, branch_id, available in queryset.exclude(
+            branch_id=to_branch_id
+        ).filter(available_copies__gt=0).order_by().values_list(
+            'book_id', 'branch_id', 'available_copies'
+        ):
+            items[branch_id][book_id] = available
+        return [
+            TransferService.create_transfer(from_branch_id, to_branch_id, branch_items, user=user)
+            for from_branch_id, branch_items in sorted(items.items())
+        ]
+
+class LoanEventProjector:
+    """
+    Rebuilds read models by replaying the append-only LoanEvent log.
+    Events are read as tuples in keyset-paginated batches and folded into
+    counters, so memory is bounded by the number of (book, branch) pairs.
+    """
+    
+    BATCH_SIZE = 50000
+    FIELDS = ('id', 'event_type', 'student_id', 'book_id', 'branch_id',
+              'on_loan_delta', 'created_at')
+    
+    def __init__(self):
+        self.on_loan = Counter()
+        self.event_counts = Counter()
+        self.borrowers = set()
+        self.daily_issues = Counter()
+        self.last_event_id = 0
+    
+    @staticmethod
+    def batches(after_id: int = 0, batch_size: int = BATCH_SIZE):
+        """Yield event tuples in id order"""
+        while True:
+            batch = list(
+                LoanEvent.objects.filter(id__gt=after_id).order_by('id')
+                .values_list(*LoanEventProjector.FIELDS)[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1][0]
+    
+    def apply(self, batch) -> None:
+        on_loan = self.on_loan
+        event_counts = self.event_counts
+        borrowers = self.borrowers
+        daily_issues = self.daily_issues
+        for _id, event_type, student_id, book_id, branch_id, delta, created_at in batch:
+            event_counts[event_type] += 1
+            if delta:
+                on_loan[(book_id, branch_id)] += delta
+            if event_type == LoanEvent.ISSUED:
+                borrowers.add(student_id)
+                daily_issues[(created_at.date(), branch_id)] += 1
+        self.last_event_id = batch[-1][0]
+    
+    def replay(self, batch_size: int = BATCH_SIZE) -> 'LoanEventProjector':
+        """Fold every event not yet applied"""
+        for batch in self.batches(self.last_event_id, batch_size):
+            self.apply(batch)
+        return self
+    
+    def dashboard_stats(self) -> dict:
+        """Headline loan numbers for the dashboard"""
+        issued = self.event_counts[LoanEvent.ISSUED]
+        returned = self.event_counts[LoanEvent.RETURNED]
+        return {
+            'total_loans': issued - self.event_counts[LoanEvent.DELETED],
+            'active_loans': sum(count for count in self.on_loan.values() if count > 0),
+            'returned_loans': returned,
+            'active_students_count': len(self.borrowers),
+        }
+    
+    def daily_rollup(self) -> dict:
+        """Loans issued per (date, branch_id)"""
+        return dict(self.daily_issues)
+    
+    @transaction.atomic
+    def rebuild_available_copies(self, batch_size: int = 1000) -> int:
+        """
+        Write available_copies = total - on loan - held for every inventory row.
+        Returns the number of rows that changed.
+        """
+        held = Counter({
+            (row['book_id'], row['branch_id']): row['n']
+            for row in Reservation.objects.filter(
+                status=Reservation.STATUS_READY
+            ).values('book_id', 'branch_id').annotate(n=Count('id')).order_by()
+        })
+        
+        changed = []
+        for alias in shard_aliases():
+            changed_here = []
+            for inventory in BookInventory.objects.using(alias).order_by().only(
+                'id', 'book_id', 'branch_id', 'total_copies', 'available_copies'
+            ).iterator(chunk_size=batch_size):
+                key = (inventory.book_id, inventory.branch_id)
+                expected = max(inventory.total_copies - self.on_loan[key] - held[key], 0)
+                if inventory.available_copies != expected:
+                    inventory.available_copies = expected
+                    changed_here.append(inventory)
+            BookInventory.objects.using(alias).bulk_update(changed_here, ['available_copies'], batch_size=batch_size)
+            changed.extend(changed_here)
         
-        inventory.full_clean()
-        inventory.save()
+        for branch_id, branch_rows in groupby(sorted(changed, key=attrgetter('branch_id')), attrgetter('branch_id')):
+            notify_availability(branch_id, [inventory.book_id for inventory in branch_rows])
+        return len(changed)
+    
+    @staticmethod
+    def backfill_from_loans(batch_size: int = 5000) -> int:
+        """
+        Create the events loans recorded before the log existed are missing.
+        
+        A loan without an ISSUED event gets one, plus a RETURNED event if it
+        is returned and none was logged (a loan issued before the log and
+        returned after it already has its RETURNED). A loan deleted after the
+        log existed left a DELETED/RETURNED event with no ISSUED to balance
+        it; it gets an ISSUED event from that event's row.
+        """
+        def logged(event_type):
+            return LoanEvent.objects.filter(event_type=event_type, loan_id__isnull=False).values('loan_id')
+        
+        loans = Loan.objects.exclude(pk__in=logged(LoanEvent.ISSUED)).order_by().annotate(
+            return_logged=Exists(logged(LoanEvent.RETURNED).filter(loan_id=OuterRef('pk')))
+        ).values_list(
+            'pk', 'student_id', 'book_id', 'branch_id', 'issue_date', 'is_returned', 'return_date',
+            'return_logged'
+        )
+        orphans = LoanEvent.objects.filter(
+            loan_id__isnull=False,
+            on_loan_delta__lt=0
+        ).exclude(
+            loan_id__in=logged(LoanEvent.ISSUED)
+        ).exclude(
+            loan_id__in=Loan.objects.values('pk')
+        ).order_by().values_list('loan_id', 'student_id', 'book_id', 'branch_id').annotate(
+            first_logged=Min('created_at')
+        )
+        
+        def missing_events():
+            for (pk, student_id, book_id, branch_id, issue_date, is_returned, return_date,
+                 return_logged) in loans.iterator(chunk_size=batch_size):
+                common = {'loan_id': pk, 'student_id': student_id, 'book_id': book_id, 'branch_id': branch_id}
+                yield LoanEvent(event_type=LoanEvent.ISSUED, on_loan_delta=1, created_at=issue_date, **common)
+                if is_returned and not return_logged:
+                    yield LoanEvent(
+                        event_type=LoanEvent.RETURNED, on_loan_delta=-1,
+                        created_at=return_date or issue_date, **common
+                    )
+            for loan_id, student_id, book_id, branch_id, first_logged in orphans.iterator(chunk_size=batch_size):
+                yield LoanEvent(
+                    event_type=LoanEvent.ISSUED, on_loan_delta=1, created_at=first_logged,
+                    loan_id=loan_id, student_id=student_id, book_id=book_id, branch_id=branch_id
+                )
+        
+        created = 0
+        events = []
+        for event in missing_events():
+            events.append(event)
+            if len(events) >= batch_size:
+                LoanEvent.objects.bulk_create(events)
+                created += len(events)
+                events = []
+        LoanEvent.objects.bulk_create(events)
+        return created + len(events)
+
+class LoanArchiveService:
+    """
+    Moves old returned loans out of the live Loan table.
+    Readers that count loan history (headline stats, most borrowed books,
+    the reports dashboard, recommendations) add the archive back in.
+    """
+    DEFAULT_MONTHS = 12
+    BATCH_SIZE = 1000
+    
+    @staticmethod
+    def _loan_count(model, lookup: str):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(
+                    lookup
+                ).annotate(n=Count('id')).values('n')[:1]
+            ),
+            Value(0)
+        )
+    
+    @staticmethod
+    def with_loan_counts(queryset, lookup: str):
+        """
+        Annotate loan_count: loans of each row in the live table plus the
+        archive. lookup leads from a loan to the row, e.g. 'book' or
+        'student__faculty'.
+        """
+        count = LoanArchiveService._loan_count
+        return queryset.annotate(loan_count=count(Loan, lookup) + count(LoanArchive, lookup))
+    
+    @staticmethod
+    def archivable(months: int = DEFAULT_MONTHS, now=None):
+        """Returned loans whose return date is older than the cutoff"""
+        cutoff = (now or timezone.now()) - timedelta(days=30 * months)
+        return Loan.objects.filter(is_returned=True, return_date__lt=cutoff)
+    
+    @staticmethod
+    def archive_batch(loans) -> int:
+        """
+        Copy a batch of loans into the archive and delete them from Loan.
+        
+        Runs in its own transaction; the unique loan_id makes a retried batch
+        a no-op on the archive side, so an interrupted run can simply resume.
+        """
+        with transaction.atomic():
+            LoanArchive.objects.bulk_create(
+                [LoanArchive.from_loan(loan) for loan in loans],
+                ignore_conflicts=True
+            )
+            # Queryset delete bypasses Loan.delete, so inventory and the
+            # event log are untouched - the copies were returned long ago
+            Loan.objects.filter(pk__in=[loan.pk for loan in loans]).delete()
+        return len(loans)
+    
+    @staticmethod
+    def archive_returned(months: int = DEFAULT_MONTHS, batch_size: int = BATCH_SIZE,
+                         max_batches: int = None, now=None) -> int:
+        """Archive returned loans in pk-ordered batches, returns moved count"""
+        queryset = LoanArchiveService.archivable(months, now).only(
+            'id', 'student_id', 'book_id', 'branch_id', 'issue_date', 'return_date'
+        ).order_by('pk')
+        moved = 0
+        batches = 0
+        last_pk = 0
+        while max_batches is None or batches < max_batches:
+            loans = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not loans:
+                break
+            moved += LoanArchiveService.archive_batch(loans)
+            last_pk = loans[-1].pk
+            batches += 1
+        return moved
+    
+    @staticmethod
+    def history(student_id: int = None, book_id: int = None, limit: int = 10):
+        """
+        Latest loans across the live table and the archive.
+        
+        Returns (entries, total) where entries are Loan and LoanArchive
+        objects merged by issue date, newest first.
+        """
+        filters = {}
+        if student_id is not None:
+            filters['student_id'] = student_id
+        if book_id is not None:
+            filters['book_id'] = book_id
+        
+        live = Loan.objects.filter(**filters).select_related('student', 'book', 'branch')
+        archived = LoanArchive.objects.filter(**filters).select_related('student', 'book', 'branch')
+        entries = heapq.merge(
+            live.order_by('-issue_date')[:limit],
+            archived.order_by('-issue_date')[:limit],
+            key=lambda loan: loan.issue_date,
+            reverse=True
+        )
+        return list(entries)[:limit], live.count() + archived.count()
 
 class FacultyUsageService:
     """Service for faculty usage operations"""
@@ -157,6 +872,19 @@ class LoanService:
         except Loan.DoesNotExist:
             raise LibraryBusinessError("Loan not found")
     
+    @staticmethod
+    @transaction.atomic
+    def delete_loan(loan: Loan):
+        """
+        Delete a loan. The copy of an unreturned one goes to the head of the
+        hold queue, as on return. Returns the allocated reservation or None.
+        """
+        was_open = not loan.is_returned
+        loan.delete()
+        if was_open:
+            return ReservationService.allocate_copy(loan.book_id, loan.branch_id)
+        return None
+    
     @staticmethod
     def get_unique_students_borrowed_book(book_id: int) -> int:
         """Get count of unique students who borrowed a specific book"""
@@ -170,20 +898,379 @@ class LoanService:
             status='active'
         )
 
+class ReservationService:
+    """
+    Hold queue per (book, branch).
+    A copy allocated to a hold is kept out of available_copies until collected.
+    Changes to a copy and a reservation together run in branch_atomic().
+    """
+    
+    HOLD_DAYS = 3
+    
+    @staticmethod
+    def _release_copy(book_id: int, branch_id: int) -> None:
+        for_branch(BookInventory.objects, branch_id).filter(book_id=book_id).update(
+            available_copies=F('available_copies') + 1,
+            last_updated=timezone.now()
+        )
+        notify_availability(branch_id, [book_id])
+    
+    @staticmethod
+    @transaction.atomic
+    def place_hold(student_id: int, book_id: int, branch_id: int) -> Reservation:
+        """Queue a student for a book; allocates at once if a copy is free"""
+        if not for_branch(BookInventory.objects, branch_id).filter(book_id=book_id).exists():
+            raise LibraryBusinessError("Book is not in the inventory of the selected branch")
+        
+        if Reservation.objects.filter(
+            student_id=student_id,
+            book_id=book_id,
+            branch_id=branch_id,
+            status__in=Reservation.OPEN_STATUSES
+        ).exists():
+            raise LibraryBusinessError("Student already has an open reservation for this book")
+        
+        reservation = Reservation.objects.create(
+            student_id=student_id,
+            book_id=book_id,
+            branch_id=branch_id
+        )
+        ReservationService.allocate_copy(book_id, branch_id)
+        reservation.refresh_from_db()
+        return reservation
+    
+    @staticmethod
+    @transaction.atomic
+    def allocate_copy(book_id: int, branch_id: int):
+        """
+        Hand one available copy to the head of the queue (FIFO).
+        Both the copy and the queue head are taken with conditional updates,
+        so concurrent returns never allocate the same copy or hold twice.
+        Returns the allocated reservation or None.
+        """
+        now = timezone.now()
+        with branch_atomic(branch_id):
+            taken = for_branch(BookInventory.objects, branch_id).filter(
+                book_id=book_id,
+                available_copies__gt=0
+            ).update(available_copies=F('available_copies') - 1, last_updated=now)
+            if not taken:
+                return None
+            notify_availability(branch_id, [book_id])
+            
+            waiting = Reservation.objects.filter(
+                book_id=book_id,
+                branch_id=branch_id,
+                status=Reservation.STATUS_WAITING
+            ).order_by('created_at', 'id')
+            while True:
+                head = waiting.values_list('pk', flat=True).first()
+                if head is None:
+                    ReservationService._release_copy(book_id, branch_id)
+                    return None
+                claimed = Reservation.objects.filter(
+                    pk=head,
+                    status=Reservation.STATUS_WAITING
+                ).update(
+                    status=Reservation.STATUS_READY,
+                    ready_at=now,
+                    expires_at=now + timedelta(days=ReservationService.HOLD_DAYS)
+                )
+                if claimed:
+                    return Reservation.objects.get(pk=head)
+    
+    @staticmethod
+    def allocate_freed(freed: dict) -> list:
+        """
+        Offer copies that became available to the hold queues: up to
+        freed[(book_id, branch_id)] allocations per pair, one query to find
+        the pairs that have anyone waiting. Returns the allocated reservations.
+        """
+        freed = +Counter(freed)
+        if not freed:
+            return []
+        queued = set(
+            Reservation.objects.filter(
+                status=Reservation.STATUS_WAITING,
+                book_id__in={book_id for book_id, _ in freed},
+                branch_id__in={branch_id for _, branch_id in freed}
+            ).values_list('book_id', 'branch_id').distinct()
+        )
+        allocated = []
+        for book_id, branch_id in sorted(queued & set(freed)):
+            for _ in range(freed[book_id, branch_id]):
+                reservation = ReservationService.allocate_copy(book_id, branch_id)
+                if reservation is None:
+                    break
+                allocated.append(reservation)
+        return allocated
+    
+    @staticmethod
+    @transaction.atomic
+    def collect(reservation_id: int, user=None) -> Loan:
+        """Issue the held copy to the student"""
+        reservation = Reservation.objects.get(pk=reservation_id)
+        claimed = Reservation.objects.filter(
+            pk=reservation_id,
+            status=Reservation.STATUS_READY
+        ).update(status=Reservation.STATUS_FULFILLED)
+        if not claimed:
+            raise LibraryBusinessError("Reservation is not ready for collection")
+        
+        # The held copy goes back to available so Loan.save can take it
+        with branch_atomic(reservation.branch_id):
+            ReservationService._release_copy(reservation.book_id, reservation.branch_id)
+            loan = Loan.objects.create(
+                student_id=reservation.student_id,
+                book_id=reservation.book_id,
+                branch_id=reservation.branch_id,
+                created_by=user
+            )
+        Reservation.objects.filter(pk=reservation_id).update(loan=loan)
+        return loan
+    
+    @staticmethod
+    @transaction.atomic
+    def cancel(reservation_id: int) -> None:
+        """Cancel an open reservation, passing a held copy to the next in line"""
+        reservation = Reservation.objects.get(pk=reservation_id)
+        was_ready = Reservation.objects.filter(
+            pk=reservation_id,
+            status=Reservation.STATUS_READY
+        ).update(status=Reservation.STATUS_CANCELLED)
+        if was_ready:
+            with branch_atomic(reservation.branch_id):
+                ReservationService._release_copy(reservation.book_id, reservation.branch_id)
+                ReservationService.allocate_copy(reservation.book_id, reservation.branch_id)
+            return
+        
+        cancelled = Reservation.objects.filter(
+            pk=reservation_id,
+            status=Reservation.STATUS_WAITING
+        ).update(status=Reservation.STATUS_CANCELLED)
+        if not cancelled:
+            raise LibraryBusinessError("Reservation is already closed")
+    
+    @staticmethod
+    def expire_holds(now=None) -> int:
+        """Expire uncollected holds and pass their copies down the queue"""
+        now = now or timezone.now()
+        expired = Reservation.objects.filter(
+            status=Reservation.STATUS_READY,
+            expires_at__lt=now
+        ).values_list('pk', 'book_id', 'branch_id')
+        
+        count = 0
+        for pk, book_id, branch_id in list(expired):
+            with transaction.atomic(), branch_atomic(branch_id):
+                if not Reservation.objects.filter(
+                    pk=pk,
+                    status=Reservation.STATUS_READY
+                ).update(status=Reservation.STATUS_EXPIRED):
+                    continue
+                ReservationService._release_copy(book_id, branch_id)
+                ReservationService.allocate_copy(book_id, branch_id)
+                count += 1
+        return count
+    
+    @staticmethod
+    def get_queue_position(reservation: Reservation) -> int:
+        """1-based position of a waiting reservation in its queue"""
+        if reservation.status != Reservation.STATUS_WAITING:
+            return 0
+        return Reservation.objects.filter(
+            book_id=reservation.book_id,
+            branch_id=reservation.branch_id,
+            status=Reservation.STATUS_WAITING
+        ).filter(
+            Q(created_at__lt=reservation.created_at) |
+            Q(created_at=reservation.created_at, pk__lt=reservation.pk)
+        ).count() + 1
+
+class QueryFanOut:
+    """
+    Runs independent read queries concurrently, one DB connection per worker
+    thread, so a page waits for its slowest query instead of the sum of them.
+    """
+    MAX_WORKERS = 8
+    _executor = None
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls.MAX_WORKERS, thread_name_prefix='query-fanout'
+            )
+        return cls._executor
+    
+    @staticmethod
+    def _call(query):
+        # Pool threads live outside the request cycle, so each task does what
+        # request_started/request_finished do for a request thread: drop the
+        # thread's connections once broken or older than CONN_MAX_AGE
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    
+    @staticmethod
+    def can_fan_out() -> bool:
+        """
+        Other threads can't see the caller's open transaction (ATOMIC_REQUESTS,
+        tests), so inside one the queries must run on the caller's connection.
+        """
+        return not any(conn.in_atomic_block for conn in connections.all())
+    
+    @classmethod
+    def run(cls, **queries) -> dict:
+        """
+        Evaluate callables concurrently and return {name: result}.
+        
+        Each callable must fully evaluate its query (count(), list(...), ...);
+        a lazy QuerySet would otherwise hit the DB later on the caller's thread.
+        """
+        if len(queries) < 2 or not cls.can_fan_out():
+            return {name: query() for name, query in queries.items()}
+        executor = cls._get_executor()
+        # Each task runs in a copy of the caller's context so replica routing applies
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, cls._call, query)
+            for name, query in queries.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+class ReferenceDataService:
+    """
+    Small dimension tables (publishers, faculties, branches) as cached
+    {'id', 'name'} rows for filter dropdowns and search forms.
+    Keys embed the model's ModelVersions token, so the save/delete signals
+    invalidate them; a warm page issues no query for its dropdowns.
+    """
+    CACHE_TTL = 3600
+    
+    @staticmethod
+    def rows(model) -> list:
+        key = f'reference:{model._meta.label_lower}:{ModelVersions.version(model)}'
+        return cache.get_or_set(
+            key,
+            lambda: [
+                {'id': pk, 'name': name}
+                for pk, name in model.objects.values_list('pk', 'name')
+            ],
+            ReferenceDataService.CACHE_TTL
+        )
+    
+    @staticmethod
+    def publishers() -> list:
+        return ReferenceDataService.rows(Publisher)
+    
+    @staticmethod
+    def faculties() -> list:
+        return ReferenceDataService.rows(Faculty)
+    
+    @staticmethod
+    def branches() -> list:
+        return ReferenceDataService.rows(Branch)
+
+class LibraryStatsService:
+    """Headline counters shared by the home page and the reports dashboard"""
+    CACHE_KEY = 'library_stats:headline'
+    CACHE_TTL = 30
+    
+    @staticmethod
+    def _scalar(queryset, function: str = 'COUNT', field: str = 'pk', distinct: bool = False):
+        """
+        Single-value subselect. A plain Func rather than an Aggregate keeps
+        Django from adding a GROUP BY.
+        """
+        template = '%(function)s(DISTINCT %(expressions)s)' if distinct else '%(function)s(%(expressions)s)'
+        return queryset.order_by().annotate(
+            value=Func(F(field), function=function, template=template, output_field=IntegerField())
+        ).values('value')
+    
+    @staticmethod
+    def _counters() -> dict:
+        """Counter subqueries; a tuple of them is added up (live loans plus the archive)"""
+        scalar = LibraryStatsService._scalar
+        archived = LoanArchive.objects.all()
+        return {
+            'total_books': scalar(Book.objects.all()),
+            'total_students': scalar(Student.objects.all()),
+            'total_branches': scalar(Branch.objects.all()),
+            'total_authors': scalar(Author.objects.all()),
+            'total_publishers': scalar(Publisher.objects.all()),
+            'total_faculties': scalar(Faculty.objects.all()),
+            'total_loans': (scalar(Loan.objects.all()), scalar(archived)),
+            'active_loans': scalar(Loan.objects.filter(is_returned=False)),
+            'returned_loans': (scalar(Loan.objects.filter(is_returned=True)), scalar(archived)),
+            'active_students_count': (
+                scalar(Loan.objects.all(), field='student', distinct=True),
+                scalar(
+                    archived.exclude(student_id__in=Loan.objects.values('student_id')),
+                    field='student', distinct=True
+                ),
+            ),
+            'popular_books_count': (
+                scalar(Loan.objects.all(), field='book', distinct=True),
+                scalar(
+                    archived.exclude(book_id__in=Loan.objects.values('book_id')),
+                    field='book', distinct=True
+                ),
+            ),
+            'total_inventory': scalar(BookInventory.objects.all(), 'SUM', 'total_copies'),
+            'available_copies': scalar(BookInventory.objects.all(), 'SUM', 'available_copies'),
+        }
+    
+    @staticmethod
+    def compute() -> dict:
+        """All counters in one SELECT of scalar subqueries"""
+        counters = LibraryStatsService._counters()
+        connection = connections[Book.objects.db]
+        columns = []
+        params = []
+        for name, querysets in counters.items():
+            if not isinstance(querysets, tuple):
+                querysets = (querysets,)
+            parts = []
+            for queryset in querysets:
+                sql, query_params = queryset.query.sql_with_params()
+                parts.append(f'({sql})')
+                params.extend(query_params)
+            columns.append(f'({" + ".join(parts)}) AS {connection.ops.quote_name(name)}')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT ' + ', '.join(columns), params)
+            row = cursor.fetchone()
+        # SUM over an empty table is NULL
+        return {name: value or 0 for name, value in zip(counters, row)}
+    
+    @staticmethod
+    def headline() -> dict:
+        """
+        Cached counters; may lag writes by up to CACHE_TTL seconds. Writes
+        don't invalidate them: a busy desk issues loans faster than the TTL,
+        and recomputing on each one would undo the cache.
+        """
+        return cache.get_or_set(
+            LibraryStatsService.CACHE_KEY,
+            LibraryStatsService.compute,
+            LibraryStatsService.CACHE_TTL
+        )
+
 class AnalyticsService:
     """Service for reporting and analytics"""
     
     @staticmethod
     def get_most_borrowed_books(limit: int = 10):
-        """Get most borrowed books"""
-        return Book.objects.annotate(
-            loan_count=Count('loans')
+        """Get most borrowed books, archived loans included"""
+        return LoanArchiveService.with_loan_counts(
+            Book.objects.using(read_db()), 'book'
         ).order_by('-loan_count')[:limit]
     
     @staticmethod
     def get_branch_utilization():
         """Get branch utilization statistics"""
-        return Branch.objects.annotate(
+        return Branch.objects.using(read_db()).annotate(
             total_books=Sum('inventories__total_copies'),
             available_books=Sum('inventories__available_copies'),
             utilization_rate=(
@@ -195,10 +1282,117 @@ class AnalyticsService:
     @staticmethod
     def get_faculty_book_usage():
         """Get book usage by faculty"""
-        return Faculty.objects.annotate(
+        return Faculty.objects.using(read_db()).annotate(
             book_count=Count('book_usages', distinct=True)
         ).order_by('-book_count')
 
+class RecommendationService:
+    """Offline "readers also borrowed" recommendations built from co-loans"""
+    
+    DEFAULT_TOP_K = 10
+    CHUNK_SIZE = 5000
+    
+    @staticmethod
+    def _student_baskets(book_ids=None):
+        """
+        Yield the set of distinct books borrowed by each student, live and
+        archived loans alike (UNION drops the duplicates).
+        When book_ids is given only students who borrowed one of them are read.
+        """
+        live = Loan.objects.values_list('student_id', 'book_id').order_by()
+        archived = LoanArchive.objects.values_list('student_id', 'book_id').order_by()
+        if book_ids is not None:
+            borrowers = (
+                Q(student_id__in=Loan.objects.filter(book_id__in=book_ids).values('student_id'))
+                | Q(student_id__in=LoanArchive.objects.filter(book_id__in=book_ids).values('student_id'))
+            )
+            live = live.filter(borrowers)
+            archived = archived.filter(borrowers)
+        rows = live.union(archived).order_by('student_id', 'book_id').iterator(
+            chunk_size=RecommendationService.CHUNK_SIZE
+        )
+        for _student_id, group in groupby(rows, key=itemgetter(0)):
+            yield [book_id for _, book_id in group]
+    
+    @staticmethod
+    def build_co_loan_matrix(book_ids=None):
+        """
+        Build the sparse book-book co-occurrence matrix as {book: Counter}.
+        Each student contributes one to every pair of distinct books they borrowed.
+        """
+        targets = set(book_ids) if book_ids is not None else None
+        matrix = defaultdict(Counter)
+        for basket in RecommendationService._student_baskets(targets):
+            if len(basket) < 2:
+                continue
+            for book_id in basket:
+                if targets is not None and book_id not in targets:
+                    continue
+                row = matrix[book_id]
+                row.update(basket)
+                row[book_id] -= 1
+        for row in matrix.values():
+            for book_id in [b for b, count in row.items() if count <= 0]:
+                del row[book_id]
+        return matrix
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(book_ids=None, top_k: int = DEFAULT_TOP_K) -> int:
+        """
+        Recompute and store top-K neighbours for the given books (all when None).
+        Returns the number of stored recommendation rows.
+        """
+        matrix = RecommendationService.build_co_loan_matrix(book_ids)
+        
+        records = []
+        for book_id, row in matrix.items():
+            neighbours = sorted(row.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+            records.extend(
+                BookRecommendation(
+                    book_id=book_id,
+                    recommended_book_id=other_id,
+                    score=score,
+                    rank=rank,
+                )
+                for rank, (other_id, score) in enumerate(neighbours, start=1)
+            )
+        
+        stale = BookRecommendation.objects.all()
+        if book_ids is not None:
+            stale = stale.filter(book_id__in=book_ids)
+        stale.delete()
+        BookRecommendation.objects.bulk_create(records, batch_size=RecommendationService.CHUNK_SIZE)
+        return len(records)
+    
+    @staticmethod
+    def refresh_stale(top_k: int = DEFAULT_TOP_K) -> int:
+        """
+        Incremental refresh: only books co-borrowed by students with new loans
+        since the last build are recomputed, archived loans included.
+        Falls back to a full rebuild.
+        """
+        last_run = BookRecommendation.objects.aggregate(last=Max('computed_at'))['last']
+        if last_run is None:
+            return RecommendationService.rebuild(top_k=top_k)
+        
+        active_students = Loan.objects.filter(issue_date__gt=last_run).values('student_id')
+        book_ids = set(
+            Loan.objects.filter(student_id__in=active_students).values_list('book_id', flat=True)
+        ) | set(
+            LoanArchive.objects.filter(student_id__in=active_students).values_list('book_id', flat=True)
+        )
+        if not book_ids:
+            return 0
+        return RecommendationService.rebuild(book_ids=book_ids, top_k=top_k)
+    
+    @staticmethod
+    def get_recommendations(book_id: int, limit: int = DEFAULT_TOP_K):
+        """Get precomputed recommendations for a book"""
+        return BookRecommendation.objects.filter(
+            book_id=book_id
+        ).select_related('recommended_book').order_by('rank')[:limit]
+
 # Helper functions for the required package procedures
 def get_copies_in_branch(book_id: int, branch_id: int) -> int:
     """Public interface for requirement 1"""
@@ -0,0 +1,237 @@
+"""
+Optional branch sharding of the branch-scoped tables (Loan, BookInventory).
+
+settings.SHARD_DATABASES lists the shard aliases (append-only: a shard's
+position fixes its loan id range) and settings.BRANCH_SHARDS maps a branch
+id to one of them. Unmapped branches stay on the default database; with an
+empty map nothing changes.
+
+Every shard carries the full schema. The reference tables (books, students,
+branches, ...) are copied to each shard by sync_reference_data(), so joins
+and foreign keys stay inside one database. Loans get globally unique ids:
+shard N allocates from N * LOAN_ID_SPAN, which lets a loan's pk name its
+shard.
+
+Reservations and transfers update the inventory on the branch's shard
+inside branch_atomic(), next to their @transaction.atomic on the default.
+Services whose statements join loans with reservations across branches
+(reconciliation, the bulk admin actions) refuse to run with shards
+configured: require_unsharded() raises ImproperlyConfigured. The headline
+stats still count the default database only.
+"""
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+SHARDED_MODELS = frozenset({'loan', 'bookinventory'})
+LOAN_ID_SPAN = 10 ** 12
+# Backends init_loan_ids() can start a loan id range on
+LOAN_ID_VENDORS = ('sqlite', 'postgresql')
+
+
+def sharding_enabled() -> bool:
+    return bool(getattr(settings, 'BRANCH_SHARDS', None))
+
+
+def require_unsharded(feature: str) -> None:
+    """Refuse a single-database code path while branches are sharded"""
+    if sharding_enabled():
+        raise ImproperlyConfigured(f'{feature} is not supported with BRANCH_SHARDS set')
+
+
+def validate_shard_settings() -> None:
+    """
+    Check the shard layout at startup (AppConfig.ready): every shard a
+    branch maps to is listed in SHARD_DATABASES, and every shard is a
+    configured database on a backend with loan id ranges.
+    """
+    shards = getattr(settings, 'SHARD_DATABASES', [])
+    for branch_id, alias in getattr(settings, 'BRANCH_SHARDS', {}).items():
+        if alias != DEFAULT_DB_ALIAS and alias not in shards:
+            raise ImproperlyConfigured(
+                f"BRANCH_SHARDS maps branch {branch_id} to {alias!r}, which is not in SHARD_DATABASES"
+            )
+    for alias in shards:
+        if alias not in connections:
+            raise ImproperlyConfigured(f"SHARD_DATABASES lists {alias!r}, which is not in DATABASES")
+        vendor = connections[alias].vendor
+        if vendor not in LOAN_ID_VENDORS:
+            raise ImproperlyConfigured(
+                f"Shard {alias!r} uses {vendor}; loan id ranges need one of {', '.join(LOAN_ID_VENDORS)}"
+            )
+
+
+def shard_for_branch(branch_id) -> str:
+    """Database alias holding the branch's loans and inventory"""
+    if branch_id is None or not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    return settings.BRANCH_SHARDS.get(int(branch_id), DEFAULT_DB_ALIAS)
+
+
+def branch_atomic(branch_id):
+    """
+    transaction.atomic() on the branch's shard, for writes that also go to
+    the default database. On the default itself the caller's atomic block
+    already covers them, so no extra savepoint is taken.
+    """
+    alias = shard_for_branch(branch_id)
+    return transaction.atomic(using=alias, savepoint=alias != DEFAULT_DB_ALIAS)
+
+
+def pin_to_shard(instance, kwargs) -> dict:
+    """
+    save() kwargs with `using` set to the row's shard. QuerySet.create() and
+    friends route without an instance hint, so the model pins itself.
+    """
+    if sharding_enabled():
+        kwargs['using'] = shard_for_branch(instance.branch_id)
+    return kwargs
+
+
+def shard_for_loan(pk) -> str:
+    """Database alias a loan lives in, from its id range"""
+    index = int(pk) // LOAN_ID_SPAN
+    shards = getattr(settings, 'SHARD_DATABASES', [])
+    if not sharding_enabled() or index == 0 or index > len(shards):
+        return DEFAULT_DB_ALIAS
+    return shards[index - 1]
+
+
+def shard_aliases() -> list:
+    """Every database holding branch-scoped rows"""
+    if not sharding_enabled():
+        return [DEFAULT_DB_ALIAS]
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *settings.SHARD_DATABASES]))
+
+
+def for_branch(queryset, branch_id):
+    """Branch-scoped queryset on the branch's shard"""
+    return queryset.using(shard_for_branch(branch_id)).filter(branch_id=branch_id)
+
+
+def _sort_value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def across_branches(queryset, ordering: str = None, limit: int = None) -> list:
+    """
+    Evaluate a cross-branch queryset on every shard concurrently and merge.
+    
+    ordering is a single field name, '-' prefixed for descending; each shard
+    returns at most `limit` rows already ordered, so the merge stays cheap.
+    """
+    from .services import QueryFanOut
+
+    if ordering:
+        queryset = queryset.order_by(ordering)
+    if limit is not None:
+        queryset = queryset[:limit]
+    if not sharding_enabled():
+        return list(queryset)
+
+    parts = QueryFanOut.run(**{
+        alias: (lambda alias=alias: list(queryset.using(alias)))
+        for alias in shard_aliases()
+    }).values()
+    if not ordering:
+        merged = [row for part in parts for row in part]
+    else:
+        field = ordering.lstrip('-')
+        merged = list(heapq.merge(
+            *parts,
+            key=lambda row: _sort_value(row, field),
+            reverse=ordering.startswith('-')
+        ))
+    return merged[:limit] if limit is not None else merged
+
+
+def count_across_branches(queryset) -> int:
+    from .services import QueryFanOut
+
+    if not sharding_enabled():
+        return queryset.count()
+    return sum(QueryFanOut.run(**{
+        alias: queryset.using(alias).count for alias in shard_aliases()
+    }).values())
+
+
+def reference_models():
+    """Tables copied to every shard, parents before children"""
+    from .models import Author, Book, Branch, Faculty, Publisher, Student
+
+    return [
+        get_user_model(), Faculty, Branch, Publisher, Author, Book,
+        Book.authors.through, Student,
+    ]
+
+
+def sync_reference_data(alias: str, batch_size: int = 500) -> dict:
+    """Upsert the reference tables from the default database into a shard"""
+    copied = {}
+    for model in reference_models():
+        rows = list(model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk'))
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        model._base_manager.using(alias).bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=bool(fields),
+            update_fields=fields or None,
+            unique_fields=['pk'] if fields else None,
+            ignore_conflicts=not fields,
+        )
+        copied[model._meta.label] = len(rows)
+    return copied
+
+
+def init_loan_ids(alias: str) -> None:
+    """Start the shard's loan ids at its range so pks stay globally unique"""
+    from .models import Loan
+
+    base = (settings.SHARD_DATABASES.index(alias) + 1) * LOAN_ID_SPAN
+    connection = connections[alias]
+    table = Loan._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MAX(id) FROM {connection.ops.quote_name(table)}')
+        if (cursor.fetchone()[0] or 0) >= base:
+            return
+        if connection.vendor == 'sqlite':
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [table])
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, base])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT setval(pg_get_serial_sequence(%s, %s), %s)', [table, 'id', base])
+        else:
+            # validate_shard_settings() rejects these layouts at startup
+            raise ImproperlyConfigured(f'Loan id ranges are not supported on {connection.vendor}')
+
+
+class BranchShardRouter:
+    """Routes Loan and BookInventory rows to their branch's shard"""
+
+    def _shard_of(self, model, hints):
+        if not sharding_enabled() or model._meta.model_name not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, model) and instance.branch_id is not None:
+            return shard_for_branch(instance.branch_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_of(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_of(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Reference rows exist in every shard
+        if sharding_enabled() and (
+            obj1._meta.model_name not in SHARDED_MODELS
+            or obj2._meta.model_name not in SHARDED_MODELS
+        ):
+            return True
+        return None
@@ -0,0 +1,27 @@
+from django import template
+from django.apps import apps
+
+from library_app.model_versions import ModelVersions
+
+register = template.Library()
+
+
+@register.simple_tag
+def model_version(label):
+    """
+    Write token of a model for {% cache %} keys:
+        {% model_version 'library_app.Publisher' as publishers_version %}
+        {% cache 3600 publisher_filter publishers_version %}...{% endcache %}
+    """
+    return ModelVersions.version(apps.get_model(label))
+
+
+@register.simple_tag
+def model_versions(*labels):
+    """
+    Write tokens of several models in one cache round trip, by model name:
+        {% model_versions 'library_app.Book' 'library_app.Author' as versions %}
+        {% cache 3600 book_grid versions.Book versions.Author %}...{% endcache %}
+    """
+    tokens = ModelVersions.versions(*(apps.get_model(label) for label in labels))
+    return {model.__name__: token for model, token in tokens.items()}
@@ -1,20 +1,48 @@
+import asyncio
+import importlib
+import contextvars
 import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
 from datetime import timedelta
-from django.test import TestCase, Client, RequestFactory
+from types import SimpleNamespace
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.test import TestCase, SimpleTestCase, Client, RequestFactory, override_settings
+from django.conf import settings
+from unittest import mock, skipUnless
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.urls import reverse
+from django.db import OperationalError, connections
+from django.test.utils import CaptureQueriesContext
+from django.contrib import admin
 from django.utils import timezone
-from django.core.exceptions import ValidationError
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.contrib.admin.sites import AdminSite
 
 from .models import (
     Author, Publisher, Book, Branch, BookInventory,
-    Faculty, BookFacultyUsage, Student, Loan, LibraryBusinessError
+    Faculty, BookFacultyUsage, Student, Loan, LibraryBusinessError,
+    BookRecommendation, Reservation, BranchLink, Transfer, TransferItem, LoanEvent,
+    LoanArchive
+)
+from .catalog import CatalogSnapshot, CatalogTable
+from .model_versions import ModelVersions, check_shared_cache
+from .pagination import ApiPagination, EstimatedCountPaginator
+from .serializers import BOOK_SUMMARY, LOAN, dumps
+from .pubsub import availability_snapshot, broker
+from .routers import ReplicaRouter, ReplicaStickinessMiddleware, replica_reads
+from .sharding import (
+    LOAN_ID_SPAN, BranchShardRouter, across_branches, count_across_branches,
+    init_loan_ids, shard_for_branch, shard_for_loan, sync_reference_data, validate_shard_settings
 )
 from .forms import (
     AuthorForm, PublisherForm, BookForm, BranchForm,
-    FacultyForm, StudentForm, LoanForm, InventoryForm
+    FacultyForm, StudentForm, LoanForm, InventoryForm, ReportSearchForm
 )
 from .admin import (
     AuthorAdmin, PublisherAdmin, BookAdmin, BranchAdmin,
@@ -22,10 +50,20 @@ from .admin import (
     StudentAdmin, LoanAdmin
 )
 from .views import is_librarian
+from .services import (
+    RecommendationService, ReservationService, AvailabilityService, TransferService,
+    ReconciliationService, LoanEventProjector, LoanArchiveService, QueryFanOut,
+    LibraryStatsService, BulkInventoryService, ReferenceDataService, AnalyticsService
+)
+from .exceptions import LibraryBusinessError as ServiceError
 
 User = get_user_model()
 
 
+# Classes that count queries keep cache reads out of the count
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
 class ModelTests(TestCase):
     """Тесты для моделей приложения"""
 
@@ -673,6 +711,185 @@ class AdminTests(TestCase):
         print("test_inventory_admin: Done")
 
 
+class AdminQueryBudgetTests(TestCase):
+    """Тесты числа запросов на страницах списков админ-панели"""
+    # Сессия, пользователь, count, выборка, фильтры боковой панели
+    QUERY_BUDGET = 12
+
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            username='admin', password='adminpass123', email='admin@example.com'
+        )
+        self.client.login(username='admin', password='adminpass123')
+        self.seeded = 0
+
+    def _seed(self, count):
+        """Создает по count записей каждой модели со связями"""
+        for _ in range(count):
+            self.seeded += 1
+            n = self.seeded
+            author = Author.objects.create(last_name=f'Автор {n}', first_name='Имя')
+            publisher = Publisher.objects.create(name=f'Издательство {n}')
+            book = Book.objects.create(title=f'Книга {n}', publisher=publisher, publication_year=2000, page_count=100)
+            book.authors.add(author)
+            branch = Branch.objects.create(name=f'Филиал {n}')
+            other = Branch.objects.create(name=f'Соседний филиал {n}')
+            BranchLink.objects.create(from_branch=branch, to_branch=other)
+            faculty = Faculty.objects.create(name=f'Факультет {n}')
+            student = Student.objects.create(last_name=f'Студент {n}', first_name='Имя', student_id=f'B{n}', faculty=faculty)
+            BookInventory.objects.create(book=book, branch=branch, total_copies=3, available_copies=3)
+            BookFacultyUsage.objects.create(book=book, branch=branch, faculty=faculty)
+            loan = Loan.objects.create(student=student, book=book, branch=branch)
+            returned = Loan.objects.create(student=student, book=book, branch=branch)
+            returned.is_returned = True
+            returned.save()
+            LoanArchive.from_loan(returned).save()
+            Reservation.objects.create(student=student, book=book, branch=branch, loan=loan)
+            transfer = Transfer.objects.create(from_branch=branch, to_branch=other, created_by=self.superuser)
+            TransferItem.objects.create(transfer=transfer, book=book, quantity=1)
+
+    def _changelist_queries(self, model):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_budget(self):
+        """Тест: число запросов списка не зависит от числа строк"""
+        models = [model for model in admin.site._registry if model._meta.app_label == 'library_app']
+        self._seed(2)
+        baseline = {model: self._changelist_queries(model) for model in models}
+        self._seed(8)
+        for model in models:
+            with self.subTest(model=model._meta.model_name):
+                queries = self._changelist_queries(model)
+                self.assertEqual(queries, baseline[model])
+                self.assertLessEqual(queries, self.QUERY_BUDGET)
+        print("test_changelist_query_budget: Done")
+
+    def test_transfer_change_page(self):
+        """Тест: позиции перемещения загружаются с книгами одним запросом"""
+        self._seed(1)
+        transfer = Transfer.objects.get()
+        for n in range(5):
+            book = Book.objects.create(title=f'Доп. книга {n}', publication_year=2000, page_count=10)
+            TransferItem.objects.create(transfer=transfer, book=book)
+        url = reverse('admin:library_app_transfer_change', args=[transfer.pk])
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "library_app_book" WHERE' in q['sql']])
+        print("test_transfer_change_page: Done")
+
+
+class AdminBulkActionTests(TestCase):
+    """Тесты массовых действий админ-панели над выдачами и инвентарем"""
+
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            username='admin', password='adminpass123', email='admin@example.com'
+        )
+        self.client.login(username='admin', password='adminpass123')
+        self.branch = Branch.objects.create(name='Центральный')
+        self.other_branch = Branch.objects.create(name='Северный')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.students = [
+            Student.objects.create(last_name=f'Студент {n}', first_name='Имя', student_id=f'BA{n}', faculty=self.faculty)
+            for n in range(4)
+        ]
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        self.other_book = Book.objects.create(title='Другая книга', publication_year=2000, page_count=10)
+        self.inventory = BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=3, available_copies=3)
+        self.other_inventory = BookInventory.objects.create(
+            book=self.other_book, branch=self.branch, total_copies=2, available_copies=2
+        )
+
+    def _run_action(self, model, action, objects, **extra):
+        url = reverse(f'admin:library_app_{model._meta.model_name}_changelist')
+        return self.client.post(url, {
+            'action': action,
+            '_selected_action': [obj.pk for obj in objects],
+            **extra
+        })
+
+    def test_mark_returned(self):
+        """Тест массового возврата с одной сверкой инвентаря"""
+        loans = [
+            Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch),
+            Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch),
+            Loan.objects.create(student=self.students[2], book=self.other_book, branch=self.branch),
+        ]
+        Reservation.objects.create(student=self.students[3], book=self.book, branch=self.branch)
+
+        response = self._run_action(Loan, 'mark_returned', loans)
+        self.assertEqual(response.status_code, 302)
+
+        self.assertFalse(Loan.objects.filter(is_returned=False).exists())
+        self.assertFalse(Loan.objects.filter(return_date__isnull=True).exists())
+        self.assertEqual(LoanEvent.objects.filter(event_type=LoanEvent.RETURNED).count(), 3)
+        # Один освободившийся экземпляр отложен по бронированию
+        self.inventory.refresh_from_db()
+        self.other_inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 2)
+        self.assertEqual(self.other_inventory.available_copies, 2)
+        self.assertEqual(Reservation.objects.get().status, Reservation.STATUS_READY)
+        self.assertEqual(ReconciliationService.find_discrepancies(), [])
+
+        # Повторный возврат ничего не меняет
+        self.assertEqual(BulkInventoryService.return_loans(Loan.objects.all()), 0)
+        print("test_mark_returned: Done")
+
+    def test_delete_selected_returns_copies(self):
+        """Тест: массовое удаление выдач возвращает экземпляры в инвентарь"""
+        active = Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        returned = Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch)
+        returned.is_returned = True
+        returned.save()
+
+        response = self._run_action(Loan, 'delete_selected', [active, returned], post='yes')
+        self.assertEqual(response.status_code, 302)
+
+        self.assertFalse(Loan.objects.exists())
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 3)
+        self.assertEqual(LoanEvent.objects.filter(event_type=LoanEvent.DELETED).count(), 2)
+        print("test_delete_selected_returns_copies: Done")
+
+    def test_adjust_copies(self):
+        """Тест массового изменения числа экземпляров"""
+        Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+
+        self._run_action(BookInventory, 'adjust_copies', [self.inventory, self.other_inventory], delta=2)
+        self.inventory.refresh_from_db()
+        self.other_inventory.refresh_from_db()
+        self.assertEqual((self.inventory.total_copies, self.inventory.available_copies), (5, 4))
+        self.assertEqual((self.other_inventory.total_copies, self.other_inventory.available_copies), (4, 4))
+
+        # Списать можно только свободные экземпляры: первая запись пропускается
+        self._run_action(BookInventory, 'adjust_copies', [self.inventory, self.other_inventory], delta=-4)
+        self.inventory.refresh_from_db()
+        self.other_inventory.refresh_from_db()
+        self.assertEqual((self.inventory.total_copies, self.inventory.available_copies), (1, 0))
+        self.assertEqual((self.other_inventory.total_copies, self.other_inventory.available_copies), (0, 0))
+        print("test_adjust_copies: Done")
+
+    def test_transfer_to_branch(self):
+        """Тест перемещения выбранного инвентаря в другой филиал"""
+        Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+
+        self._run_action(
+            BookInventory, 'transfer_to_branch', [self.inventory, self.other_inventory],
+            to_branch=self.other_branch.pk
+        )
+        transfer = Transfer.objects.get()
+        self.assertEqual((transfer.from_branch, transfer.to_branch), (self.branch, self.other_branch))
+        self.assertEqual(TransferService._items_of(transfer.pk), {self.book.pk: 2, self.other_book.pk: 2})
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.total_copies, self.inventory.available_copies), (1, 0))
+        print("test_transfer_to_branch: Done")
+
+
 class IntegrationTests(TestCase):
     """Интеграционные тесты"""
 
@@ -875,3 +1092,1747 @@ class EdgeCaseTests(TestCase):
         self.assertEqual(student.last_name, 'Иванов-Петров')
         self.assertEqual(student.first_name, 'Мария-Анна')
         print("test_student_with_special_characters: Done")
+
+
+class RecommendationTests(TestCase):
+    """Тесты рекомендаций «Читатели также брали»"""
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.books = [
+            Book.objects.create(title=f'Книга {i}', publication_year=2000, page_count=10)
+            for i in range(3)
+        ]
+        for book in self.books:
+            BookInventory.objects.create(book=book, branch=self.branch, total_copies=10, available_copies=10)
+        self.students = [
+            Student.objects.create(last_name=f'Студент{i}', first_name='Тест', student_id=f'S{i}', faculty=self.faculty)
+            for i in range(3)
+        ]
+        # Книги 0 и 1 брали вместе двое студентов, книги 0 и 2 - один
+        self._borrow(self.students[0], self.books[0], self.books[1])
+        self._borrow(self.students[1], self.books[0], self.books[1], self.books[2])
+        self._borrow(self.students[2], self.books[2])
+
+    def _borrow(self, student, *books):
+        for book in books:
+            Loan.objects.create(student=student, book=book, branch=self.branch)
+
+    def test_co_loan_matrix(self):
+        """Тест построения матрицы совместных выдач"""
+        matrix = RecommendationService.build_co_loan_matrix()
+        self.assertEqual(matrix[self.books[0].id][self.books[1].id], 2)
+        self.assertEqual(matrix[self.books[0].id][self.books[2].id], 1)
+        self.assertNotIn(self.books[0].id, matrix[self.books[0].id])
+        print("test_co_loan_matrix: Done")
+
+    def test_rebuild_stores_top_k(self):
+        """Тест сохранения top-K соседей"""
+        RecommendationService.rebuild(top_k=1)
+        recommendations = list(RecommendationService.get_recommendations(self.books[0].id))
+        self.assertEqual(len(recommendations), 1)
+        self.assertEqual(recommendations[0].recommended_book, self.books[1])
+        self.assertEqual(recommendations[0].score, 2)
+        print("test_rebuild_stores_top_k: Done")
+
+    def test_refresh_stale_only_touched_books(self):
+        """Тест инкрементального обновления"""
+        RecommendationService.rebuild()
+        new_book = Book.objects.create(title='Новая книга', publication_year=2000, page_count=10)
+        BookInventory.objects.create(book=new_book, branch=self.branch, total_copies=2, available_copies=2)
+        self._borrow(self.students[2], new_book)
+
+        RecommendationService.refresh_stale()
+
+        self.assertTrue(
+            BookRecommendation.objects.filter(book=self.books[2], recommended_book=new_book).exists()
+        )
+        self.assertFalse(
+            BookRecommendation.objects.filter(book=self.books[0], recommended_book=new_book).exists()
+        )
+        print("test_refresh_stale_only_touched_books: Done")
+
+    def test_refresh_stale_includes_archived_loans(self):
+        """Тест: инкрементальное обновление учитывает архивные выдачи активного студента"""
+        student = Student.objects.create(last_name='Архивов', first_name='Тест', student_id='S9', faculty=self.faculty)
+        x, y, z = [
+            Book.objects.create(title=title, publication_year=2000, page_count=10) for title in ('X', 'Y', 'Z')
+        ]
+        for book in (x, y, z):
+            BookInventory.objects.create(book=book, branch=self.branch, total_copies=2, available_copies=2)
+        self._borrow(student, x, y)
+        Loan.objects.filter(student=student).update(
+            is_returned=True,
+            issue_date=timezone.now() - timedelta(days=800),
+            return_date=timezone.now() - timedelta(days=790)
+        )
+        LoanArchiveService.archive_returned()
+        self.assertFalse(Loan.objects.filter(student=student).exists())
+        RecommendationService.rebuild()
+
+        self._borrow(student, z)
+        RecommendationService.refresh_stale()
+
+        neighbours = RecommendationService.get_recommendations(x.id)
+        self.assertEqual(sorted(item.recommended_book.title for item in neighbours), ['Y', 'Z'])
+        print("test_refresh_stale_includes_archived_loans: Done")
+
+
+class ReservationTests(TestCase):
+    """Тесты очереди бронирования"""
+
+    def setUp(self):
+        self.client = Client()
+        self.librarian = User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.book = Book.objects.create(title='Редкая книга', publication_year=2000, page_count=10)
+        self.inventory = BookInventory.objects.create(
+            book=self.book, branch=self.branch, total_copies=2, available_copies=2
+        )
+        self.students = [
+            Student.objects.create(last_name=f'Студент{i}', first_name='Тест', student_id=f'R{i}', faculty=self.faculty)
+            for i in range(4)
+        ]
+        # Оба экземпляра на руках
+        self.loan = Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        Loan.objects.create(student=self.students[3], book=self.book, branch=self.branch)
+        self.inventory.refresh_from_db()
+
+    def test_fifo_allocation_on_return(self):
+        """Тест выделения экземпляра первому в очереди при возврате"""
+        first = ReservationService.place_hold(self.students[1].id, self.book.id, self.branch.id)
+        second = ReservationService.place_hold(self.students[2].id, self.book.id, self.branch.id)
+        self.assertEqual(first.status, Reservation.STATUS_WAITING)
+        self.assertEqual(ReservationService.get_queue_position(second), 2)
+
+        self.client.login(username='librarian', password='librarianpass123')
+        self.client.post(reverse('loan_return', args=[self.loan.id]))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.inventory.refresh_from_db()
+        self.assertEqual(first.status, Reservation.STATUS_READY)
+        self.assertEqual(second.status, Reservation.STATUS_WAITING)
+        self.assertEqual(self.inventory.available_copies, 0)
+        print("test_fifo_allocation_on_return: Done")
+
+    def test_every_freed_copy_goes_to_queue(self):
+        """Тест: удаление выдачи, правка инвентаря и перемещения тоже выделяют экземпляр"""
+        holds = [
+            ReservationService.place_hold(student.id, self.book.id, self.branch.id)
+            for student in self.students[1:3]
+        ]
+        self.client.login(username='librarian', password='librarianpass123')
+
+        self.client.post(reverse('loan_delete', args=[self.loan.id]))
+        holds[0].refresh_from_db()
+        self.assertEqual(holds[0].status, Reservation.STATUS_READY)
+
+        self.client.post(reverse('inventory_edit', args=[self.inventory.id]), {
+            'book': self.book.id, 'branch': self.branch.id, 'total_copies': 3, 'available_copies': 1,
+        })
+        holds[1].refresh_from_db()
+        self.assertEqual(holds[1].status, Reservation.STATUS_READY)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 0)
+
+        other_branch = Branch.objects.create(name='Другой филиал')
+        BookInventory.objects.create(book=self.book, branch=other_branch, total_copies=1, available_copies=1)
+        third = ReservationService.place_hold(self.students[0].id, self.book.id, self.branch.id)
+        transfer = TransferService.create_transfer(other_branch.id, self.branch.id, {self.book.id: 1})
+        TransferService.receive(transfer.id)
+        third.refresh_from_db()
+        self.assertEqual(third.status, Reservation.STATUS_READY)
+
+        student = Student.objects.create(last_name='Студент4', first_name='Тест', student_id='R4', faculty=self.faculty)
+        fourth = ReservationService.place_hold(student.id, self.book.id, self.branch.id)
+        BulkInventoryService.delete_loans(Loan.objects.filter(student=self.students[3]))
+        fourth.refresh_from_db()
+        self.assertEqual(fourth.status, Reservation.STATUS_READY)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 0)
+        print("test_every_freed_copy_goes_to_queue: Done")
+
+    def test_collect_issues_loan(self):
+        """Тест выдачи книги по бронированию"""
+        self.inventory.available_copies = 1
+        self.inventory.save()
+        reservation = ReservationService.place_hold(self.students[1].id, self.book.id, self.branch.id)
+        self.assertEqual(reservation.status, Reservation.STATUS_READY)
+
+        loan = ReservationService.collect(reservation.id)
+
+        reservation.refresh_from_db()
+        self.inventory.refresh_from_db()
+        self.assertEqual(reservation.status, Reservation.STATUS_FULFILLED)
+        self.assertEqual(reservation.loan, loan)
+        self.assertEqual(self.inventory.available_copies, 0)
+        with self.assertRaises(ServiceError):
+            ReservationService.collect(reservation.id)
+        print("test_collect_issues_loan: Done")
+
+    def test_expired_hold_passes_to_next(self):
+        """Тест передачи экземпляра следующему при истечении срока"""
+        first = ReservationService.place_hold(self.students[1].id, self.book.id, self.branch.id)
+        second = ReservationService.place_hold(self.students[2].id, self.book.id, self.branch.id)
+        BookInventory.objects.filter(pk=self.inventory.pk).update(available_copies=1)
+        ReservationService.allocate_copy(self.book.id, self.branch.id)
+        self.assertIsNone(ReservationService.allocate_copy(self.book.id, self.branch.id))
+
+        expired = ReservationService.expire_holds(now=timezone.now() + timedelta(days=ReservationService.HOLD_DAYS + 1))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(expired, 1)
+        self.assertEqual(first.status, Reservation.STATUS_EXPIRED)
+        self.assertEqual(second.status, Reservation.STATUS_READY)
+        print("test_expired_hold_passes_to_next: Done")
+
+    def test_reservation_views(self):
+        """Тест страниц бронирования"""
+        self.client.login(username='librarian', password='librarianpass123')
+        response = self.client.post(reverse('reservation_add'), {
+            'student': self.students[1].id,
+            'book': self.book.id,
+            'branch': self.branch.id,
+        })
+        self.assertRedirects(response, reverse('reservation_list'))
+        response = self.client.get(reverse('reservation_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Редкая книга')
+        print("test_reservation_views: Done")
+
+
+class AvailabilityLookupTests(TestCase):
+    """Тесты поиска ближайшего филиала с книгой"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.branches = [Branch.objects.create(name=f'Филиал {i}') for i in range(4)]
+        # Цепочка 0 - 1 - 2, филиал 3 не связан
+        BranchLink.objects.create(from_branch=self.branches[0], to_branch=self.branches[1], distance=2)
+        BranchLink.objects.create(from_branch=self.branches[2], to_branch=self.branches[1], distance=3)
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        self.missing = Book.objects.create(title='Нет в наличии', publication_year=2000, page_count=10)
+        for branch in self.branches[1:]:
+            BookInventory.objects.create(book=self.book, branch=branch, total_copies=3, available_copies=3)
+        BookInventory.objects.create(book=self.missing, branch=self.branches[0], total_copies=1, available_copies=0)
+
+    def test_branch_distances(self):
+        """Тест кратчайших расстояний по графу филиалов"""
+        distances = AvailabilityService.branch_distances(self.branches[0].id)
+        self.assertEqual(distances[self.branches[2].id], 5)
+        self.assertNotIn(self.branches[3].id, distances)
+        print("test_branch_distances: Done")
+
+    def test_nearest_available_ranking(self):
+        """Тест ранжирования филиалов по расстоянию"""
+        with self.assertNumQueries(2):
+            result = AvailabilityService.nearest_available(
+                [self.book.id, self.missing.id], self.branches[0].id
+            )
+        ranked = [item['branch_id'] for item in result[self.book.id]]
+        self.assertEqual(ranked, [self.branches[1].id, self.branches[2].id, self.branches[3].id])
+        self.assertEqual(result[self.missing.id], [])
+        print("test_nearest_available_ranking: Done")
+
+    def test_api_availability(self):
+        """Тест API наличия по филиалам"""
+        response = self.client.get(
+            reverse('api_availability') + f'?books={self.book.id}&branch={self.branches[2].id}'
+        )
+        self.assertEqual(response.status_code, 200)
+        branches = response.json()['results'][0]['branches']
+        self.assertEqual(branches[0]['branch_id'], self.branches[2].id)
+
+        too_many = ','.join(str(i) for i in range(AvailabilityService.MAX_BASKET + 1))
+        self.assertEqual(self.client.get(reverse('api_availability') + f'?books={too_many}').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_availability') + '?books=abc').status_code, 400)
+        print("test_api_availability: Done")
+
+    def test_availability_lookup_page(self):
+        """Тест страницы поиска по всем филиалам"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('availability_lookup') + f'?search=Книга&branch={self.branches[0].id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Филиал 1')
+
+        for branch in ('abc', '1.5', '999999'):
+            with self.subTest(branch=branch):
+                response = self.client.get(reverse('availability_lookup'), {'search': 'Книга', 'branch': branch})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Выберите филиал из списка')
+                self.assertEqual(response.context['results'], [])
+        print("test_availability_lookup_page: Done")
+
+
+class TransferTests(TestCase):
+    """Тесты перемещения экземпляров между филиалами"""
+
+    def setUp(self):
+        self.source = Branch.objects.create(name='Закрывающийся филиал')
+        self.target = Branch.objects.create(name='Центральный филиал')
+        self.books = Book.objects.bulk_create([
+            Book(title=f'Книга {i}', publication_year=2000, page_count=10) for i in range(600)
+        ])
+        BookInventory.objects.bulk_create([
+            BookInventory(book=book, branch=self.source, total_copies=3, available_copies=2 + i % 2)
+            for i, book in enumerate(self.books)
+        ])
+        BookInventory.objects.create(book=self.books[0], branch=self.target, total_copies=1, available_copies=1)
+
+    def test_bulk_transfer_and_receive(self):
+        """Тест массового перемещения с групповыми обновлениями"""
+        # 8 запросов на перемещение и 5 пакетов записи в журнал событий (лимит параметров SQLite)
+        with self.assertNumQueries(13):
+            transfer = TransferService.transfer_all_stock(self.source.id, self.target.id)
+        self.assertEqual(transfer.status, Transfer.STATUS_IN_TRANSIT)
+        self.assertEqual(transfer.items.count(), 600)
+        self.assertFalse(BookInventory.objects.filter(branch=self.source, available_copies__gt=0).exists())
+        self.assertEqual(BookInventory.objects.filter(branch=self.target).count(), 1)
+
+        TransferService.receive(transfer.id)
+
+        target_rows = BookInventory.objects.filter(branch=self.target)
+        self.assertEqual(target_rows.count(), 600)
+        self.assertEqual(target_rows.get(book=self.books[0]).available_copies, 3)
+        self.assertEqual(target_rows.get(book=self.books[1]).total_copies, 3)
+        with self.assertRaises(ServiceError):
+            TransferService.receive(transfer.id)
+        print("test_bulk_transfer_and_receive: Done")
+
+    def test_insufficient_copies_rolls_back(self):
+        """Тест отката при нехватке экземпляров"""
+        items = {self.books[0].id: 1, self.books[1].id: 10}
+        with self.assertRaises(ServiceError):
+            TransferService.create_transfer(self.source.id, self.target.id, items)
+        self.assertEqual(BookInventory.objects.get(book=self.books[0], branch=self.source).available_copies, 2)
+        self.assertFalse(Transfer.objects.exists())
+        print("test_insufficient_copies_rolls_back: Done")
+
+    def test_cancel_returns_copies(self):
+        """Тест отмены перемещения"""
+        transfer = TransferService.create_transfer(self.source.id, self.target.id, {self.books[0].id: 2})
+        TransferService.cancel(transfer.id)
+        inventory = BookInventory.objects.get(book=self.books[0], branch=self.source)
+        self.assertEqual((inventory.total_copies, inventory.available_copies), (3, 2))
+        print("test_cancel_returns_copies: Done")
+
+    def test_transfer_views(self):
+        """Тест страниц перемещения"""
+        User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.client.login(username='librarian', password='librarianpass123')
+        response = self.client.post(reverse('transfer_add'), {
+            'from_branch': self.source.id,
+            'to_branch': self.target.id,
+            'book': self.books[0].id,
+            'quantity': 1,
+        })
+        self.assertRedirects(response, reverse('transfer_list'))
+        newest = TransferService.create_transfer(self.source.id, self.target.id, {self.books[1].id: 1})
+        response = self.client.get(reverse('transfer_list'))
+        self.assertContains(response, 'Закрывающийся филиал')
+        self.assertTrue(response.context['paginator'].object_list.ordered)
+        self.assertEqual(response.context['transfers'][0].pk, newest.pk)
+        print("test_transfer_views: Done")
+
+
+class ReconciliationTests(TestCase):
+    """Тесты сверки доступных экземпляров"""
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Иванов', first_name='Иван', student_id='1', faculty=self.faculty)
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        self.other = Book.objects.create(title='Другая книга', publication_year=2000, page_count=10)
+        self.inventory = BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=5, available_copies=5)
+        self.other_inventory = BookInventory.objects.create(book=self.other, branch=self.branch, total_copies=2, available_copies=2)
+        Loan.objects.create(student=self.student, book=self.book, branch=self.branch)
+        Loan.objects.create(student=self.student, book=self.book, branch=self.branch)
+        returned = Loan.objects.create(student=self.student, book=self.other, branch=self.branch)
+        returned.is_returned = True
+        returned.save()
+
+    def test_consistent_inventory_has_no_discrepancies(self):
+        """Тест отсутствия расхождений"""
+        self.assertEqual(ReconciliationService.find_discrepancies(), [])
+        print("test_consistent_inventory_has_no_discrepancies: Done")
+
+    def test_drift_is_reported_and_fixed(self):
+        """Тест обнаружения и исправления расхождений"""
+        BookInventory.objects.filter(pk=self.inventory.pk).update(available_copies=5)
+
+        with self.assertNumQueries(1):
+            discrepancies = ReconciliationService.find_discrepancies()
+        self.assertEqual(len(discrepancies), 1)
+        self.assertEqual(discrepancies[0]['expected'], 3)
+
+        ReconciliationService.reconcile(fix=True)
+        self.inventory.refresh_from_db()
+        self.other_inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 3)
+        self.assertEqual(self.other_inventory.available_copies, 2)
+        print("test_drift_is_reported_and_fixed: Done")
+
+    def test_reconcile_pairs_touches_only_given_rows(self):
+        """Тест сверки только переданных пар книга-филиал"""
+        second_branch = Branch.objects.create(name='Второй филиал')
+        BookInventory.objects.create(book=self.book, branch=second_branch, total_copies=1, available_copies=1)
+        BookInventory.objects.create(book=self.other, branch=second_branch, total_copies=1, available_copies=1)
+        BookInventory.objects.update(available_copies=0)
+
+        ReconciliationService.reconcile_pairs([(self.book.id, self.branch.id), (self.other.id, second_branch.id)])
+        available = {
+            (book_id, branch_id): copies
+            for book_id, branch_id, copies in BookInventory.objects.values_list('book_id', 'branch_id', 'available_copies')
+        }
+        self.assertEqual(available, {
+            (self.book.id, self.branch.id): 3,
+            (self.other.id, self.branch.id): 0,
+            (self.book.id, second_branch.id): 0,
+            (self.other.id, second_branch.id): 1,
+        })
+        print("test_reconcile_pairs_touches_only_given_rows: Done")
+
+
+class LoanEventTests(TestCase):
+    """Тесты журнала событий выдачи и проекций"""
+
+    def setUp(self):
+        self.client = Client()
+        self.librarian = User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.students = [
+            Student.objects.create(last_name=f'Студент{i}', first_name='Тест', student_id=f'E{i}', faculty=self.faculty)
+            for i in range(2)
+        ]
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        self.inventory = BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=5, available_copies=5)
+
+    def test_events_written_by_loan_paths(self):
+        """Тест записи событий при выдаче, возврате и удалении"""
+        loan = Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        self.client.login(username='librarian', password='librarianpass123')
+        self.client.post(reverse('loan_return', args=[loan.id]))
+        other = Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch)
+        other.delete()
+
+        events = list(LoanEvent.objects.values_list('event_type', 'on_loan_delta'))
+        self.assertEqual(events, [
+            (LoanEvent.ISSUED, 1), (LoanEvent.RETURNED, -1),
+            (LoanEvent.ISSUED, 1), (LoanEvent.DELETED, -1),
+        ])
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 5)
+        with self.assertRaises(LibraryBusinessError):
+            LoanEvent.objects.first().save()
+        print("test_events_written_by_loan_paths: Done")
+
+    def test_replay_rebuilds_counters(self):
+        """Тест восстановления счетчиков из журнала"""
+        Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        returned = Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch)
+        returned.is_returned = True
+        returned.save()
+        BookInventory.objects.filter(pk=self.inventory.pk).update(available_copies=0)
+
+        projector = LoanEventProjector().replay(batch_size=1)
+        self.assertEqual(projector.dashboard_stats(), {
+            'total_loans': 2, 'active_loans': 1, 'returned_loans': 1, 'active_students_count': 2,
+        })
+        self.assertEqual(sum(projector.daily_rollup().values()), 2)
+        self.assertEqual(projector.rebuild_available_copies(), 1)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 4)
+        print("test_replay_rebuilds_counters: Done")
+
+    def test_backfill_from_loans(self):
+        """Тест заполнения журнала по существующим выдачам"""
+        Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        LoanEvent.objects.all()._raw_delete(LoanEvent.objects.db)
+
+        self.assertEqual(LoanEventProjector.backfill_from_loans(), 1)
+        self.assertEqual(LoanEventProjector.backfill_from_loans(), 0)
+        print("test_backfill_from_loans: Done")
+
+    def test_backfill_issued_before_log_returned_after(self):
+        """Тест заполнения журнала для выдач, возвращенных или удаленных после его появления"""
+        open_loan = Loan.objects.create(student=self.students[0], book=self.book, branch=self.branch)
+        returned = Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch)
+        deleted = Loan.objects.create(student=self.students[1], book=self.book, branch=self.branch)
+        LoanEvent.objects.all()._raw_delete(LoanEvent.objects.db)
+
+        # Журнал появился: возврат и удаление уже записываются
+        returned.is_returned = True
+        returned.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        self.assertEqual(LoanEventProjector.backfill_from_loans(), 3)
+        self.assertEqual(LoanEventProjector.backfill_from_loans(), 0)
+        issued = LoanEvent.objects.filter(event_type=LoanEvent.ISSUED)
+        self.assertEqual(
+            sorted(issued.values_list('loan_id', flat=True)), sorted([open_loan.pk, returned.pk, deleted_pk])
+        )
+        self.assertEqual(LoanEvent.objects.filter(event_type=LoanEvent.RETURNED).count(), 1)
+
+        projector = LoanEventProjector().replay()
+        self.assertEqual(projector.on_loan[(self.book.id, self.branch.id)], 1)
+        BookInventory.objects.filter(pk=self.inventory.pk).update(available_copies=5)
+        projector.rebuild_available_copies()
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.available_copies, 4)
+        print("test_backfill_issued_before_log_returned_after: Done")
+
+
+class LoanArchiveTests(TestCase):
+    """Тесты архивации возвращенных выдач"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='reader', password='readerpass123')
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Архивов', first_name='Тест', student_id='A1', faculty=self.faculty)
+        self.book = Book.objects.create(title='Старая книга', publication_year=1990, page_count=10)
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=10, available_copies=10)
+        self.old_loans = []
+        for i in range(3):
+            loan = Loan.objects.create(student=self.student, book=self.book, branch=self.branch)
+            loan.is_returned = True
+            loan.save()
+            self.old_loans.append(loan)
+        Loan.objects.filter(pk__in=[loan.pk for loan in self.old_loans]).update(
+            issue_date=timezone.now() - timedelta(days=800),
+            return_date=timezone.now() - timedelta(days=790)
+        )
+        self.active = Loan.objects.create(student=self.student, book=self.book, branch=self.branch)
+
+    def test_archive_in_resumable_batches(self):
+        """Тест пакетной архивации с продолжением"""
+        self.assertEqual(LoanArchiveService.archive_returned(batch_size=2, max_batches=1), 2)
+        self.assertEqual(LoanArchiveService.archive_returned(batch_size=2), 1)
+        self.assertEqual(LoanArchiveService.archive_returned(batch_size=2), 0)
+
+        self.assertEqual(list(Loan.objects.values_list('pk', flat=True)), [self.active.pk])
+        self.assertEqual(
+            set(LoanArchive.objects.values_list('loan_id', flat=True)),
+            {loan.pk for loan in self.old_loans}
+        )
+        archived = LoanArchive.objects.first()
+        self.assertEqual(archived.year, archived.issue_date.year)
+        self.assertEqual(BookInventory.objects.get(book=self.book).available_copies, 9)
+        print("test_archive_in_resumable_batches: Done")
+
+    def test_history_spans_live_and_archive(self):
+        """Тест истории выдач из основной таблицы и архива"""
+        LoanArchiveService.archive_returned()
+        entries, total = LoanArchiveService.history(student_id=self.student.pk, limit=2)
+        self.assertEqual(total, 4)
+        self.assertEqual(entries[0], self.active)
+        self.assertTrue(entries[1].is_archived)
+
+        self.client.login(username='reader', password='readerpass123')
+        response = self.client.get(reverse('student_detail', args=[self.student.pk]))
+        self.assertContains(response, 'История выдач (4)')
+        self.assertContains(response, 'В архиве')
+        response = self.client.get(reverse('book_detail', args=[self.book.pk]))
+        self.assertEqual(len(response.context['loan_history']), 4)
+        print("test_history_spans_live_and_archive: Done")
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_statistics_include_archive(self):
+        """Тест: архивация не меняет статистику, отчеты и рекомендации"""
+        other_book = Book.objects.create(title='Вторая книга', publication_year=1991, page_count=10)
+        BookInventory.objects.create(book=other_book, branch=self.branch, total_copies=1, available_copies=1)
+        old = Loan.objects.create(student=self.student, book=other_book, branch=self.branch)
+        old.is_returned = True
+        old.save()
+        Loan.objects.filter(pk=old.pk).update(return_date=timezone.now() - timedelta(days=790))
+
+        def snapshot():
+            cache.clear()
+            self.client.login(username='reader', password='readerpass123')
+            context = self.client.get(reverse('reports_dashboard')).context
+            return (
+                LibraryStatsService.compute(),
+                [(book.pk, book.loan_count) for book in AnalyticsService.get_most_borrowed_books()],
+                (context['max_loans'], context['max_student_loans'], context['max_faculty_usage']),
+                RecommendationService.build_co_loan_matrix(),
+            )
+
+        before = snapshot()
+        self.assertEqual(LoanArchiveService.archive_returned(), 4)
+        self.assertEqual(snapshot(), before)
+        stats, most_borrowed, maxima, matrix = before
+        self.assertEqual((stats['total_loans'], stats['returned_loans'], stats['popular_books_count']), (5, 4, 2))
+        self.assertEqual(most_borrowed[0], (self.book.pk, 4))
+        self.assertEqual(maxima, (4, 5, 5))
+        self.assertEqual(matrix[self.book.pk][other_book.pk], 1)
+        print("test_statistics_include_archive: Done")
+
+
+class AsyncAPITests(TestCase):
+    """Тесты асинхронных API"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='kiosk', password='kioskpass123')
+        self.branch = Branch.objects.create(name='Филиал')
+        self.author = Author.objects.create(last_name='Автор', first_name='Тест')
+        self.book = Book.objects.create(title='Асинхронная книга', publication_year=2020, page_count=100)
+        self.book.authors.add(self.author)
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=3, available_copies=2)
+
+    async def test_async_views_match_sync_payloads(self):
+        """Тест совпадения ответов асинхронных и синхронных API"""
+        for sync_name, async_name, args in [
+            ('api_book_list', 'api_book_list_async', []),
+            ('api_book_detail', 'api_book_detail_async', [self.book.pk]),
+            ('api_inventory_list', 'api_inventory_list_async', []),
+            ('api_loan_list', 'api_loan_list_async', []),
+        ]:
+            expected = await sync_to_async(self.client.get)(reverse(sync_name, args=args))
+            response = await self.async_client.get(reverse(async_name, args=args))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+
+        response = await self.async_client.get(reverse('api_book_detail_async', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(reverse('api_book_list_async'))
+        self.assertEqual(response.status_code, 405)
+        print("test_async_views_match_sync_payloads: Done")
+
+    async def test_async_login_required(self):
+        """Тест проверки входа в асинхронных API"""
+        url = reverse('api_branch_books_async', args=[self.branch.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['results'][0]['authors'], str(self.author))
+        response = await self.async_client.get(reverse('api_book_inventory_async', args=[self.book.pk]))
+        self.assertEqual(response.json()['inventory'][0]['available_copies'], 2)
+        print("test_async_login_required: Done")
+
+
+class QueryFanOutTests(SimpleTestCase):
+    """Тесты параллельного выполнения запросов"""
+
+    def test_runs_on_worker_threads(self):
+        """Тест выполнения запросов в рабочих потоках"""
+        results = QueryFanOut.run(
+            first=lambda: threading.current_thread().name,
+            second=lambda: threading.current_thread().name,
+        )
+        self.assertEqual(set(results), {'first', 'second'})
+        self.assertTrue(all(name.startswith('query-fanout') for name in results.values()))
+        print("test_runs_on_worker_threads: Done")
+
+    def test_worker_connections_are_recycled(self):
+        """Тест закрытия устаревших соединений рабочих потоков до и после задачи"""
+        with mock.patch('library_app.services.close_old_connections') as close_old:
+            QueryFanOut.run(first=lambda: 1, second=lambda: 2)
+            self.assertEqual(close_old.call_count, 4)
+            with self.assertRaises(ZeroDivisionError):
+                QueryFanOut.run(first=lambda: 1, broken=lambda: 1 / 0)
+            self.assertEqual(close_old.call_count, 8)
+        print("test_worker_connections_are_recycled: Done")
+
+
+class QueryFanOutTransactionTests(TestCase):
+    """Тесты выполнения запросов внутри транзакции"""
+
+    def test_sequential_inside_transaction(self):
+        """Тест последовательного выполнения внутри открытой транзакции"""
+        Branch.objects.create(name='Невидимый другим соединениям')
+        self.assertFalse(QueryFanOut.can_fan_out())
+        results = QueryFanOut.run(branches=Branch.objects.count, books=Book.objects.count)
+        self.assertEqual(results, {'branches': 1, 'books': 0})
+        print("test_sequential_inside_transaction: Done")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LibraryStatsTests(TestCase):
+    """Тесты сводной статистики"""
+
+    def setUp(self):
+        cache.clear()
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Иванов', first_name='Иван', student_id='S1', faculty=self.faculty)
+        self.books = [
+            Book.objects.create(title=f'Книга {i}', publication_year=2000, page_count=10)
+            for i in range(2)
+        ]
+        for book in self.books:
+            BookInventory.objects.create(book=book, branch=self.branch, total_copies=4, available_copies=4)
+
+    def test_counters_in_single_query(self):
+        """Тест расчета всех счетчиков одним запросом"""
+        self.assertEqual(LibraryStatsService.compute()['total_inventory'], 8)
+        Loan.objects.create(student=self.student, book=self.books[0], branch=self.branch)
+        returned = Loan.objects.create(student=self.student, book=self.books[1], branch=self.branch)
+        returned.is_returned = True
+        returned.save()
+
+        with self.assertNumQueries(1):
+            stats = LibraryStatsService.compute()
+        self.assertEqual(stats, {
+            'total_books': 2, 'total_students': 1, 'total_branches': 1,
+            'total_authors': 0, 'total_publishers': 0, 'total_faculties': 1,
+            'total_loans': 2, 'active_loans': 1, 'returned_loans': 1,
+            'active_students_count': 1, 'popular_books_count': 2,
+            'total_inventory': 8, 'available_copies': 7,
+        })
+        print("test_counters_in_single_query: Done")
+
+    def test_headline_is_cached(self):
+        """Тест кэширования сводной статистики"""
+        self.assertEqual(LibraryStatsService.headline()['total_books'], 2)
+        Book.objects.create(title='Новая', publication_year=2001, page_count=10)
+        with self.assertNumQueries(0):
+            self.assertEqual(LibraryStatsService.headline()['total_books'], 2)
+        expired = time.time() + LibraryStatsService.CACHE_TTL + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=expired):
+            self.assertEqual(LibraryStatsService.headline()['total_books'], 3)
+        print("test_headline_is_cached: Done")
+
+
+class AvailabilityFeedTests(TestCase):
+    """Тесты потока изменений доступности"""
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='Филиал')
+        self.other_branch = Branch.objects.create(name='Другой филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Иванов', first_name='Иван', student_id='S1', faculty=self.faculty)
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=3, available_copies=3)
+
+    def _issue_loan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Loan.objects.create(student=self.student, book=self.book, branch=self.branch)
+
+    async def test_loan_publishes_to_branch_subscribers(self):
+        """Тест публикации изменений подписчикам филиала"""
+        subscription = broker.subscribe(self.branch.pk)
+        other = broker.subscribe(self.other_branch.pk)
+        try:
+            await sync_to_async(self._issue_loan)()
+            event = await asyncio.wait_for(subscription.queue.get(), 1)
+            self.assertEqual(event['books'], [{'book_id': self.book.pk, 'available_copies': 2, 'total_copies': 3}])
+            self.assertTrue(other.queue.empty())
+        finally:
+            broker.unsubscribe(subscription)
+            broker.unsubscribe(other)
+        self.assertFalse(broker.has_subscribers(self.branch.pk))
+        print("test_loan_publishes_to_branch_subscribers: Done")
+
+    async def test_stream_sends_snapshot(self):
+        """Тест начального состояния в потоке SSE"""
+        response = await self.async_client.get(reverse('availability_stream', args=[self.branch.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        snapshot = (await anext(stream)).decode()
+        self.assertIn('event: snapshot', snapshot)
+        self.assertIn('"available_copies": 3', snapshot)
+        await stream.aclose()
+
+        response = await self.async_client.get(reverse('availability_stream', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        print("test_stream_sends_snapshot: Done")
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    """Тесты настроенного бэкенда SQLite"""
+
+    def test_pragmas_and_immediate_transactions(self):
+        """Тест применения PRAGMA и BEGIN IMMEDIATE"""
+        from django.db.utils import load_backend
+
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = connections.configure_settings({'default': {
+                'ENGINE': 'library_app.backends.sqlite3',
+                'NAME': os.path.join(directory, 'tuned.sqlite3'),
+                'OPTIONS': {'pragmas': {'busy_timeout': 1234}},
+            }})['default']
+            wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'tuned')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 1234)
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+                self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+            finally:
+                wrapper.close()
+        print("test_pragmas_and_immediate_transactions: Done")
+
+    def test_no_lock_errors_under_contention(self):
+        """Тест конкурентной записи из нескольких процессов"""
+        from .management.commands.benchmark_sqlite_writes import run_contention
+
+        result = run_contention('library_app.backends.sqlite3', processes=4, writes=25)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['committed'], 100)
+        self.assertTrue(result['consistent'])
+        print("test_no_lock_errors_under_contention: Done")
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTests(SimpleTestCase):
+    """Тесты маршрутизации чтения на реплику"""
+
+    def _route(self, model, written=None):
+        router = ReplicaRouter()
+
+        @replica_reads
+        def view():
+            if written is not None:
+                router.db_for_write(written)
+            return router.db_for_read(model)
+
+        return contextvars.Context().run(view)
+
+    def test_routing_decisions(self):
+        """Тест выбора базы данных для чтения"""
+        self.assertIsNone(ReplicaRouter().db_for_read(Book))
+        self.assertEqual(self._route(Book), 'replica')
+        # Сессии и пользователи всегда читаются с основной базы
+        self.assertIsNone(self._route(User))
+        # Чтение своих записей
+        self.assertEqual(self._route(Book, written=Book), 'default')
+        # Запись в кэш или сессию не переключает чтение на основную базу
+        cache_model = caches['default'].cache_model_class
+        self.assertEqual(cache_model._meta.app_label, 'django_cache')
+        self.assertEqual(self._route(Book, written=cache_model), 'replica')
+        self.assertEqual(self._route(Book, written=User), 'replica')
+        with override_settings(REPLICA_DATABASE=None):
+            self.assertEqual(self._route(Book), 'default')
+        print("test_routing_decisions: Done")
+
+    def test_middleware_runs_natively_in_both_modes(self):
+        """Тест: промежуточный слой работает и синхронно, и асинхронно без адаптации"""
+        async def async_view(request):
+            return 'async'
+
+        request = RequestFactory().get('/')
+        middleware = ReplicaStickinessMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with override_settings(REPLICA_DATABASE=None):
+            self.assertEqual(asyncio.run(middleware(request)), 'async')
+
+        middleware = ReplicaStickinessMiddleware(lambda request: 'sync')
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(request), 'sync')
+        print("test_middleware_runs_natively_in_both_modes: Done")
+
+
+@skipUnless(getattr(settings, 'REPLICA_DATABASE', None), 'run with --settings=library_project.settings_replica')
+class ReplicaRoutingTests(TestCase):
+    """Тесты реплики на двух файлах SQLite"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.branch = Branch.objects.create(name='Филиал')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Иванов', first_name='Иван', student_id='S1', faculty=self.faculty)
+        self.book = Book.objects.create(title='Основная', publication_year=2000, page_count=10)
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=2, available_copies=2)
+        Book.objects.using('replica').create(title='Реплика', publication_year=2000, page_count=10)
+
+    def _api_titles(self):
+        response = self.client.get(reverse('api_book_list'))
+        return [book['title'] for book in response.json()['results']]
+
+    def test_reads_replica_until_session_writes(self):
+        """Тест чтения с реплики и привязки сессии к основной базе после записи"""
+        self.assertEqual(self._api_titles(), ['Реплика'])
+
+        self.client.login(username='librarian', password='librarianpass123')
+        response = self.client.post(reverse('loan_add'), {
+            'student': self.student.id,
+            'book': self.book.id,
+            'branch': self.branch.id
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._api_titles(), ['Основная'])
+        print("test_reads_replica_until_session_writes: Done")
+
+
+@override_settings(BRANCH_SHARDS={1: 'branch_a', 2: 'branch_b', 3: 'branch_a'}, SHARD_DATABASES=['branch_a', 'branch_b'])
+class BranchShardRouterTests(SimpleTestCase):
+    """Тесты маршрутизации данных филиалов по шардам"""
+
+    def test_shard_lookup(self):
+        """Тест выбора шарда по филиалу и по номеру выдачи"""
+        self.assertEqual(shard_for_branch(1), 'branch_a')
+        self.assertEqual(shard_for_branch('2'), 'branch_b')
+        self.assertEqual(shard_for_branch(7), 'default')
+        self.assertEqual(shard_for_branch(None), 'default')
+        self.assertEqual(shard_for_loan(15), 'default')
+        self.assertEqual(shard_for_loan(LOAN_ID_SPAN + 15), 'branch_a')
+        self.assertEqual(shard_for_loan(2 * LOAN_ID_SPAN + 15), 'branch_b')
+        with override_settings(BRANCH_SHARDS={}):
+            self.assertEqual(shard_for_branch(1), 'default')
+            self.assertEqual(shard_for_loan(LOAN_ID_SPAN + 15), 'default')
+        print("test_shard_lookup: Done")
+
+    def test_routing_decisions(self):
+        """Тест решений роутера для данных филиалов и справочников"""
+        router = BranchShardRouter()
+        self.assertEqual(router.db_for_write(Loan, instance=Loan(branch_id=2)), 'branch_b')
+        self.assertEqual(router.db_for_read(BookInventory, instance=BookInventory(branch_id=3)), 'branch_a')
+        # Без подсказки и для справочников решают следующие роутеры
+        self.assertIsNone(router.db_for_read(Loan))
+        self.assertIsNone(router.db_for_write(Book, instance=Book()))
+        self.assertTrue(router.allow_relation(Loan(branch_id=2), Book()))
+        with override_settings(BRANCH_SHARDS={}):
+            self.assertIsNone(router.db_for_write(Loan, instance=Loan(branch_id=2)))
+        print("test_routing_decisions: Done")
+
+    def test_invalid_layout_fails_at_startup(self):
+        """Тест проверки схемы шардов при запуске"""
+        shards = {'branch_a': SimpleNamespace(vendor='sqlite'), 'branch_b': SimpleNamespace(vendor='postgresql')}
+        with mock.patch('library_app.sharding.connections', shards):
+            validate_shard_settings()
+            with override_settings(BRANCH_SHARDS={1: 'branch_c'}):
+                with self.assertRaisesMessage(ImproperlyConfigured, 'not in SHARD_DATABASES'):
+                    validate_shard_settings()
+            with override_settings(SHARD_DATABASES=['branch_a', 'branch_b', 'branch_c']):
+                with self.assertRaisesMessage(ImproperlyConfigured, 'not in DATABASES'):
+                    validate_shard_settings()
+            shards['branch_b'] = SimpleNamespace(vendor='mysql')
+            with self.assertRaisesMessage(ImproperlyConfigured, 'uses mysql'):
+                validate_shard_settings()
+        print("test_invalid_layout_fails_at_startup: Done")
+
+    def test_single_database_services_refuse_shards(self):
+        """Тест отказа сверки остатков при включенном шардировании"""
+        with self.assertRaises(ImproperlyConfigured):
+            ReconciliationService.find_discrepancies()
+        with self.assertRaises(ImproperlyConfigured):
+            ReconciliationService.reconcile_pairs([(1, 2)])
+        with self.assertRaises(ImproperlyConfigured):
+            BulkInventoryService._loan_rows(Loan.objects.all())
+        print("test_single_database_services_refuse_shards: Done")
+
+
+@skipUnless(getattr(settings, 'SHARD_DATABASES', None), 'run with --settings=library_project.settings_sharded')
+class ShardingTests(TestCase):
+    """Тесты шардирования по филиалам на файлах SQLite"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.faculty = Faculty.objects.create(name='Факультет')
+        self.student = Student.objects.create(last_name='Иванов', first_name='Иван', student_id='S1', faculty=self.faculty)
+        self.book = Book.objects.create(title='Книга', publication_year=2000, page_count=10)
+        self.branch_a = Branch.objects.create(name='Филиал А')
+        self.branch_b = Branch.objects.create(name='Филиал Б')
+        self.branch_main = Branch.objects.create(name='Главный')
+
+        override = override_settings(BRANCH_SHARDS={self.branch_a.id: 'branch_a', self.branch_b.id: 'branch_b'})
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for alias in settings.SHARD_DATABASES:
+            sync_reference_data(alias)
+            init_loan_ids(alias)
+        for branch in (self.branch_a, self.branch_b, self.branch_main):
+            BookInventory.objects.create(book=self.book, branch=branch, total_copies=3, available_copies=3)
+        self.client.login(username='librarian', password='librarianpass123')
+
+    def test_loan_lifecycle_in_shard(self):
+        """Тест выдачи и возврата книги в шарде филиала"""
+        response = self.client.post(reverse('loan_add'), {
+            'student': self.student.id,
+            'book': self.book.id,
+            'branch': self.branch_b.id
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertFalse(Loan.objects.exists())
+        loan = Loan.objects.using('branch_b').get()
+        self.assertGreaterEqual(loan.pk, 2 * LOAN_ID_SPAN)
+        self.assertEqual(shard_for_loan(loan.pk), 'branch_b')
+        inventory = BookInventory.objects.using('branch_b').get(branch=self.branch_b)
+        self.assertEqual(inventory.available_copies, 2)
+
+        response = self.client.get(reverse('branch_detail', args=[self.branch_b.id]))
+        self.assertEqual(response.context['active_loans'], 1)
+        response = self.client.get(reverse('loan_list'), {'branch': self.branch_b.id})
+        self.assertEqual([item.pk for item in response.context['loans']], [loan.pk])
+
+        response = self.client.post(reverse('loan_return', args=[loan.pk]))
+        self.assertEqual(response.status_code, 302)
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.available_copies, 3)
+        print("test_loan_lifecycle_in_shard: Done")
+
+    def test_cross_branch_merge(self):
+        """Тест объединения выдач из всех шардов"""
+        now = timezone.now()
+        for days, branch in ((3, self.branch_a), (1, self.branch_b), (2, self.branch_main), (4, self.branch_b)):
+            loan = Loan.objects.create(student=self.student, book=self.book, branch=branch)
+            Loan.objects.using(shard_for_branch(branch.id)).filter(pk=loan.pk).update(
+                issue_date=now - timedelta(days=days)
+            )
+
+        loans = across_branches(Loan.objects.all(), ordering='-issue_date', limit=3)
+        self.assertEqual([loan.branch_id for loan in loans], [self.branch_b.id, self.branch_main.id, self.branch_a.id])
+        self.assertEqual(count_across_branches(Loan.objects.filter(is_returned=False)), 4)
+
+        response = self.client.get(reverse('loan_list'))
+        self.assertEqual(response.context['active_loans_count'], 4)
+        self.assertEqual(len(response.context['loans']), 4)
+        print("test_cross_branch_merge: Done")
+
+    def test_holds_and_transfers_in_shards(self):
+        """Тест резервирования и перемещений с остатками в шардах"""
+        reservation = ReservationService.place_hold(self.student.id, self.book.id, self.branch_a.id)
+        self.assertEqual(reservation.status, Reservation.STATUS_READY)
+        inventory_a = BookInventory.objects.using('branch_a').get(branch=self.branch_a)
+        self.assertEqual(inventory_a.available_copies, 2)
+
+        transfer = TransferService.create_transfer(self.branch_a.id, self.branch_b.id, {self.book.id: 2})
+        TransferService.receive(transfer.id)
+        inventory_a.refresh_from_db()
+        self.assertEqual((inventory_a.total_copies, inventory_a.available_copies), (1, 0))
+        inventory_b = BookInventory.objects.using('branch_b').get(branch=self.branch_b)
+        self.assertEqual((inventory_b.total_copies, inventory_b.available_copies), (5, 5))
+        self.assertFalse(BookInventory.objects.filter(branch__in=[self.branch_a, self.branch_b]).exists())
+
+        response = self.client.get(reverse('api_inventory_list'))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_inventory_list'), {'branch_id': self.branch_b.id})
+        self.assertEqual([row['total_copies'] for row in response.json()['results']], [5])
+        print("test_holds_and_transfers_in_shards: Done")
+
+    def test_failed_transfer_rolls_back_shard(self):
+        """Тест отката списаний в шарде, если перемещение упало на середине"""
+        other = Book.objects.create(title='Вторая', publication_year=2001, page_count=10)
+        short = Book.objects.create(title='Редкая', publication_year=2002, page_count=10)
+        sync_reference_data('branch_a')
+        BookInventory.objects.create(book=other, branch=self.branch_a, total_copies=3, available_copies=3)
+        BookInventory.objects.create(book=short, branch=self.branch_a, total_copies=1, available_copies=1)
+
+        with mock.patch.object(TransferService, 'CHUNK_SIZE', 1):
+            with self.assertRaises(ServiceError):
+                TransferService.create_transfer(
+                    self.branch_a.id, self.branch_b.id, {self.book.id: 2, other.id: 2, short.id: 2}
+                )
+
+        self.assertFalse(Transfer.objects.exists())
+        inventory = dict(
+            BookInventory.objects.using('branch_a').filter(branch=self.branch_a).values_list('book_id', 'available_copies')
+        )
+        self.assertEqual(inventory, {self.book.id: 3, other.id: 3, short.id: 1})
+        print("test_failed_transfer_rolls_back_shard: Done")
+
+    def test_inventory_reads_use_shards(self):
+        """Тест чтения инвентаря из шардов: бронирование, API, карточка книги, SSE"""
+        self.assertFalse(BookInventory.objects.filter(branch=self.branch_b).exists())
+        response = self.client.post(reverse('reservation_add'), {
+            'student': self.student.id,
+            'book': self.book.id,
+            'branch': self.branch_b.id
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Reservation.objects.filter(branch=self.branch_b).exists())
+
+        branches = sorted([self.branch_a.id, self.branch_b.id, self.branch_main.id])
+        for name in ('api_book_inventory', 'api_book_inventory_async'):
+            response = self.client.get(reverse(name, args=[self.book.pk]))
+            self.assertEqual(
+                [row['branch'] for row in response.json()['inventory']],
+                [Branch.objects.get(pk=pk).name for pk in branches]
+            )
+
+        response = self.client.get(reverse('book_detail', args=[self.book.pk]))
+        self.assertEqual([item.branch_id for item in response.context['inventory']], branches)
+
+        snapshot = availability_snapshot(self.branch_b.id)
+        self.assertEqual(snapshot['books'], [{'book_id': self.book.id, 'available_copies': 2, 'total_copies': 3}])
+        print("test_inventory_reads_use_shards: Done")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EstimatedCountPaginatorTests(TestCase):
+    """Тесты пагинатора с приблизительным числом записей"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='readerpass123')
+        self.client.login(username='reader', password='readerpass123')
+        self.faculty = Faculty.objects.create(name='Факультет')
+        for n in range(7):
+            Student.objects.create(last_name=f'Студент {n}', first_name='Имя', student_id=f'P{n}', faculty=self.faculty)
+
+    def test_exact_below_limit(self):
+        """Тест точного подсчета небольших выборок"""
+        paginator = EstimatedCountPaginator(Student.objects.order_by('pk'), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 7)
+        self.assertFalse(paginator.is_estimated)
+        self.assertEqual(paginator.num_pages, 4)
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
+        print("test_exact_below_limit: Done")
+
+    @mock.patch.object(EstimatedCountPaginator, 'EXACT_COUNT_LIMIT', 5)
+    def test_cached_count_above_limit(self):
+        """Тест кэшированного подсчета больших выборок"""
+        paginator = EstimatedCountPaginator(Student.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 7)
+        self.assertTrue(paginator.is_estimated)
+
+        # Тот же запрос берет число из кэша без обращения к базе
+        Student.objects.create(last_name='Новый', first_name='Имя', student_id='P99', faculty=self.faculty)
+        paginator = EstimatedCountPaginator(Student.objects.order_by('pk'), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 7)
+        print("test_cached_count_above_limit: Done")
+
+    @mock.patch.object(EstimatedCountPaginator, 'EXACT_COUNT_LIMIT', 5)
+    def test_list_view_shows_estimate(self):
+        """Тест отображения приблизительного числа в списке"""
+        with mock.patch('library_app.views.StudentListView.paginate_by', 2):
+            response = self.client.get(reverse('student_list'))
+        self.assertContains(response, 'около 7')
+        self.assertEqual(list(response.context['page_range']), [1, 2, 3, 4])
+        print("test_list_view_shows_estimate: Done")
+
+
+class FragmentCacheTests(TestCase):
+    """Тесты кэширования фрагментов страниц списков"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='readerpass123')
+        self.client.login(username='reader', password='readerpass123')
+        self.publisher = Publisher.objects.create(name='Эксмо')
+        self.author = Author.objects.create(last_name='Толстой', first_name='Лев')
+        self.book = Book.objects.create(title='Война и мир', publisher=self.publisher, publication_year=1869, page_count=1225)
+        self.book.authors.add(self.author)
+
+    def _get_book_list(self):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(reverse('book_list'))
+        self.assertEqual(response.status_code, 200)
+        publisher_queries = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "library_app_publisher"' in q['sql']
+        ]
+        return response, publisher_queries
+
+    def test_dropdown_cached_until_model_changes(self):
+        """Тест: список издательств берется из кэша до изменения модели"""
+        response, publisher_queries = self._get_book_list()
+        self.assertEqual(len(publisher_queries), 1)
+        response, publisher_queries = self._get_book_list()
+        self.assertEqual(publisher_queries, [])
+        self.assertContains(response, 'Эксмо')
+
+        Publisher.objects.create(name='Азбука')
+        response, publisher_queries = self._get_book_list()
+        self.assertEqual(len(publisher_queries), 1)
+        self.assertContains(response, 'Азбука')
+        print("test_dropdown_cached_until_model_changes: Done")
+
+    def test_book_card_invalidation(self):
+        """Тест обновления карточки книги после изменения книги и авторов"""
+        self._get_book_list()
+        self.book.title = 'Анна Каренина'
+        self.book.save()
+        response, _ = self._get_book_list()
+        self.assertContains(response, 'Анна Каренина')
+
+        self.book.authors.add(Author.objects.create(last_name='Чехов', first_name='Антон'))
+        response, _ = self._get_book_list()
+        self.assertContains(response, 'Чехов')
+
+        self.author.last_name = 'Толстой-младший'
+        self.author.save()
+        response, _ = self._get_book_list()
+        self.assertContains(response, 'Толстой-младший')
+        print("test_book_card_invalidation: Done")
+
+    def test_book_grid_queries_with_default_cache(self):
+        """Тест числа запросов списка книг с кэшем из settings.CACHES"""
+        for number in range(25):
+            Book.objects.create(title=f'Книга {number}', publisher=self.publisher, publication_year=2000, page_count=10)
+        self.client.get(reverse('book_list'))
+        # Сессия, пользователь, COUNT с его ключом кэша, справочник издательств
+        # (2), версии моделей одним get_many и два фрагмента: без запросов на карточку
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('book_list'))
+        self.assertContains(response, 'Книга 0')
+        print("test_book_grid_queries_with_default_cache: Done")
+
+
+    def test_shared_cache_check(self):
+        """Тест предупреждения о кэше, не общем для процессов"""
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=LOCMEM_CACHES):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['library_app.W001'])
+        print("test_shared_cache_check: Done")
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReferenceDataTests(TestCase):
+    """Тесты кэша справочников для выпадающих списков"""
+    REFERENCE_TABLES = ('"library_app_publisher"', '"library_app_faculty"', '"library_app_branch"')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='librarian', password='librarianpass123', is_staff=True)
+        self.client.login(username='librarian', password='librarianpass123')
+        self.branch = Branch.objects.create(name='Центральный')
+        self.faculty = Faculty.objects.create(name='Физический')
+        Publisher.objects.create(name='Эксмо')
+
+    def _reference_queries(self, url):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            q['sql'] for q in queries.captured_queries
+            if any(f'FROM {table}' in q['sql'] for table in self.REFERENCE_TABLES)
+        ]
+
+    def test_list_pages_skip_reference_queries(self):
+        """Тест: страницы списков не запрашивают справочники при теплом кэше"""
+        urls = [
+            reverse(name) for name in
+            ('book_list', 'student_list', 'loan_list', 'reservation_list', 'inventory_list', 'inventory_query')
+        ]
+        for url in urls:
+            self.client.get(url)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self._reference_queries(url), [])
+        print("test_list_pages_skip_reference_queries: Done")
+
+    def test_invalidated_by_signals(self):
+        """Тест сброса кэша при изменении справочника"""
+        self.assertEqual(ReferenceDataService.branches(), [{'id': self.branch.id, 'name': 'Центральный'}])
+        self.branch.name = 'Главный'
+        self.branch.save()
+        other = Branch.objects.create(name='Северный')
+        self.assertEqual(
+            sorted(row['name'] for row in ReferenceDataService.branches()),
+            ['Главный', 'Северный']
+        )
+        other.delete()
+        self.assertEqual([row['name'] for row in ReferenceDataService.branches()], ['Главный'])
+        print("test_invalidated_by_signals: Done")
+
+    def test_search_form_choices(self):
+        """Тест вариантов формы поиска из кэша"""
+        ReferenceDataService.branches()
+        ReferenceDataService.faculties()
+        with self.assertNumQueries(0):
+            form = ReportSearchForm()
+            html = form.as_p()
+        self.assertIn('Центральный', html)
+        self.assertIn('Физический', html)
+
+        form = ReportSearchForm({'period': 'all', 'branch': self.branch.id})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['branch'], self.branch)
+        print("test_search_form_choices: Done")
+
+    def test_forms_import_without_tables(self):
+        """Тест импорта форм без таблиц справочников (migrate на пустой базе)"""
+        from . import forms as forms_module
+        
+        no_tables = OperationalError('no such table: library_app_publisher')
+        try:
+            with mock.patch.object(ReferenceDataService, 'rows', side_effect=no_tables), \
+                    self.assertNumQueries(0):
+                importlib.reload(forms_module)
+                ReportSearchForm.base_fields['branch'].__deepcopy__({})
+        finally:
+            importlib.reload(forms_module)
+        print("test_forms_import_without_tables: Done")
+
+
+class CatalogSnapshotTests(TestCase):
+    """Тесты снимка справочников в памяти процесса"""
+
+    def setUp(self):
+        CatalogSnapshot.clear()
+        self.branch = Branch.objects.create(name='Центральный')
+        self.publisher = Publisher.objects.create(name='Эксмо')
+        self.student = Student.objects.create(
+            student_id='CAT001', last_name='Иванов', first_name='Иван',
+            faculty=Faculty.objects.create(name='Физический')
+        )
+        self.book = Book.objects.create(
+            title='Справочная книга', publication_year=2020, page_count=100, publisher=self.publisher
+        )
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=2, available_copies=2)
+        Loan.objects.create(book=self.book, student=self.student, branch=self.branch)
+
+    def test_table_lookup(self):
+        """Тест поиска по массиву идентификаторов"""
+        table = CatalogTable('v1', [(7, 'Седьмой'), (3, 'Третий'), (5, 'Пятый')])
+        self.assertEqual(list(table.ids), [3, 5, 7])
+        self.assertEqual(table.name(5), 'Пятый')
+        self.assertIsNone(table.name(4))
+        self.assertEqual(table.name(None, '-'), '-')
+        self.assertEqual(table.get(7).name, 'Седьмой')
+        self.assertEqual([record.id for record in table], [3, 5, 7])
+        self.assertGreater(table.nbytes(), 0)
+        with self.assertRaises(AttributeError):
+            table.extra = 1
+        print("test_table_lookup: Done")
+
+    def test_follows_writes(self):
+        """Тест обновления снимка после изменения справочника"""
+        self.assertEqual(CatalogSnapshot.branch_name(self.branch.id), 'Центральный')
+        self.branch.name = 'Главный'
+        self.branch.save()
+        self.assertEqual(CatalogSnapshot.branch_name(self.branch.id), 'Главный')
+
+        # Новая строка подхватывается при первом промахе
+        other = Branch.objects.create(name='Северный')
+        self.assertEqual(CatalogSnapshot.branch_name(other.id), 'Северный')
+        print("test_follows_writes: Done")
+
+    def test_version_checked_on_interval(self):
+        """Тест: чужая запись видна после проверки версии"""
+        CatalogSnapshot.refresh()
+        Branch.objects.filter(pk=self.branch.pk).update(name='Переименованный')
+        self.assertEqual(CatalogSnapshot.branch_name(self.branch.id), 'Центральный')
+
+        ModelVersions.bump(Branch)
+        with mock.patch.object(CatalogSnapshot, 'CHECK_INTERVAL', 0):
+            self.assertEqual(CatalogSnapshot.branch_name(self.branch.id), 'Переименованный')
+        print("test_version_checked_on_interval: Done")
+
+    def test_unknown_id_reloads_under_same_token(self):
+        """Тест: неизвестный id перечитывает таблицу даже без смены версии"""
+        CatalogSnapshot.refresh()
+        # Запись без сигналов (как из другого процесса без общего токена)
+        [other] = Branch.objects.bulk_create([Branch(name='Восточный')])
+        self.assertEqual(CatalogSnapshot.branch_name(other.id), 'Восточный')
+
+        # Повторный промах в пределах интервала не идет в базу
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertIsNone(CatalogSnapshot.branch_name(other.id + 1000))
+        self.assertFalse(any('"library_app_branch"' in q['sql'] for q in queries.captured_queries))
+        print("test_unknown_id_reloads_under_same_token: Done")
+
+    def test_api_skips_reference_joins(self):
+        """Тест: API не присоединяет таблицы справочников"""
+        CatalogSnapshot.refresh()
+        with CaptureQueriesContext(connections['default']) as queries:
+            loans = self.client.get(reverse('api_loan_list')).json()['results']
+            inventory = self.client.get(reverse('api_inventory_list')).json()['results']
+            books = self.client.get(reverse('api_book_list')).json()['results']
+        for query in queries.captured_queries:
+            # Сортировка инвентаря по названию филиала остается в SQL, столбцы не выбираются
+            columns = query['sql'].split(' FROM ')[0]
+            self.assertNotIn('"library_app_branch"', columns)
+            self.assertNotIn('"library_app_publisher"', columns)
+        self.assertEqual(loans[0]['branch'], {'id': self.branch.id, 'name': 'Центральный'})
+        self.assertEqual(inventory[0]['branch']['name'], 'Центральный')
+        self.assertEqual(books[0]['publisher'], 'Эксмо')
+        print("test_api_skips_reference_joins: Done")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RowSerializerTests(TestCase):
+    """Тесты сериализации строк values() для API"""
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='Центральный')
+        self.publisher = Publisher.objects.create(name='Эксмо')
+        self.book = Book.objects.create(
+            title='Сериализуемая книга', publication_year=2021, page_count=120,
+            price='199.90', publisher=self.publisher
+        )
+        self.book.authors.add(
+            Author.objects.create(last_name='Толстой', first_name='Лев', middle_name='Николаевич'),
+            Author.objects.create(last_name='Пушкин', first_name='Александр'),
+        )
+        Book.objects.create(title='Книга без издательства', publication_year=2020, page_count=50)
+        student = Student.objects.create(
+            student_id='SER001', last_name='Петров', first_name='Петр',
+            faculty=Faculty.objects.create(name='Исторический')
+        )
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=2, available_copies=2)
+        self.loan = Loan.objects.create(book=self.book, student=student, branch=self.branch)
+
+    def test_rows_match_model_values(self):
+        """Тест совпадения строк с данными моделей"""
+        books = {row['id']: row for row in BOOK_SUMMARY.serialize(Book.objects.all())}
+        row = books[self.book.id]
+        self.assertEqual(row['authors'], [str(author) for author in self.book.authors.all()])
+        self.assertEqual(row['price'], 199.9)
+        self.assertEqual(row['publisher'], 'Эксмо')
+        self.assertEqual(row['created_at'], self.book.created_at.isoformat())
+        self.assertEqual(len(books), 2)
+        self.assertTrue(all(row['authors'] == [] for pk, row in books.items() if pk != self.book.id))
+
+        [loan] = LOAN.serialize(Loan.objects.all())
+        self.assertEqual(loan['student']['name'], self.loan.student.get_full_name())
+        self.assertEqual(loan['branch'], {'id': self.branch.id, 'name': 'Центральный'})
+        self.assertIsNone(loan['return_date'])
+        print("test_rows_match_model_values: Done")
+
+    def test_field_subset_reads_only_its_columns(self):
+        """Тест выборки только нужных столбцов"""
+        compiled = BOOK_SUMMARY.compile(['id', 'title'])
+        self.assertEqual(compiled.columns, ('id', 'title'))
+        with self.assertNumQueries(1):
+            rows = compiled.rows(Book.objects.all())
+        self.assertEqual(rows[0], {'id': rows[0]['id'], 'title': rows[0]['title']})
+        self.assertIs(BOOK_SUMMARY.compile(['id', 'title']), compiled)
+        print("test_field_subset_reads_only_its_columns: Done")
+
+    def test_book_list_query_count(self):
+        """Тест числа запросов списка книг: count, страница, авторы"""
+        CatalogSnapshot.refresh()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_book_list'))
+        self.assertEqual(response.json()['count'], 2)
+        print("test_book_list_query_count: Done")
+
+    def test_encoders_agree(self):
+        """Тест одинаковых данных при json и orjson"""
+        data = {'results': BOOK_SUMMARY.serialize(Book.objects.all())}
+        with override_settings(API_JSON_ENCODER='json'):
+            stdlib = dumps(data)
+        with override_settings(API_JSON_ENCODER='orjson'):
+            fast = dumps(data)
+        self.assertEqual(json.loads(stdlib), json.loads(fast))
+        print("test_encoders_agree: Done")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SparseFieldsetTests(TestCase):
+    """Тесты параметра ?fields= в API"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='kiosk', password='kioskpass123')
+        self.branch = Branch.objects.create(name='Центральный')
+        publisher = Publisher.objects.create(name='Эксмо')
+        self.book = Book.objects.create(
+            title='Выборочная книга', publication_year=2022, page_count=80, publisher=publisher
+        )
+        self.book.authors.add(Author.objects.create(last_name='Гоголь', first_name='Николай'))
+        BookInventory.objects.create(book=self.book, branch=self.branch, total_copies=4, available_copies=3)
+        student = Student.objects.create(
+            student_id='FLD001', last_name='Сидоров', first_name='Семен',
+            faculty=Faculty.objects.create(name='Химический')
+        )
+        Loan.objects.create(book=self.book, student=student, branch=self.branch)
+        CatalogSnapshot.refresh()
+
+    def _get(self, name, args=(), fields=None, queries=None):
+        url = reverse(name, args=args)
+        params = {'fields': fields} if fields is not None else {}
+        with CaptureQueriesContext(connections['default']) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        sql = [q['sql'] for q in captured.captured_queries]
+        if queries is not None:
+            self.assertEqual(len(sql), queries, sql)
+        return response.json(), sql
+
+    def test_book_list_field_sets(self):
+        """Тест числа запросов списка книг для разных наборов полей"""
+        data, sql = self._get('api_book_list', fields='id,title', queries=2)
+        self.assertEqual(data['results'], [{'id': self.book.id, 'title': 'Выборочная книга'}])
+        self.assertFalse(any('JOIN' in query for query in sql))
+
+        data, _ = self._get('api_book_list', fields='id,title,available_copies', queries=3)
+        self.assertEqual(data['results'][0]['available_copies'], 2)
+
+        data, _ = self._get('api_book_list', fields='id,authors', queries=3)
+        self.assertEqual(data['results'][0]['authors'], ['Гоголь Николай'])
+
+        data, _ = self._get('api_book_list', queries=3)
+        self.assertNotIn('available_copies', data['results'][0])
+        print("test_book_list_field_sets: Done")
+
+    def test_detail_and_lists_field_sets(self):
+        """Тест наборов полей для карточки книги, инвентаря и выдач"""
+        data, _ = self._get('api_book_detail', args=[self.book.pk], fields='id,title', queries=1)
+        self.assertEqual(data, {'id': self.book.id, 'title': 'Выборочная книга'})
+        data, _ = self._get('api_book_detail', args=[self.book.pk], queries=2)
+        self.assertEqual(data['authors'][0]['last_name'], 'Гоголь')
+
+        # Списки выдач и инвентаря: COUNT и страница
+        data, sql = self._get('api_loan_list', fields='id,is_returned', queries=2)
+        self.assertEqual(data['results'][0], {'id': data['results'][0]['id'], 'is_returned': False})
+        self.assertFalse(any('JOIN' in query for query in sql))
+        data, sql = self._get('api_loan_list', queries=2)
+        self.assertIn('"library_app_student"', sql[-1])
+
+        data, sql = self._get('api_inventory_list', fields='id,available_copies', queries=2)
+        self.assertFalse(any('JOIN' in query for query in sql))
+        print("test_detail_and_lists_field_sets: Done")
+
+    def test_login_views_and_availability(self):
+        """Тест наборов полей для инвентаря книги, книг филиала и доступности"""
+        self.client.force_login(self.user)
+        data, _ = self._get('api_book_inventory', args=[self.book.pk], fields='available_copies')
+        self.assertEqual(data['inventory'], [{'available_copies': 2}])
+        data, sql = self._get('api_branch_books', args=[self.branch.pk], fields='id,available_copies')
+        self.assertEqual(data['results'], [{'id': self.book.id, 'available_copies': 2}])
+        self.assertFalse(any('"library_app_author"' in query for query in sql))
+
+        response = self.client.get(reverse('api_availability'), {'books': self.book.pk, 'fields': 'branch_id'})
+        self.assertEqual(response.json()['results'][0]['branches'], [{'branch_id': self.branch.id}])
+        print("test_login_views_and_availability: Done")
+
+    def test_unknown_field(self):
+        """Тест ошибки для неизвестного поля"""
+        response = self.client.get(reverse('api_book_list'), {'fields': 'id,isbn'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Unknown fields: isbn')
+        print("test_unknown_field: Done")
+
+    async def test_async_views_accept_fields(self):
+        """Тест параметра fields в асинхронных API"""
+        response = await self.async_client.get(reverse('api_loan_list_async'), {'fields': 'id,branch'})
+        self.assertEqual(response.json()['results'][0]['branch'], {'id': self.branch.id, 'name': 'Центральный'})
+        response = await self.async_client.get(
+            reverse('api_book_detail_async', args=[self.book.pk]), {'fields': 'title'}
+        )
+        self.assertEqual(response.json(), {'title': 'Выборочная книга'})
+        print("test_async_views_accept_fields: Done")
+
+
+class BookBatchTests(TestCase):
+    """Тесты пакетного API книг"""
+
+    def setUp(self):
+        self.branches = [Branch.objects.create(name=name) for name in ('Южный', 'Северный')]
+        author = Author.objects.create(last_name='Чехов', first_name='Антон')
+        self.books = []
+        for number in range(30):
+            book = Book.objects.create(title=f'Книга {number:02}', publication_year=2000, page_count=100)
+            book.authors.add(author)
+            for branch in self.branches:
+                BookInventory.objects.create(book=book, branch=branch, total_copies=3, available_copies=number % 4)
+            self.books.append(book)
+        CatalogSnapshot.refresh()
+
+    def _batch(self, ids, name='api_book_batch', **params):
+        return self.client.get(reverse(name), {'ids': ','.join(map(str, ids)), **params})
+
+    def test_constant_query_count(self):
+        """Тест: число запросов не зависит от количества книг"""
+        for books in (self.books[:2], self.books):
+            with self.subTest(count=len(books)), self.assertNumQueries(3):
+                response = self._batch([book.pk for book in books])
+            self.assertEqual(len(response.json()['results']), len(books))
+        print("test_constant_query_count: Done")
+
+    def test_matches_single_book_endpoints(self):
+        """Тест совпадения с карточкой книги и ее инвентарем"""
+        book = self.books[5]
+        [row] = self._batch([book.pk]).json()['results']
+        detail = self.client.get(reverse('api_book_detail', args=[book.pk])).json()
+        self.assertEqual({key: value for key, value in row.items() if key != 'inventory'}, detail)
+        self.assertEqual(
+            [(item['branch'], item['available_copies']) for item in row['inventory']],
+            [('Северный', 1), ('Южный', 1)]
+        )
+        print("test_matches_single_book_endpoints: Done")
+
+    def test_order_missing_and_fields(self):
+        """Тест порядка, отсутствующих книг и набора полей"""
+        ids = [self.books[3].pk, 0, self.books[1].pk, self.books[3].pk]
+        data = self._batch(ids, fields='title').json()
+        self.assertEqual(
+            data['results'],
+            [{'id': self.books[3].pk, 'title': 'Книга 03'}, {'id': self.books[1].pk, 'title': 'Книга 01'}]
+        )
+        self.assertEqual(data['missing'], [0])
+        print("test_order_missing_and_fields: Done")
+
+    def test_invalid_input(self):
+        """Тест ошибок ввода"""
+        for params in ({'ids': ''}, {'ids': '1,x'}, {'ids': ','.join(map(str, range(1, 52)))}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('api_book_batch'), params)
+                self.assertEqual(response.status_code, 400)
+        print("test_invalid_input: Done")
+
+    async def test_async_matches_sync(self):
+        """Тест совпадения асинхронного пакетного API"""
+        ids = [book.pk for book in self.books[:10]]
+        expected = await sync_to_async(self._batch)(ids)
+        response = await self.async_client.get(
+            reverse('api_book_batch_async'), {'ids': ','.join(map(str, ids))}
+        )
+        self.assertEqual(response.json(), expected.json())
+        print("test_async_matches_sync: Done")
+
+
+class ApiPaginationTests(TestCase):
+    """Тесты ограниченной и курсорной пагинации API"""
+
+    def setUp(self):
+        # Повторяющиеся названия: порядок внутри них задает id
+        Book.objects.bulk_create([
+            Book(title=f'Том {number % 50:02}', publication_year=2000 + number % 20, page_count=100)
+            for number in range(250)
+        ])
+        branch = Branch.objects.create(name='Центральный')
+        student = Student.objects.create(
+            student_id='PAG001', last_name='Орлов', first_name='Олег',
+            faculty=Faculty.objects.create(name='Экономический')
+        )
+        books = list(Book.objects.all()[:40])
+        BookInventory.objects.bulk_create([
+            BookInventory(book=book, branch=branch, total_copies=5, available_copies=5) for book in books
+        ])
+        Loan.objects.bulk_create([Loan(book=book, student=student, branch=branch) for book in books])
+        # Одинаковая дата выдачи у всех: курсор должен различать по id
+        Loan.objects.update(issue_date=timezone.now())
+
+    def _walk(self, name, per_page):
+        ids, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(reverse(name), {'cursor': cursor, 'per_page': per_page}).json()
+            self.assertIsNone(data['count'])
+            ids.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+        return ids
+
+    def test_per_page_is_bounded(self):
+        """Тест ограничения размера страницы"""
+        data = self.client.get(reverse('api_book_list'), {'per_page': 10000000}).json()
+        self.assertEqual(data['per_page'], ApiPagination.MAX_PAGE_SIZE)
+        self.assertEqual(len(data['results']), ApiPagination.MAX_PAGE_SIZE)
+        self.assertEqual(data['count'], 250)
+        self.assertIsNotNone(data['next_cursor'])
+        print("test_per_page_is_bounded: Done")
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_count_estimated_flag(self):
+        """Тест признака приблизительного числа записей"""
+        with mock.patch.object(EstimatedCountPaginator, 'EXACT_COUNT_LIMIT', 100):
+            data = self.client.get(reverse('api_book_list')).json()
+        self.assertEqual((data['count'], data['count_estimated']), (250, True))
+        data = self.client.get(reverse('api_book_list'), {'year': 2001}).json()
+        self.assertEqual((data['count'], data['count_estimated']), (13, False))
+        data = self.client.get(reverse('api_book_list'), {'cursor': ''}).json()
+        self.assertIsNone(data['count_estimated'])
+        print("test_count_estimated_flag: Done")
+
+    def test_branch_books_are_paginated(self):
+        """Тест постраничного списка книг филиала"""
+        user = User.objects.create_user(username='reader', password='readerpass123')
+        self.client.force_login(user)
+        branch = Branch.objects.get()
+        url = reverse('api_branch_books', args=[branch.id])
+        data = self.client.get(url, {'per_page': 15}).json()
+        self.assertEqual(data['branch'], {'id': branch.id, 'name': branch.name})
+        self.assertEqual((data['count'], len(data['results'])), (40, 15))
+
+        ids, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(url, {'per_page': 15, 'cursor': cursor}).json()
+            ids.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+        expected = BookInventory.objects.filter(branch=branch).order_by('book_id').values_list('book_id', flat=True)
+        self.assertEqual(ids, list(expected))
+        self.assertEqual(self.client.get(url, {'per_page': 'x'}).status_code, 400)
+        print("test_branch_books_are_paginated: Done")
+
+    def test_bad_parameters_are_400(self):
+        """Тест ошибок 400 вместо 500 для некорректных параметров"""
+        cases = [
+            ('api_book_list', {'page': 'abc'}),
+            ('api_book_list', {'per_page': '-5'}),
+            ('api_book_list', {'page': '0'}),
+            ('api_book_list', {'per_page': '9' * 5000}),
+            ('api_book_list', {'page': 10 ** 9}),
+            ('api_book_list', {'year': 'abc'}),
+            ('api_book_list', {'cursor': 'not-a-cursor'}),
+            ('api_loan_list', {'student_id': 'x'}),
+            ('api_inventory_list', {'branch_id': '1.5'}),
+            ('api_book_list_async', {'per_page': 'abc'}),
+        ]
+        for name, params in cases:
+            with self.subTest(name=name, params=params):
+                response = self.client.get(reverse(name), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        print("test_bad_parameters_are_400: Done")
+
+    @override_settings(BRANCH_SHARDS={999: 'branch_a'}, SHARD_DATABASES=['branch_a'])
+    def test_sharded_lists_need_branch(self):
+        """Тест: при шардировании списки выдач и остатков требуют филиал"""
+        branch = Branch.objects.get()
+        for name in ('api_loan_list', 'api_inventory_list', 'api_loan_list_async'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 400)
+                data = self.client.get(reverse(name), {'branch_id': branch.id}).json()
+                self.assertEqual(len(data['results']), ApiPagination.DEFAULT_PAGE_SIZE)
+        print("test_sharded_lists_need_branch: Done")
+
+    def test_cursor_walks_every_row_once(self):
+        """Тест обхода списков курсором без пропусков и повторов"""
+        expected = list(Book.objects.order_by('title', 'id').values_list('id', flat=True))
+        self.assertEqual(self._walk('api_book_list', 30), expected)
+        expected = list(Loan.objects.order_by('-issue_date', '-id').values_list('id', flat=True))
+        self.assertEqual(self._walk('api_loan_list', 7), expected)
+        expected = list(BookInventory.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self._walk('api_inventory_list', 15), expected)
+        print("test_cursor_walks_every_row_once: Done")
+
+    def test_offset_page_hands_over_to_cursor(self):
+        """Тест перехода со страниц на курсор"""
+        first = self.client.get(reverse('api_book_list'), {'per_page': 25}).json()
+        second = self.client.get(reverse('api_book_list'), {'per_page': 25, 'page': 2}).json()
+        by_cursor = self.client.get(
+            reverse('api_book_list'), {'per_page': 25, 'cursor': first['next_cursor']}
+        ).json()
+        self.assertEqual(by_cursor['results'], second['results'])
+        print("test_offset_page_hands_over_to_cursor: Done")
+
+    def test_shared_envelope(self):
+        """Тест единого формата ответа списков"""
+        for name in ('api_book_list', 'api_inventory_list', 'api_loan_list', 'api_loan_list_async'):
+            with self.subTest(name=name):
+                data = self.client.get(reverse(name)).json()
+                self.assertEqual(
+                    list(data), ['count', 'count_estimated', 'page', 'per_page', 'next_cursor', 'results']
+                )
+                self.assertEqual(data['page'], 1)
+                self.assertIs(data['count_estimated'], False)
+        print("test_shared_envelope: Done")
+
+    def test_memory_flat_for_abusive_page_size(self):
+        """Тест: память не растет при огромном per_page"""
+        def peak(params):
+            self.client.get(reverse('api_book_list'), params)  # прогрев
+            tracemalloc.start()
+            try:
+                response = self.client.get(reverse('api_book_list'), params)
+                return tracemalloc.get_traced_memory()[1], len(response.json()['results'])
+            finally:
+                tracemalloc.stop()
+
+        normal, normal_rows = peak({'per_page': ApiPagination.MAX_PAGE_SIZE})
+        abusive, abusive_rows = peak({'per_page': 10000000})
+        self.assertEqual(abusive_rows, normal_rows)
+        self.assertLess(abusive, normal * 1.5)
+        print("test_memory_flat_for_abusive_page_size: Done")
@@ -11,6 +11,7 @@ from .views import (
     FacultyListView, FacultyDetailView, FacultyCreateView, FacultyUpdateView, FacultyDeleteView,
     StudentListView, StudentDetailView, StudentCreateView, StudentUpdateView, StudentDeleteView,
     LoanListView, LoanDetailView, LoanCreateView, LoanReturnView, LoanDeleteView,
+    ReservationListView, ReservationCreateView, TransferListView,
     InventoryListView, InventoryCreateView, InventoryUpdateView, ReportsDashboardView
 )
 
@@ -81,19 +82,44 @@ urlpatterns = [
     path('loans/<int:pk>/return/', LoanReturnView.as_view(), name='loan_return'),
     path('loans/<int:pk>/delete/', LoanDeleteView.as_view(), name='loan_delete'),
     
+    # Reservations
+    path('reservations/', ReservationListView.as_view(), name='reservation_list'),
+    path('reservations/add/', ReservationCreateView.as_view(), name='reservation_add'),
+    path('reservations/<int:pk>/collect/', views.reservation_collect, name='reservation_collect'),
+    path('reservations/<int:pk>/cancel/', views.reservation_cancel, name='reservation_cancel'),
+    
     # Inventory
     path('inventory/query/', views.inventory_query, name='inventory_query'),
+    path('inventory/availability/', views.availability_lookup, name='availability_lookup'),
     path('inventory/manage/', InventoryListView.as_view(), name='inventory_list'),
     path('inventory/add/', InventoryCreateView.as_view(), name='inventory_add'),
     path('inventory/<int:pk>/edit/', InventoryUpdateView.as_view(), name='inventory_edit'),
+    path('inventory/transfers/', TransferListView.as_view(), name='transfer_list'),
+    path('inventory/transfers/add/', views.transfer_create, name='transfer_add'),
+    path('inventory/transfers/<int:pk>/receive/', views.transfer_receive, name='transfer_receive'),
+    path('inventory/transfers/<int:pk>/cancel/', views.transfer_cancel, name='transfer_cancel'),
     
     # Reports
     path('reports/', ReportsDashboardView.as_view(), name='reports_dashboard'),
     # API
     path('api/books/', views.api_book_list, name='api_book_list'),
+    path('api/books/batch/', views.api_book_batch, name='api_book_batch'),
     path('api/books/<int:pk>/', views.api_book_detail, name='api_book_detail'),
     path('api/inventory/', views.api_inventory_list, name='api_inventory_list'),
     path('api/loans/', views.api_loan_list, name='api_loan_list'),
+    path('api/availability/', views.api_availability, name='api_availability'),
+    path('api/books/<int:book_id>/inventory/', views.api_book_inventory, name='api_book_inventory'),
+    path('api/branches/<int:branch_id>/books/', views.api_branch_books, name='api_branch_books'),
+    
+    # Async API (same payloads, native async views for ASGI deployments)
+    path('api/async/books/', views.api_book_list_async, name='api_book_list_async'),
+    path('api/async/books/batch/', views.api_book_batch_async, name='api_book_batch_async'),
+    path('api/async/books/<int:pk>/', views.api_book_detail_async, name='api_book_detail_async'),
+    path('api/async/inventory/', views.api_inventory_list_async, name='api_inventory_list_async'),
+    path('api/async/loans/', views.api_loan_list_async, name='api_loan_list_async'),
+    path('api/async/books/<int:book_id>/inventory/', views.api_book_inventory_async, name='api_book_inventory_async'),
+    path('api/async/branches/<int:branch_id>/books/', views.api_branch_books_async, name='api_branch_books_async'),
+    path('api/async/branches/<int:branch_id>/availability/stream/', views.availability_stream, name='availability_stream'),
     
     # Error pages
     path('403/', TemplateView.as_view(template_name='library_app/errors/403.html'), name='error_403'),
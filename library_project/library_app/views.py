@@ -3,27 +3,53 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib import messages
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, Count, Sum, Avg
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseNotFound, HttpResponseServerError
+from django.http import (
+    JsonResponse, HttpResponseForbidden, HttpResponseNotFound, HttpResponseServerError,
+    HttpResponseNotAllowed, Http404, HttpResponse, StreamingHttpResponse
+)
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+import asyncio
 import json
+import time
 from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 
 from .models import (
     Author, Publisher, Book, Branch, BookInventory, 
-    Faculty, BookFacultyUsage, Student, Loan
+    Faculty, BookFacultyUsage, Student, Loan, Reservation, Transfer
 )
 from .forms import (
     BookForm, AuthorForm, PublisherForm, BranchForm, 
     FacultyForm, StudentForm, LoanForm, InventoryForm,
-    BookFacultyUsageForm
+    BookFacultyUsageForm, ReservationForm, TransferForm
+)
+from .exceptions import LibraryBusinessError
+from .pubsub import broker, availability_snapshot
+from .pagination import ApiPagination, EstimatedCountPaginator
+from .serializers import (
+    AVAILABILITY, BOOK_BATCH, BOOK_DETAIL, BOOK_INVENTORY, BOOK_SUMMARY, BRANCH_BOOKS,
+    INVENTORY, LOAN, FastJsonResponse, book_inventory_rows
+)
+from .routers import replica_reads
+from .sharding import (
+    across_branches, count_across_branches, for_branch, shard_for_loan, sharding_enabled
+)
+from .services import (
+    RecommendationService, ReservationService, AvailabilityService, TransferService,
+    LoanArchiveService, QueryFanOut, LibraryStatsService, ReferenceDataService, LoanService
 )
 
 # Custom exception handlers
@@ -37,6 +63,19 @@ def handler500(request):
     return render(request, 'library_app/errors/500.html', status=500)
 
 # Utility functions
+class EstimatedPaginationMixin:
+    """List pagination without an exact COUNT(*) on large result sets"""
+    paginator_class = EstimatedCountPaginator
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Page.__len__ would fetch the rows, which a cached template may not need
+        if context.get('page_obj') is not None:
+            context['page_range'] = list(
+                context['paginator'].get_elided_page_range(context['page_obj'].number)
+            )
+        return context
+
 def is_librarian(user):
     return user.is_authenticated and (user.is_staff or user.groups.filter(name='Librarians').exists())
 
@@ -65,29 +104,26 @@ def register(request):
         'title': 'Регистрация'
     })
 
+def home_stat_queries():
+    """Независимые запросы главной страницы"""
+    return {
+        'recent_books': lambda: list(Book.objects.order_by('-created_at')[:5]),
+        'recent_loans': lambda: list(
+            Loan.objects.select_related('student', 'book').order_by('-issue_date')[:5]
+        ),
+    }
+
 def home(request):
     """Главная страница с общей статистикой"""
-    total_books = Book.objects.count()
-    total_students = Student.objects.count()
-    active_loans = Loan.objects.filter(is_returned=False).count()
-    total_branches = Branch.objects.count()
-    
-    recent_books = Book.objects.order_by('-created_at')[:5]
-    recent_loans = Loan.objects.select_related('student', 'book').order_by('-issue_date')[:5]
-    
-    context = {
-        'title': 'Главная - Библиотечная система',
-        'total_books': total_books,
-        'total_students': total_students,
-        'active_loans': active_loans,
-        'total_branches': total_branches,
-        'recent_books': recent_books,
-        'recent_loans': recent_loans,
-    }
+    context = {'title': 'Главная - Библиотечная система'}
+    context.update(LibraryStatsService.headline())
+    # Два индексных запроса: передача в пул потоков стоит дороже, чем
+    # их последовательное выполнение (см. benchmark_fanout)
+    context.update({name: query() for name, query in home_stat_queries().items()})
     return render(request, 'library_app/home.html', context)
 
 # Book Views
-class BookListView(LoginRequiredMixin, ListView):
+class BookListView(LoginRequiredMixin, EstimatedPaginationMixin, ListView):
     model = Book
     template_name = 'library_app/books/book_list.html'
     context_object_name = 'books'
@@ -118,7 +154,7 @@ class BookListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Список книг'
-        context['publishers'] = Publisher.objects.all()
+        context['publishers'] = ReferenceDataService.publishers()
         context['search_query'] = self.request.GET.get('search', '')
         context['year_filter'] = self.request.GET.get('year', '')
         context['publisher_filter'] = self.request.GET.get('publisher', '')
@@ -132,9 +168,12 @@ class BookDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f'Книга: {self.object.title}'
-        context['inventory'] = BookInventory.objects.filter(book=self.object).select_related('branch')
+        context['inventory'] = across_branches(
+            BookInventory.objects.filter(book=self.object).select_related('branch'), ordering='branch_id'
+        )
         context['faculty_usage'] = BookFacultyUsage.objects.filter(book=self.object).select_related('faculty', 'branch')
-        context['loan_history'] = Loan.objects.filter(book=self.object).select_related('student', 'branch')[:10]
+        context['loan_history'], context['loan_history_count'] = LoanArchiveService.history(book_id=self.object.pk)
+        context['recommendations'] = RecommendationService.get_recommendations(self.object.pk, limit=5)
         return context
 
 class BookCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
@@ -193,6 +232,7 @@ class BookDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 @login_required
+@replica_reads
 def book_usage(request, pk):
     """Статистика использования книги по факультетам"""
     book = get_object_or_404(Book, pk=pk)
@@ -443,8 +483,8 @@ class BranchDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f'Филиал: {self.object.name}'
-        context['inventory'] = BookInventory.objects.filter(branch=self.object).select_related('book')
-        context['active_loans'] = Loan.objects.filter(branch=self.object, is_returned=False).count()
+        context['inventory'] = for_branch(BookInventory.objects, self.object.id).select_related('book')
+        context['active_loans'] = for_branch(Loan.objects, self.object.id).filter(is_returned=False).count()
         return context
 
 class BranchCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
@@ -583,7 +623,7 @@ class FacultyDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 # Student Views
-class StudentListView(LoginRequiredMixin, ListView):
+class StudentListView(LoginRequiredMixin, EstimatedPaginationMixin, ListView):
     model = Student
     template_name = 'library_app/students/student_list.html'
     context_object_name = 'students'
@@ -610,7 +650,7 @@ class StudentListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Список студентов'
-        context['faculties'] = Faculty.objects.all()
+        context['faculties'] = ReferenceDataService.faculties()
         context['search_query'] = self.request.GET.get('search', '')
         context['faculty_filter'] = self.request.GET.get('faculty', '')
         return context
@@ -624,7 +664,7 @@ class StudentDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context['title'] = f'Студент: {self.object.get_full_name()}'
         context['active_loans'] = Loan.objects.filter(student=self.object, is_returned=False).select_related('book', 'branch')
-        context['loan_history'] = Loan.objects.filter(student=self.object).select_related('book', 'branch')[:10]
+        context['loan_history'], context['loan_history_count'] = LoanArchiveService.history(student_id=self.object.pk)
         return context
 
 class StudentCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
@@ -684,7 +724,16 @@ class StudentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 # Loan Views
-class LoanListView(LoginRequiredMixin, ListView):
+# Without a branch filter a sharded loan list is merged from every shard,
+# so only the newest rows are paginated
+SHARDED_LOAN_LIST_LIMIT = 1000
+
+class ShardedLoanMixin:
+    """Looks a loan up in the shard its id range points to"""
+    def get_queryset(self):
+        return super().get_queryset().using(shard_for_loan(self.kwargs['pk']))
+
+class LoanListView(LoginRequiredMixin, EstimatedPaginationMixin, ListView):
     model = Loan
     template_name = 'library_app/loans/loan_list.html'
     context_object_name = 'loans'
@@ -701,21 +750,23 @@ class LoanListView(LoginRequiredMixin, ListView):
         elif status_filter == 'returned':
             queryset = queryset.filter(is_returned=True)
         
+        queryset = queryset.select_related('student', 'book', 'branch', 'created_by')
         if branch_filter:
-            queryset = queryset.filter(branch__id=branch_filter)
-        
-        return queryset.select_related('student', 'book', 'branch', 'created_by')
+            return for_branch(queryset, branch_filter)
+        if sharding_enabled():
+            return across_branches(queryset, ordering='-issue_date', limit=SHARDED_LOAN_LIST_LIMIT)
+        return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Список выдач'
-        context['branches'] = Branch.objects.all()
+        context['branches'] = ReferenceDataService.branches()
         context['status_filter'] = self.request.GET.get('status', '')
         context['branch_filter'] = self.request.GET.get('branch', '')
-        context['active_loans_count'] = Loan.objects.filter(is_returned=False).count()
+        context['active_loans_count'] = count_across_branches(Loan.objects.filter(is_returned=False))
         return context
 
-class LoanDetailView(LoginRequiredMixin, DetailView):
+class LoanDetailView(LoginRequiredMixin, ShardedLoanMixin, DetailView):
     model = Loan
     template_name = 'library_app/loans/loan_detail.html'
     context_object_name = 'loan'
@@ -760,7 +811,7 @@ class LoanCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         messages.error(self.request, 'Ошибка при выдаче книги. Проверьте введенные данные.')
         return super().form_invalid(form)
 
-class LoanReturnView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class LoanReturnView(LoginRequiredMixin, UserPassesTestMixin, ShardedLoanMixin, UpdateView):
     model = Loan
     fields = []  # No fields needed for return
     template_name = 'library_app/loans/loan_return.html'
@@ -777,22 +828,21 @@ class LoanReturnView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
     
     def form_valid(self, form):
-        self.object.is_returned = True
-        self.object.return_date = timezone.now()
-        self.object.save()
-        
-        # Update inventory
-        inventory = BookInventory.objects.get(
-            book=self.object.book, 
-            branch=self.object.branch
-        )
-        inventory.available_copies += 1
-        inventory.save()
+        with transaction.atomic():
+            # Loan.save проставляет дату возврата, возвращает экземпляр
+            # в инвентарь и пишет событие в журнал
+            self.object.is_returned = True
+            self.object.save()
+            
+            # Освободившийся экземпляр достается первому в очереди бронирования
+            reservation = ReservationService.allocate_copy(self.object.book_id, self.object.branch_id)
         
         messages.success(self.request, 'Книга успешно возвращена!')
+        if reservation:
+            messages.info(self.request, f'Экземпляр отложен по бронированию: {reservation.student}')
         return redirect(self.get_success_url())
 
-class LoanDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class LoanDeleteView(LoginRequiredMixin, UserPassesTestMixin, ShardedLoanMixin, DeleteView):
     model = Loan
     template_name = 'library_app/loans/loan_confirm_delete.html'
     success_url = reverse_lazy('loan_list')
@@ -805,22 +855,106 @@ class LoanDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         context['title'] = f'Удалить выдачу: {self.object}'
         return context
     
-    def delete(self, request, *args, **kwargs):
-        loan = self.get_object()
-        if not loan.is_returned:
-            # Return book to inventory if not returned
-            inventory = BookInventory.objects.get(
-                book=loan.book, 
-                branch=loan.branch
+    def form_valid(self, form):
+        # Экземпляр возвращается в инвентарь в Loan.delete и, как при
+        # возврате, достается первому в очереди бронирования
+        reservation = LoanService.delete_loan(self.object)
+        messages.success(self.request, 'Запись о выдаче успешно удалена!')
+        if reservation:
+            messages.info(self.request, f'Экземпляр отложен по бронированию: {reservation.student}')
+        return redirect(self.get_success_url())
+
+# Reservation Views
+class ReservationListView(LoginRequiredMixin, ListView):
+    model = Reservation
+    template_name = 'library_app/reservations/reservation_list.html'
+    context_object_name = 'reservations'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        status_filter = self.request.GET.get('status', 'open')
+        branch_filter = self.request.GET.get('branch', '')
+        
+        if status_filter == 'open':
+            queryset = queryset.filter(status__in=Reservation.OPEN_STATUSES)
+        elif status_filter:
+            queryset = queryset.filter(status=status_filter)
+        
+        if branch_filter:
+            queryset = queryset.filter(branch__id=branch_filter)
+        
+        return queryset.select_related('student', 'book', 'branch')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Бронирования'
+        context['branches'] = ReferenceDataService.branches()
+        context['status_choices'] = Reservation.STATUS_CHOICES
+        context['status_filter'] = self.request.GET.get('status', 'open')
+        context['branch_filter'] = self.request.GET.get('branch', '')
+        return context
+
+class ReservationCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+    model = Reservation
+    form_class = ReservationForm
+    template_name = 'library_app/reservations/reservation_form.html'
+    success_url = reverse_lazy('reservation_list')
+    
+    def test_func(self):
+        return is_librarian(self.request.user)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Забронировать книгу'
+        return context
+    
+    def form_valid(self, form):
+        try:
+            self.object = ReservationService.place_hold(
+                form.cleaned_data['student'].pk,
+                form.cleaned_data['book'].pk,
+                form.cleaned_data['branch'].pk
             )
-            inventory.available_copies += 1
-            inventory.save()
+        except LibraryBusinessError as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
         
-        messages.success(request, 'Запись о выдаче успешно удалена!')
-        return super().delete(request, *args, **kwargs)
+        if self.object.status == Reservation.STATUS_READY:
+            messages.success(self.request, 'Экземпляр доступен и отложен для студента!')
+        else:
+            position = ReservationService.get_queue_position(self.object)
+            messages.success(self.request, f'Студент поставлен в очередь, позиция: {position}')
+        return redirect(self.get_success_url())
+
+@librarian_required
+@require_POST
+def reservation_collect(request, pk):
+    """Выдача отложенного по бронированию экземпляра"""
+    reservation = get_object_or_404(Reservation, pk=pk)
+    try:
+        loan = ReservationService.collect(reservation.pk, user=request.user)
+    except LibraryBusinessError as e:
+        messages.error(request, str(e))
+        return redirect('reservation_list')
+    
+    messages.success(request, 'Книга выдана по бронированию!')
+    return redirect('loan_detail', pk=loan.pk)
+
+@librarian_required
+@require_POST
+def reservation_cancel(request, pk):
+    """Отмена бронирования"""
+    reservation = get_object_or_404(Reservation, pk=pk)
+    try:
+        ReservationService.cancel(reservation.pk)
+        messages.success(request, 'Бронирование отменено!')
+    except LibraryBusinessError as e:
+        messages.error(request, str(e))
+    return redirect('reservation_list')
 
 # Inventory Views
-class InventoryListView(LoginRequiredMixin, ListView):
+class InventoryListView(LoginRequiredMixin, EstimatedPaginationMixin, ListView):
     model = BookInventory
     template_name = 'library_app/inventory/inventory_list.html'
     context_object_name = 'inventory'
@@ -842,7 +976,7 @@ class InventoryListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Управление инвентарем'
-        context['branches'] = Branch.objects.all()
+        context['branches'] = ReferenceDataService.branches()
         context['branch_filter'] = self.request.GET.get('branch', '')
         context['book_filter'] = self.request.GET.get('book', '')
         return context
@@ -882,13 +1016,103 @@ class InventoryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
     
     def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # Доступные экземпляры достаются ожидающим бронирования
+            reserved = ReservationService.allocate_freed({
+                (self.object.book_id, self.object.branch_id): self.object.available_copies
+            })
         messages.success(self.request, 'Запись в инвентарь успешно обновлена!')
-        return super().form_valid(form)
+        if reserved:
+            messages.info(self.request, f'Отложено по бронированиям: {len(reserved)}')
+        return response
+
+# Transfer Views
+class TransferListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    model = Transfer
+    template_name = 'library_app/inventory/transfer_list.html'
+    context_object_name = 'transfers'
+    paginate_by = 20
+    
+    def test_func(self):
+        return is_librarian(self.request.user)
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        status_filter = self.request.GET.get('status', '')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        # GROUP BY отключает Meta.ordering: порядок задается явно
+        return queryset.select_related('from_branch', 'to_branch').annotate(
+            item_count=Count('items'),
+            copy_count=Sum('items__quantity')
+        ).order_by('-created_at', '-pk')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Перемещения между филиалами'
+        context['status_choices'] = Transfer.STATUS_CHOICES
+        context['status_filter'] = self.request.GET.get('status', '')
+        return context
+
+@librarian_required
+def transfer_create(request):
+    """Создание перемещения экземпляров между филиалами"""
+    if request.method == 'POST':
+        form = TransferForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                if data['move_all']:
+                    transfer = TransferService.transfer_all_stock(
+                        data['from_branch'].pk, data['to_branch'].pk, user=request.user
+                    )
+                else:
+                    transfer = TransferService.create_transfer(
+                        data['from_branch'].pk, data['to_branch'].pk,
+                        {data['book'].pk: data['quantity']}, user=request.user
+                    )
+            except LibraryBusinessError as e:
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, f'Перемещение №{transfer.pk} отправлено!')
+                return redirect('transfer_list')
+    else:
+        form = TransferForm()
+    
+    return render(request, 'library_app/inventory/transfer_form.html', {
+        'form': form,
+        'title': 'Новое перемещение',
+    })
+
+@librarian_required
+@require_POST
+def transfer_receive(request, pk):
+    """Прием перемещения в филиале назначения"""
+    transfer = get_object_or_404(Transfer, pk=pk)
+    try:
+        TransferService.receive(transfer.pk)
+        messages.success(request, 'Перемещение принято!')
+    except LibraryBusinessError as e:
+        messages.error(request, str(e))
+    return redirect('transfer_list')
+
+@librarian_required
+@require_POST
+def transfer_cancel(request, pk):
+    """Отмена перемещения с возвратом экземпляров"""
+    transfer = get_object_or_404(Transfer, pk=pk)
+    try:
+        TransferService.cancel(transfer.pk)
+        messages.success(request, 'Перемещение отменено!')
+    except LibraryBusinessError as e:
+        messages.error(request, str(e))
+    return redirect('transfer_list')
 
 @login_required
 def inventory_query(request):
     """Специальный запрос для поиска книг в инвентаре"""
-    branches = Branch.objects.all()
+    branches = ReferenceDataService.branches()
     books = []
     selected_branch = None
     search_query = ''
@@ -899,7 +1123,7 @@ def inventory_query(request):
         
         if branch_id:
             selected_branch = get_object_or_404(Branch, id=branch_id)
-            books = BookInventory.objects.filter(branch=selected_branch)
+            books = for_branch(BookInventory.objects, selected_branch.id)
             
             if search_query:
                 books = books.filter(book__title__icontains=search_query)
@@ -915,7 +1139,73 @@ def inventory_query(request):
     }
     return render(request, 'library_app/inventory/inventory_query.html', context)
 
+@login_required
+def availability_lookup(request):
+    """Поиск ближайшего филиала с доступными экземплярами"""
+    branches = ReferenceDataService.branches()
+    origin_branch = None
+    search_query = request.GET.get('search', '')
+    results = []
+    branch_error = None
+    
+    origin_id = request.GET.get('branch', '')
+    if origin_id:
+        # Как в api_availability: мусор в ?branch= - ошибка формы, а не 500
+        try:
+            origin_branch = Branch.objects.filter(id=int(origin_id)).first()
+        except ValueError:
+            origin_branch = None
+        if origin_branch is None:
+            branch_error = 'Выберите филиал из списка'
+    
+    if search_query and not branch_error:
+        books = list(
+            Book.objects.filter(title__icontains=search_query)
+            .only('id', 'title', 'publication_year')[:AvailabilityService.MAX_BASKET]
+        )
+        availability = AvailabilityService.nearest_available(
+            [book.id for book in books],
+            origin_branch.id if origin_branch else None
+        )
+        results = [(book, availability[book.id]) for book in books]
+    
+    context = {
+        'title': 'Наличие по филиалам',
+        'branches': branches,
+        'origin_branch': origin_branch,
+        'branch_error': branch_error,
+        'search_query': search_query,
+        'results': results,
+    }
+    return render(request, 'library_app/inventory/availability_lookup.html', context)
+
 # Report Views
+def dashboard_stat_queries():
+    """Независимые запросы дашборда отчетов"""
+    return {
+        # Самая популярная книга (с учетом архива выдач)
+        'max_book_loans': LoanArchiveService.with_loan_counts(
+            Book.objects, 'book'
+        ).order_by('-loan_count').values('loan_count').first,
+        # Самый активный студент
+        'max_student_loans': LoanArchiveService.with_loan_counts(
+            Student.objects, 'student'
+        ).order_by('-loan_count').values('loan_count').first,
+        'faculty_stats': LoanArchiveService.with_loan_counts(
+            Faculty.objects, 'student__faculty'
+        ).order_by('-loan_count').values('loan_count').first,
+        # Последние активности
+        'recent_loans': lambda: list(
+            Loan.objects.select_related('student', 'book', 'branch').order_by('-issue_date')[:5]
+        ),
+        # Статистика по филиалам
+        'branch_stats': lambda: list(Branch.objects.annotate(
+            book_count=Count('inventory', distinct=True),
+            active_loans_count=Count('loans', filter=Q(loans__is_returned=False))
+        )[:3]),
+    }
+
+@method_decorator(replica_reads, name='dispatch')
 class ReportsDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'library_app/reports/dashboard.html'
     
@@ -923,65 +1213,26 @@ class ReportsDashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Отчеты и аналитика'
         
-        # Основная статистика для дашборда
-        context['total_books'] = Book.objects.count()
-        context['total_students'] = Student.objects.count()
-        context['active_loans'] = Loan.objects.filter(is_returned=False).count()
-        context['total_branches'] = Branch.objects.count()
-        context['total_loans'] = Loan.objects.count()
-        context['total_authors'] = Author.objects.count()
-        context['total_publishers'] = Publisher.objects.count()
-        context['total_faculties'] = Faculty.objects.count()
+        # Основная статистика для дашборда: один составной запрос с кэшем
+        context.update(LibraryStatsService.headline())
+        context['faculties_count'] = context['total_faculties']
         
-        # Статистика для карточек отчетов
-        # Популярные книги - количество уникальных книг с выдачами
-        context['popular_books_count'] = Loan.objects.values('book').distinct().count()
-        
-        # Активные студенты - количество уникальных студентов с выдачами
-        context['active_students_count'] = Loan.objects.values('student').distinct().count()
-        
-        # Факультеты
-        context['faculties_count'] = Faculty.objects.count()
-        
-        # Инвентарь
-        inventory_stats = BookInventory.objects.aggregate(
-            total_copies=Sum('total_copies'),
-            available_copies=Sum('available_copies')
-        )
-        context['total_inventory'] = inventory_stats['total_copies'] or 0
-        context['available_copies'] = inventory_stats['available_copies'] or 0
+        # Остальные независимые запросы выполняются параллельно
+        stats = QueryFanOut.run(**dashboard_stat_queries())
+        max_book_loans = stats.pop('max_book_loans')
+        max_student_loans = stats.pop('max_student_loans')
+        faculty_stats = stats.pop('faculty_stats')
+        context.update(stats)
         
         # Максимальные значения для отображения
-        # Самая популярная книга
-        max_book_loans = Loan.objects.values('book__title').annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        context['max_loans'] = max_book_loans['count'] if max_book_loans else 0
-        
-        # Самый активный студент
-        max_student_loans = Loan.objects.values('student').annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        context['max_student_loans'] = max_student_loans['count'] if max_student_loans else 0
+        context['max_loans'] = max_book_loans['loan_count'] if max_book_loans else 0
+        context['max_student_loans'] = max_student_loans['loan_count'] if max_student_loans else 0
         
         # Процент возвратов
-        returned_loans = Loan.objects.filter(is_returned=True).count()
-        context['return_rate'] = round((returned_loans / context['total_loans'] * 100), 1) if context['total_loans'] > 0 else 0
+        context['return_rate'] = round((context['returned_loans'] / context['total_loans'] * 100), 1) if context['total_loans'] > 0 else 0
         
         # Статистика по факультетам
-        faculty_stats = Loan.objects.values('student__faculty__name').annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        context['max_faculty_usage'] = faculty_stats['count'] if faculty_stats else 0
-        
-        # Последние активности
-        context['recent_loans'] = Loan.objects.select_related('student', 'book', 'branch').order_by('-issue_date')[:5]
-        
-        # Статистика по филиалам
-        context['branch_stats'] = Branch.objects.annotate(
-            book_count=Count('inventory', distinct=True),
-            active_loans_count=Count('loans', filter=Q(loans__is_returned=False))
-        )[:3]
+        context['max_faculty_usage'] = faculty_stats['loan_count'] if faculty_stats else 0
         
         # Статистика по жанрам/категориям (если есть поле category в Book)
         try:
@@ -996,209 +1247,398 @@ class ReportsDashboardView(LoginRequiredMixin, TemplateView):
         return context
 
 # API Views
-@require_http_methods(["GET"])
-def api_book_list(request):
-    """API endpoint for book list"""
-    books = Book.objects.select_related('publisher').prefetch_related('authors')
+def api_fields(fieldset):
+    """
+    Parse ?fields=a,b against fieldset and pass the names to the view as
+    `fields` (the defaults when absent); unknown names are a 400.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                try:
+                    fields = fieldset.select(request.GET.get('fields'))
+                except ValueError as e:
+                    return JsonResponse({'error': str(e)}, status=400)
+                return await view_func(request, *args, fields=fields, **kwargs)
+        else:
+            @wraps(view_func)
+            def _wrapped_view(request, *args, **kwargs):
+                try:
+                    fields = fieldset.select(request.GET.get('fields'))
+                except ValueError as e:
+                    return JsonResponse({'error': str(e)}, status=400)
+                return view_func(request, *args, fields=fields, **kwargs)
+        return _wrapped_view
+    return decorator
+
+# Keyset orderings of the paginated list APIs; the last column is unique
+BOOK_PAGES = ApiPagination(('title', 'id'))
+INVENTORY_PAGES = ApiPagination(('id',))
+LOAN_PAGES = ApiPagination(('-issue_date', '-id'))
+BRANCH_BOOK_PAGES = ApiPagination(('book_id',))
+
+def _api_int(request, name):
+    """Optional integer query parameter; ValueError on anything else"""
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Parameter "{name}" must be an integer')
+
+def _api_book_queryset(request):
+    """Filtered book queryset shared by the sync and async book list APIs"""
+    books = Book.objects.all()
     
     # Filtering
     search = request.GET.get('search', '')
     if search:
         books = books.filter(title__icontains=search)
     
-    year = request.GET.get('year', '')
-    if year:
+    year = _api_int(request, 'year')
+    if year is not None:
         books = books.filter(publication_year=year)
-    
-    # Pagination
-    page = int(request.GET.get('page', 1))
-    per_page = int(request.GET.get('per_page', 20))
-    start = (page - 1) * per_page
-    end = start + per_page
-    
-    total_count = books.count()
-    books = books[start:end]
-    
-    data = {
-        'count': total_count,
-        'page': page,
-        'per_page': per_page,
-        'results': [
-            {
-                'id': book.id,
-                'title': book.title,
-                'publication_year': book.publication_year,
-                'page_count': book.page_count,
-                'price': float(book.price),
-                'publisher': book.publisher.name if book.publisher else None,
-                'authors': [str(author) for author in book.authors.all()],
-                'created_at': book.created_at.isoformat(),
-            }
-            for book in books
-        ]
-    }
-    
-    return JsonResponse(data)
+    return books
 
-@require_http_methods(["GET"])
-def api_book_detail(request, pk):
-    """API endpoint for book detail"""
-    try:
-        book = Book.objects.select_related('publisher').prefetch_related('authors').get(pk=pk)
-        
-        data = {
-            'id': book.id,
-            'title': book.title,
-            'publication_year': book.publication_year,
-            'page_count': book.page_count,
-            'illustration_count': book.illustration_count,
-            'price': float(book.price),
-            'publisher': {
-                'id': book.publisher.id if book.publisher else None,
-                'name': book.publisher.name if book.publisher else None,
-            },
-            'authors': [
-                {
-                    'id': author.id,
-                    'last_name': author.last_name,
-                    'first_name': author.first_name,
-                    'middle_name': author.middle_name,
-                }
-                for author in book.authors.all()
-            ],
-            'created_at': book.created_at.isoformat(),
-            'updated_at': book.updated_at.isoformat(),
-        }
-        
-        return JsonResponse(data)
-    
-    except Book.DoesNotExist:
-        return JsonResponse({'error': 'Book not found'}, status=404)
+def _api_branch_scoped(request, queryset):
+    """
+    Narrow a branch-scoped queryset to ?branch_id= on the branch's shard.
+    Pages are cut by one SQL query, so with shards the filter is required.
+    """
+    branch_id = _api_int(request, 'branch_id')
+    if branch_id is not None:
+        return for_branch(queryset, branch_id)
+    if sharding_enabled():
+        raise ValueError('branch_id is required when branches are sharded')
+    return queryset
 
-@require_http_methods(["GET"])
-def api_inventory_list(request):
-    """API endpoint for inventory list"""
-    inventory = BookInventory.objects.select_related('book', 'branch')
-    
+def _api_inventory_queryset(request):
     # Filtering
-    branch_id = request.GET.get('branch_id')
-    if branch_id:
-        inventory = inventory.filter(branch_id=branch_id)
+    inventory = _api_branch_scoped(request, BookInventory.objects.all())
     
-    book_id = request.GET.get('book_id')
-    if book_id:
+    book_id = _api_int(request, 'book_id')
+    if book_id is not None:
         inventory = inventory.filter(book_id=book_id)
-    
-    data = {
-        'results': [
-            {
-                'id': item.id,
-                'book': {
-                    'id': item.book.id,
-                    'title': item.book.title,
-                },
-                'branch': {
-                    'id': item.branch.id,
-                    'name': item.branch.name,
-                },
-                'total_copies': item.total_copies,
-                'available_copies': item.available_copies,
-                'last_updated': item.last_updated.isoformat(),
-            }
-            for item in inventory
-        ]
-    }
-    
-    return JsonResponse(data)
+    return inventory
 
-@require_http_methods(["GET"])
-def api_loan_list(request):
-    """API endpoint for loan list"""
-    loans = Loan.objects.select_related('student', 'book', 'branch')
-    
+def _api_loan_queryset(request):
     # Filtering
+    loans = _api_branch_scoped(request, Loan.objects.all())
+    
     status = request.GET.get('status')
     if status == 'active':
         loans = loans.filter(is_returned=False)
     elif status == 'returned':
         loans = loans.filter(is_returned=True)
     
-    student_id = request.GET.get('student_id')
-    if student_id:
+    student_id = _api_int(request, 'student_id')
+    if student_id is not None:
         loans = loans.filter(student_id=student_id)
-    
-    data = {
-        'results': [
-            {
-                'id': loan.id,
-                'student': {
-                    'id': loan.student.id,
-                    'name': loan.student.get_full_name(),
-                    'student_id': loan.student.student_id,
-                },
-                'book': {
-                    'id': loan.book.id,
-                    'title': loan.book.title,
-                },
-                'branch': {
-                    'id': loan.branch.id,
-                    'name': loan.branch.name,
-                },
-                'issue_date': loan.issue_date.isoformat(),
-                'return_date': loan.return_date.isoformat() if loan.return_date else None,
-                'is_returned': loan.is_returned,
-            }
-            for loan in loans
-        ]
-    }
-    
-    return JsonResponse(data)
+    return loans
 
-# Additional utility views
-@login_required
-def api_book_inventory(request, book_id):
-    """API для получения инвентаря по книге"""
-    book = get_object_or_404(Book, id=book_id)
-    inventory = BookInventory.objects.filter(book=book).select_related('branch')
-    
-    data = {
+def _api_branch_books_queryset(branch):
+    return for_branch(BookInventory.objects, branch.id).filter(available_copies__gt=0)
+
+def _serialize_book_inventory(book, inventory):
+    return {
         'book': {
             'id': book.id,
             'title': book.title,
         },
-        'inventory': [
-            {
-                'branch': item.branch.name,
-                'total_copies': item.total_copies,
-                'available_copies': item.available_copies,
-            }
-            for item in inventory
-        ]
+        'inventory': inventory,
     }
-    
-    return JsonResponse(data)
 
-@login_required
-def api_branch_books(request, branch_id):
-    """API для получения книг в филиале"""
-    branch = get_object_or_404(Branch, id=branch_id)
-    inventory = BookInventory.objects.filter(branch=branch, available_copies__gt=0).select_related('book')
-    
-    data = {
+def _serialize_branch_books(branch, page):
+    return {
         'branch': {
             'id': branch.id,
             'name': branch.name,
         },
-        'books': [
-            {
-                'id': item.book.id,
-                'title': item.book.title,
-                'authors': item.book.get_authors_display(),
-                'available_copies': item.available_copies,
-            }
-            for item in inventory
-        ]
+        **page,
     }
-    
 
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(BOOK_SUMMARY)
+def api_book_list(request, fields):
+    """API endpoint for book list"""
+    try:
+        data = BOOK_PAGES.paginate(request, _api_book_queryset(request), BOOK_SUMMARY, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(BOOK_DETAIL)
+def api_book_detail(request, pk, fields):
+    """API endpoint for book detail"""
+    rows = BOOK_DETAIL.serialize(Book.objects.filter(pk=pk), fields)
+    if not rows:
+        return JsonResponse({'error': 'Book not found'}, status=404)
+    return FastJsonResponse(rows[0])
+
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(INVENTORY)
+def api_inventory_list(request, fields):
+    """API endpoint for inventory list"""
+    try:
+        data = INVENTORY_PAGES.paginate(request, _api_inventory_queryset(request), INVENTORY, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(LOAN)
+def api_loan_list(request, fields):
+    """API endpoint for loan list"""
+    try:
+        data = LOAN_PAGES.paginate(request, _api_loan_queryset(request), LOAN, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+# Additional utility views
+@login_required
+@replica_reads
+@api_fields(BOOK_INVENTORY)
+def api_book_inventory(request, book_id, fields):
+    """
+    API для получения инвентаря по книге.
+    Не больше одной строки на филиал, поэтому список отдается целиком.
+    """
+    book = get_object_or_404(Book.objects.only('id', 'title'), id=book_id)
+    inventory = book_inventory_rows(book.id, fields)
+    return FastJsonResponse(_serialize_book_inventory(book, inventory))
+
+@login_required
+@replica_reads
+@api_fields(BRANCH_BOOKS)
+def api_branch_books(request, branch_id, fields):
+    """API для получения книг в филиале, постранично"""
+    branch = get_object_or_404(Branch, id=branch_id)
+    try:
+        page = BRANCH_BOOK_PAGES.paginate(request, _api_branch_books_queryset(branch), BRANCH_BOOKS, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(_serialize_branch_books(branch, page))
+
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(AVAILABILITY)
+def api_availability(request, fields):
+    """API: ближайшие филиалы с доступными экземплярами для набора книг"""
+    try:
+        book_ids = [int(value) for value in request.GET.get('books', '').split(',') if value.strip()]
+        origin_id = int(request.GET['branch']) if request.GET.get('branch') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid book or branch id'}, status=400)
+    
+    if not book_ids:
+        return JsonResponse({'error': 'Parameter "books" is required'}, status=400)
+    
+    try:
+        availability = AvailabilityService.nearest_available(book_ids, origin_id)
+    except LibraryBusinessError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # One inventory query either way: ?fields= only trims the branch entries
+    data = {
+        'origin_branch_id': origin_id,
+        'results': [
+            {'book_id': book_id, 'branches': [AVAILABILITY.pick(item, fields) for item in branches]}
+            for book_id, branches in availability.items()
+        ]
+    }
     return JsonResponse(data)
+
+# A batch answers a whole reading list in a constant number of queries
+API_BATCH_MAX_BOOKS = 50
+
+def _api_batch_ids(request):
+    """?ids=1,2,3 -> unique book ids in request order; ValueError on bad input"""
+    try:
+        book_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        raise ValueError('Invalid book id')
+    if not book_ids:
+        raise ValueError('Parameter "ids" is required')
+    book_ids = list(dict.fromkeys(book_ids))
+    if len(book_ids) > API_BATCH_MAX_BOOKS:
+        raise ValueError(f'At most {API_BATCH_MAX_BOOKS} books can be looked up at once')
+    return book_ids
+
+def _book_batch_fields(fields):
+    # Rows are matched back to the requested ids
+    return fields if 'id' in fields else ('id', *fields)
+
+def _serialize_book_batch(book_ids, rows):
+    by_id = {row['id']: row for row in rows}
+    return {
+        'results': [by_id[pk] for pk in book_ids if pk in by_id],
+        'missing': [pk for pk in book_ids if pk not in by_id],
+    }
+
+@require_http_methods(["GET"])
+@replica_reads
+@api_fields(BOOK_BATCH)
+def api_book_batch(request, fields):
+    """API: карточки и инвентарь нескольких книг за один запрос"""
+    try:
+        book_ids = _api_batch_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    rows = BOOK_BATCH.serialize(Book.objects.filter(pk__in=book_ids), _book_batch_fields(fields))
+    return FastJsonResponse(_serialize_book_batch(book_ids, rows))
+
+# Async API views (served natively under ASGI, e.g. uvicorn library_project.asgi:application)
+def async_require_GET(view_func):
+    """Async counterpart of require_GET; the Django 4.2 decorator only wraps sync views"""
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+def async_login_required(view_func):
+    """Async counterpart of login_required"""
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        # request.user is a lazy object that loads the session user synchronously
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+@async_require_GET
+@replica_reads
+@api_fields(BOOK_SUMMARY)
+async def api_book_list_async(request, fields):
+    """Async API endpoint for book list"""
+    try:
+        data = await BOOK_PAGES.apaginate(request, _api_book_queryset(request), BOOK_SUMMARY, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+@async_require_GET
+@replica_reads
+@api_fields(BOOK_DETAIL)
+async def api_book_detail_async(request, pk, fields):
+    """Async API endpoint for book detail"""
+    rows = await BOOK_DETAIL.aserialize(Book.objects.filter(pk=pk), fields)
+    if not rows:
+        return JsonResponse({'error': 'Book not found'}, status=404)
+    return FastJsonResponse(rows[0])
+
+@async_require_GET
+@replica_reads
+@api_fields(INVENTORY)
+async def api_inventory_list_async(request, fields):
+    """Async API endpoint for inventory list"""
+    try:
+        data = await INVENTORY_PAGES.apaginate(request, _api_inventory_queryset(request), INVENTORY, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+@async_require_GET
+@replica_reads
+@api_fields(LOAN)
+async def api_loan_list_async(request, fields):
+    """Async API endpoint for loan list"""
+    try:
+        data = await LOAN_PAGES.apaginate(request, _api_loan_queryset(request), LOAN, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(data)
+
+@async_login_required
+@replica_reads
+@api_fields(BOOK_INVENTORY)
+async def api_book_inventory_async(request, book_id, fields):
+    """Асинхронный API инвентаря по книге (одна строка на филиал)"""
+    try:
+        book = await Book.objects.only('id', 'title').aget(id=book_id)
+    except Book.DoesNotExist:
+        raise Http404
+    inventory = await sync_to_async(book_inventory_rows)(book.id, fields)
+    return FastJsonResponse(_serialize_book_inventory(book, inventory))
+
+@async_login_required
+@replica_reads
+@api_fields(BRANCH_BOOKS)
+async def api_branch_books_async(request, branch_id, fields):
+    """Асинхронный API книг в филиале"""
+    try:
+        branch = await Branch.objects.aget(id=branch_id)
+    except Branch.DoesNotExist:
+        raise Http404
+    try:
+        page = await BRANCH_BOOK_PAGES.apaginate(request, _api_branch_books_queryset(branch), BRANCH_BOOKS, fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return FastJsonResponse(_serialize_branch_books(branch, page))
+
+@async_require_GET
+@replica_reads
+@api_fields(BOOK_BATCH)
+async def api_book_batch_async(request, fields):
+    """Асинхронный API нескольких книг за один запрос"""
+    try:
+        book_ids = _api_batch_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    rows = await BOOK_BATCH.aserialize(Book.objects.filter(pk__in=book_ids), _book_batch_fields(fields))
+    return FastJsonResponse(_serialize_book_batch(book_ids, rows))
+
+# Live availability feed (Server-Sent Events, ASGI only)
+SSE_KEEPALIVE_SECONDS = 15
+# Django 4.2 doesn't notice a client disconnect while streaming, so streams
+# end on their own and EventSource reconnects after the retry interval
+SSE_MAX_STREAM_SECONDS = 300
+SSE_RETRY_MS = 3000
+
+def _sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+async def _availability_events(branch_id):
+    subscription = broker.subscribe(branch_id)
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        # Initial state once per connection; afterwards only pushed changes
+        snapshot = await sync_to_async(availability_snapshot)(branch_id)
+        yield _sse_event('snapshot', snapshot)
+        
+        deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield _sse_event('availability', event)
+    finally:
+        broker.unsubscribe(subscription)
+
+@async_require_GET
+async def availability_stream(request, branch_id):
+    """SSE: изменения доступности экземпляров в филиале"""
+    if not isinstance(request, ASGIRequest):
+        # A stream would pin a WSGI worker for its whole lifetime
+        return HttpResponse('Live feed is served by the ASGI application', status=501)
+    if not await Branch.objects.filter(pk=branch_id).aexists():
+        raise Http404
+    
+    response = StreamingHttpResponse(
+        _availability_events(branch_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
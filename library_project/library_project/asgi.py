@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_project.settings')
 
 application = get_asgi_application()
+
+# Load the branch/faculty/publisher snapshot before the first request
+from library_app.catalog import CatalogSnapshot  # noqa: E402
+
+CatalogSnapshot.warm()
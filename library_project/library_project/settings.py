@@ -17,8 +17,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-hksg%y2s5gl22dwjy-8wm3+&2o7v7q*k1%u-o577*pdced+j9+'
 
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool('DJANGO_DEBUG', True)
 
 ALLOWED_HOSTS = ['*']
 
@@ -43,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library_app.routers.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,7 +57,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # Add project-level templates directory
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -61,6 +64,16 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Parsed once per process; runserver's autoreloader resets the
+            # cache when a template changes. DJANGO_DEBUG=0 (production) also
+            # drops the per-node debug information.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+            'debug': DEBUG,
         },
     },
 ]
@@ -70,13 +83,108 @@ WSGI_APPLICATION = 'library_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# Environment driven. Without DB_ENGINE the local SQLite file is used;
+# DB_ENGINE=postgresql selects the production profile:
+#   DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT - connection parameters
+#   DB_CONN_MAX_AGE      - seconds to keep a connection between requests
+#                          (default 60 for PostgreSQL, 0 for SQLite)
+#   DB_CONN_HEALTH_CHECKS - ping a reused connection before the request uses it
+#   DB_POOLER=pgbouncer  - connections go through PgBouncer in transaction
+#                          mode; server-side cursors must be disabled then
+#   DB_REPLICA_HOST / DB_REPLICA_PORT (PostgreSQL) or DB_REPLICA_NAME (SQLite)
+#                        - read replica used by reports and read-only APIs
+#   DB_REPLICA_STICKY_SECONDS - after a write, the session reads from the
+#                          primary for this long (replication lag budget)
+#   DB_SQLITE_TUNING     - SQLite only: WAL, synchronous=NORMAL, mmap, cache,
+#                          busy timeout and BEGIN IMMEDIATE for write
+#                          transactions (library_app.backends.sqlite3)
+# Under ASGI (uvicorn) run with DB_CONN_MAX_AGE=0 behind PgBouncer: persistent
+# connections are per thread and leak with the async thread pool.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'library'),
+            'USER': os.environ.get('DB_USER', 'library'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'library_app.backends.sqlite3' if env_bool('DB_SQLITE_TUNING')
+                else 'django.db.backends.sqlite3'
+            ),
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS'),
+        }
+    }
+
+
+# Read replica: only configured when the environment names one
+REPLICA_DATABASE = None
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+
+if DB_ENGINE == 'postgresql' and os.environ.get('DB_REPLICA_HOST'):
+    REPLICA_DATABASE = 'replica'
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_ENGINE != 'postgresql' and os.environ.get('DB_REPLICA_NAME'):
+    REPLICA_DATABASE = 'replica'
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DB_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Branch sharding (library_app.sharding): loans and inventory of a branch
+# live in the database BRANCH_SHARDS maps it to; SHARD_DATABASES is the
+# append-only list of shard aliases (the position fixes the loan id range).
+# Off by default; see settings_sharded.py for a local layout.
+BRANCH_SHARDS = {}
+SHARD_DATABASES = []
+
+DATABASE_ROUTERS = [
+    'library_app.sharding.BranchShardRouter',
+    'library_app.routers.ReplicaRouter',
+]
+
+# Cache shared by every worker process: ModelVersions tokens, template
+# fragments, reference rows and paginator counts must agree across them.
+# Redis when CACHE_REDIS_URL is set, otherwise a table in the default
+# database (created by migration library_app 0013).
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'library_cache',
+        }
     }
-}
 
 
 # Password validation
@@ -139,6 +247,10 @@ LOGOUT_REDIRECT_URL = '/'
 # Registration settings
 ACCOUNT_ACTIVATION_DAYS = 7
 
+# JSON encoder of the list APIs (library_app.serializers.dumps): 'orjson'
+# when the package is installed, otherwise the stdlib encoder
+API_JSON_ENCODER = os.environ.get('API_JSON_ENCODER', 'orjson')
+
 # Message storage
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -0,0 +1,26 @@
+"""
+Primary + read replica stand-in on two local SQLite files.
+
+Nothing replicates between the files, which is what makes routing visible
+(and why only the routing tests make sense with these settings):
+    python manage.py test library_app.tests.ReplicaRoutingTests \
+        --settings=library_project.settings_replica
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'library_test_primary.sqlite3')},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'library_test_replica.sqlite3')},
+    },
+}
+
+REPLICA_DATABASE = 'replica'
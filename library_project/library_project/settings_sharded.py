@@ -0,0 +1,35 @@
+"""
+Branch sharding on local SQLite files: branches 1-4 spread over two shards,
+every other branch stays on the default database.
+
+Each shard needs the schema and the reference tables:
+    python manage.py migrate --settings=library_project.settings_sharded
+    python manage.py migrate --database=branch_a --settings=library_project.settings_sharded
+    python manage.py migrate --database=branch_b --settings=library_project.settings_sharded
+    python manage.py sync_shards --settings=library_project.settings_sharded
+
+Tests:
+    python manage.py test library_app.tests.ShardingTests \
+        --settings=library_project.settings_sharded
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+
+def _sqlite(name):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{name}.sqlite3',
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), f'library_test_{name}.sqlite3')},
+    }
+
+
+DATABASES = {
+    'default': _sqlite('db'),
+    'branch_a': _sqlite('db_branch_a'),
+    'branch_b': _sqlite('db_branch_b'),
+}
+
+SHARD_DATABASES = ['branch_a', 'branch_b']
+BRANCH_SHARDS = {1: 'branch_a', 2: 'branch_a', 3: 'branch_b', 4: 'branch_b'}